@@ -0,0 +1,533 @@
+"""
+Cache Subsystem
+Bounded LRU caches, pluggable storage backends and a stale-while-revalidate
+response cache shared by the TMDb client and the RAG helpers
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class CacheStats:
+    """Thread-safe hit/miss/eviction counters."""
+
+    FIELDS = ('hits', 'misses', 'stale_hits', 'refreshes', 'evictions', 'expirations', 'errors')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {field: 0 for field in self.FIELDS}
+
+    def incr(self, field: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counts[field] = self._counts.get(field, 0) + amount
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+        lookups = counts['hits'] + counts['stale_hits'] + counts['misses']
+        counts['hit_rate'] = round((counts['hits'] + counts['stale_hits']) / lookups, 4) if lookups else 0.0
+        return counts
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU cache bounded by entry count and, optionally, by bytes.
+
+    Entries may carry their own TTL; expired entries are dropped lazily on access.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[float] = None,
+        sizeof: Optional[Callable[[Any], int]] = None
+    ):
+        """
+        Args:
+            max_entries: Maximum number of entries kept
+            max_bytes: Optional cap on the summed entry sizes
+            ttl: Default time-to-live in seconds (None = no expiry)
+            sizeof: Function returning the size of a value (defaults to len())
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof or (lambda value: len(value) if hasattr(value, '__len__') else 1)
+        self.stats = CacheStats()
+        self._data = OrderedDict()  # key -> (value, size, expires_at)
+        self._bytes = 0
+        self._lock = threading.RLock()
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.stats.incr('misses')
+                return default
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                self._remove(key)
+                self.stats.incr('expirations')
+                self.stats.incr('misses')
+                return default
+            self._data.move_to_end(key)
+            self.stats.incr('hits')
+            return value
+
+    def set(self, key: Any, value: Any, ttl: Optional[float] = None, size: Optional[int] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        size = self.sizeof(value) if size is None else size
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, size, expires_at)
+            self._bytes += size
+            self._evict()
+
+    def delete(self, key: Any) -> None:
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __contains__(self, key: Any) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and (entry[2] is None or entry[2] > time.time())
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def items(self) -> list:
+        """Unexpired (key, value) pairs, least recently used first."""
+        now = time.time()
+        with self._lock:
+            return [(key, value) for key, (value, _, expires_at) in self._data.items()
+                    if expires_at is None or expires_at > now]
+
+    def info(self) -> Dict[str, Any]:
+        info = self.stats.as_dict()
+        info.update({'entries': len(self._data), 'bytes': self._bytes,
+                     'max_entries': self.max_entries, 'max_bytes': self.max_bytes})
+        return info
+
+    def _remove(self, key: Any) -> None:
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def _evict(self) -> None:
+        while self._data and (
+            len(self._data) > self.max_entries or
+            (self.max_bytes is not None and self._bytes > self.max_bytes and len(self._data) > 1)
+        ):
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.stats.incr('evictions')
+
+
+class CacheBackend:
+    """
+    Storage interface used by ResponseCache.
+    Backends store opaque byte payloads together with the time they were stored.
+    """
+
+    name = 'base'
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        raise NotImplementedError
+
+    def set(self, key: str, payload: bytes, stored_at: float, ttl: float) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def info(self) -> Dict[str, Any]:
+        return {'backend': self.name}
+
+
+class MemoryBackend(CacheBackend):
+    """Per-process LRU backend (the default)."""
+
+    name = 'memory'
+
+    def __init__(self, max_entries: int = 2048, max_bytes: Optional[int] = 64 * 1024 * 1024):
+        self._lru = LRUCache(max_entries=max_entries, max_bytes=max_bytes, sizeof=lambda entry: len(entry[0]))
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        return self._lru.get(key)
+
+    def set(self, key: str, payload: bytes, stored_at: float, ttl: float) -> None:
+        self._lru.set(key, (payload, stored_at), ttl=ttl, size=len(payload))
+
+    def delete(self, key: str) -> None:
+        self._lru.delete(key)
+
+    def clear(self) -> None:
+        self._lru.clear()
+
+    def info(self) -> Dict[str, Any]:
+        info = self._lru.info()
+        info['backend'] = self.name
+        return info
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    On-disk LRU backend shared by every worker process on the same host.
+    Uses WAL mode so concurrent readers never block on a writer.
+    """
+
+    name = 'sqlite'
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 20000,
+        max_bytes: Optional[int] = 256 * 1024 * 1024,
+        table: str = 'cache'
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.table = table
+        self.stats = CacheStats()
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "key TEXT PRIMARY KEY, payload BLOB NOT NULL, stored_at REAL NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL, size INTEGER NOT NULL)"
+        )
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_accessed ON {self.table} (accessed_at)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                f"SELECT payload, stored_at, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            payload, stored_at, expires_at = row
+            now = time.time()
+            if expires_at <= now:
+                conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                conn.commit()
+                self.stats.incr('expirations')
+                return None
+            conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+            return bytes(payload), stored_at
+        except sqlite3.Error as e:
+            logger.error(f"SQLite cache read failed: {e}")
+            self.stats.incr('errors')
+            return None
+
+    def set(self, key: str, payload: bytes, stored_at: float, ttl: float) -> None:
+        try:
+            conn = self._conn()
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, payload, stored_at, expires_at, accessed_at, size) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(payload), stored_at, stored_at + ttl, time.time(), len(payload))
+            )
+            conn.commit()
+            self._writes += 1
+            # Enforcing bounds needs two aggregate queries, so only do it every few writes
+            if self._writes % 20 == 0:
+                self._evict(conn)
+        except sqlite3.Error as e:
+            logger.error(f"SQLite cache write failed: {e}")
+            self.stats.incr('errors')
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),))
+        count, total = conn.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}").fetchone()
+        excess = max(0, count - self.max_entries)
+        if self.max_bytes is not None and total > self.max_bytes and count:
+            # Approximate the number of rows to drop from the average entry size
+            average = total / count
+            excess = max(excess, int((total - self.max_bytes) / average) + 1)
+        if excess:
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN "
+                f"(SELECT key FROM {self.table} ORDER BY accessed_at ASC LIMIT ?)",
+                (excess,)
+            )
+            self.stats.incr('evictions', excess)
+        conn.commit()
+
+    def delete(self, key: str) -> None:
+        conn = self._conn()
+        conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+        conn.commit()
+
+    def clear(self) -> None:
+        conn = self._conn()
+        conn.execute(f"DELETE FROM {self.table}")
+        conn.commit()
+
+    def info(self) -> Dict[str, Any]:
+        info = self.stats.as_dict()
+        try:
+            count, total = self._conn().execute(
+                f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}"
+            ).fetchone()
+            info.update({'entries': count, 'bytes': total})
+        except sqlite3.Error:
+            pass
+        info.update({'backend': self.name, 'path': self.path,
+                     'max_entries': self.max_entries, 'max_bytes': self.max_bytes})
+        return info
+
+
+def redact_url(url: str) -> str:
+    """Scheme, host and port of a server URL, without credentials, path or query (safe to publish)."""
+    try:
+        parts = urlsplit(url)
+        host = parts.hostname or ''
+        port = f":{parts.port}" if parts.port else ''
+    except ValueError:
+        return ''
+    return f"{parts.scheme}://{host}{port}" if parts.scheme else ''
+
+
+class RedisBackend(CacheBackend):
+    """
+    Backend for any Redis-compatible server (Redis, Valkey, KeyDB, a local stand-in).
+    Entry bounds are delegated to the server: run it with a maxmemory limit and
+    the allkeys-lru eviction policy.
+    """
+
+    name = 'redis'
+
+    def __init__(self, url: str, prefix: str = 'frameiq:'):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("The redis cache backend requires the 'redis' package (pip install redis)")
+        self.url = url
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+        self.stats = CacheStats()
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        try:
+            raw = self.client.get(self.prefix + key)
+        except Exception as e:
+            logger.error(f"Redis cache read failed: {e}")
+            self.stats.incr('errors')
+            return None
+        if raw is None:
+            return None
+        stamp, _, payload = raw.partition(b'\n')
+        return payload, float(stamp)
+
+    def set(self, key: str, payload: bytes, stored_at: float, ttl: float) -> None:
+        try:
+            self.client.set(self.prefix + key, b'%.3f\n' % stored_at + payload, px=max(1, int(ttl * 1000)))
+        except Exception as e:
+            logger.error(f"Redis cache write failed: {e}")
+            self.stats.incr('errors')
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(match=self.prefix + '*'):
+            self.client.delete(key)
+
+    def info(self) -> Dict[str, Any]:
+        info = self.stats.as_dict()
+        info.update({'backend': self.name, 'server': redact_url(self.url)})
+        return info
+
+
+def create_backend(
+    kind: Optional[str] = None,
+    namespace: str = 'cache',
+    max_entries: int = 2048,
+    max_bytes: Optional[int] = 64 * 1024 * 1024
+) -> CacheBackend:
+    """
+    Build a cache backend from configuration.
+
+    Environment variables:
+    - CACHE_BACKEND: memory (default), sqlite or redis
+    - CACHE_SQLITE_PATH: database file shared by workers (sqlite backend)
+    - CACHE_REDIS_URL: server URL (redis backend)
+
+    Falls back to the in-process backend if the shared one cannot be opened.
+
+    Args:
+        kind: Backend name, overriding CACHE_BACKEND
+        namespace: Table name / key prefix separating independent caches
+        max_entries: Entry bound for backends that enforce it locally
+        max_bytes: Byte bound for backends that enforce it locally
+
+    Returns:
+        CacheBackend instance
+    """
+    kind = (kind or os.getenv("CACHE_BACKEND", "memory")).lower()
+    try:
+        if kind == 'sqlite':
+            path = os.getenv("CACHE_SQLITE_PATH", os.path.join("/tmp", "frameiq_cache.sqlite3"))
+            return SQLiteBackend(path, max_entries=max_entries, max_bytes=max_bytes, table=namespace)
+        if kind == 'redis':
+            url = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+            return RedisBackend(url, prefix=f"frameiq:{namespace}:")
+    except Exception as e:
+        logger.error(f"Could not open {kind} cache backend, using in-process cache: {e}")
+    return MemoryBackend(max_entries=max_entries, max_bytes=max_bytes)
+
+
+class ResponseCache:
+    """
+    Stale-while-revalidate cache on top of a CacheBackend.
+
+    Fresh entries are served directly. Entries past their TTL but inside the
+    stale window are served immediately while a single background refresh runs.
+    Misses fetch synchronously.
+    """
+
+    def __init__(
+        self,
+        backend: CacheBackend,
+        stale_ttl: float = 3600,
+        encode: Callable[[Any], bytes] = None,
+        decode: Callable[[bytes], Any] = None
+    ):
+        self.backend = backend
+        self.stale_ttl = stale_ttl
+        self.encode = encode or (lambda value: json.dumps(value, separators=(',', ':')).encode('utf-8'))
+        self.decode = decode or (lambda payload: json.loads(payload.decode('utf-8')))
+        self.stats = CacheStats()
+        self._inflight = set()
+        self._inflight_lock = threading.Lock()
+
+    def get_or_fetch(
+        self,
+        key: str,
+        fetch: Callable[[], Tuple[Any, bool]],
+        ttl: float,
+        refresh_after: Optional[float] = None
+    ) -> Any:
+        """
+        Return the cached value for key, fetching it when missing or stale.
+
+        Args:
+            key: Cache key
+            fetch: Callable returning (value, cacheable)
+            ttl: Freshness window in seconds
+            refresh_after: Refetch synchronously once the entry is this many
+                seconds old, even if still fresh (used for refresh-ahead warming)
+
+        Returns:
+            Cached or freshly fetched value
+        """
+        entry = self._lookup(key)
+        refreshing = False
+        if entry is not None:
+            value, stored_at = entry
+            age = time.time() - stored_at
+            if refresh_after is None or age < refresh_after:
+                if age < ttl:
+                    self.stats.incr('hits')
+                    return value
+                if age < ttl + self.stale_ttl:
+                    self.stats.incr('stale_hits')
+                    self._revalidate(key, fetch, ttl)
+                    return value
+            else:
+                refreshing = True
+
+        # Refreshes replace an entry we still hold; anything else is a real miss
+        self.stats.incr('refreshes' if refreshing else 'misses')
+        try:
+            return self._fetch_and_store(key, fetch, ttl)
+        except Exception:
+            self.stats.incr('errors')
+            # Serve whatever we still hold rather than failing the request
+            if entry is not None:
+                return entry[0]
+            raise
+
+    def _lookup(self, key: str) -> Optional[Tuple[Any, float]]:
+        entry = self.backend.get(key)
+        if entry is None:
+            return None
+        payload, stored_at = entry
+        try:
+            return self.decode(payload), stored_at
+        except Exception:
+            self.backend.delete(key)
+            return None
+
+    def _fetch_and_store(self, key: str, fetch: Callable[[], Tuple[Any, bool]], ttl: float) -> Any:
+        value, cacheable = fetch()
+        if cacheable:
+            self.backend.set(key, self.encode(value), time.time(), ttl + self.stale_ttl)
+        return value
+
+    def _revalidate(self, key: str, fetch: Callable[[], Tuple[Any, bool]], ttl: float) -> None:
+        with self._inflight_lock:
+            if key in self._inflight:
+                return
+            self._inflight.add(key)
+
+        def refresh():
+            try:
+                self._fetch_and_store(key, fetch, ttl)
+            except Exception as e:
+                self.stats.incr('errors')
+                logger.warning(f"Background cache refresh failed: {e}")
+            finally:
+                with self._inflight_lock:
+                    self._inflight.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def delete(self, key: str) -> None:
+        self.backend.delete(key)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def info(self) -> Dict[str, Any]:
+        info = self.stats.as_dict()
+        info['storage'] = self.backend.info()
+        return info
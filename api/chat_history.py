@@ -0,0 +1,296 @@
+"""
+Chat History Window
+Fits a conversation into a token budget for the next prompt: the newest
+turns verbatim, everything older folded into a rolling summary that is
+updated in the background and cached across workers
+"""
+
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from api.cache import create_backend
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Token budget for the history part of a prompt (verbatim turns plus summary)
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1500"))
+
+# Most recent turns (user message + reply) kept verbatim
+CHAT_HISTORY_TURNS = int(os.getenv("CHAT_HISTORY_TURNS", "6"))
+
+# Length cap of the rolling summary
+CHAT_SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", "300"))
+
+# Idle time after which a cached summary is dropped (matches the session TTL)
+CHAT_SUMMARY_TTL = float(os.getenv("CHAT_SUMMARY_TTL", os.getenv("CHAT_SESSION_TTL", str(7 * 24 * 3600))))
+
+# Hashes of folded messages a summary remembers (at least the session's message cap)
+FOLDED_HASHES = 64
+
+# Rough characters per token of the Llama / GPT tokenizers on English text
+CHARS_PER_TOKEN = 4
+
+# Summaries are written off the request path; at most one update per session runs at a time
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='chat-summary')
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count (no tokenizer dependency)."""
+    return math.ceil(len(text or '') / CHARS_PER_TOKEN)
+
+
+def clip_to_tokens(text: str, tokens: int) -> str:
+    """Start of `text` that fits in about `tokens` tokens, cut at a word boundary."""
+    limit = max(0, tokens) * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    clipped = text[:limit].rsplit(' ', 1)[0] if ' ' in text[:limit] else text[:limit]
+    return clipped + " …"
+
+
+def format_messages(messages: List[Dict[str, str]]) -> str:
+    return "\n".join(
+        f"{'User' if message['type'] == 'human' else 'Assistant'}: {message['content']}"
+        for message in messages
+    )
+
+
+def _message_hash(message: Dict[str, str]) -> str:
+    return hashlib.md5(f"{message['type']}\n{message['content']}".encode('utf-8')).hexdigest()
+
+
+def split_turns(messages: List[Dict[str, str]]) -> List[List[Dict[str, str]]]:
+    """Group messages into turns: a user message and the replies that follow it."""
+    turns: List[List[Dict[str, str]]] = []
+    for message in messages:
+        if message['type'] == 'human' or not turns:
+            turns.append([message])
+        else:
+            turns[-1].append(message)
+    return turns
+
+
+class HistoryManager:
+    """
+    Token-budgeted history for the chat prompt.
+
+    window() keeps the newest turns that fit the budget (at most
+    max_turns), prefixed by a summary of everything older. The summary is
+    keyed by session and records the messages it has folded in; when older
+    turns are not covered yet, an update is queued and the current prompt
+    uses the summary as it stands.
+    """
+
+    def __init__(
+        self,
+        summarize: Optional[Callable[[str, List[Dict[str, str]], int], str]] = None,
+        token_budget: int = CHAT_HISTORY_TOKEN_BUDGET,
+        max_turns: int = CHAT_HISTORY_TURNS,
+        summary_tokens: int = CHAT_SUMMARY_TOKENS,
+        ttl: float = CHAT_SUMMARY_TTL
+    ):
+        """
+        Args:
+            summarize: (previous summary, messages to fold in, token cap) -> new summary;
+                       without it older turns are simply dropped
+            token_budget: Tokens available for summary plus verbatim turns
+            max_turns: Maximum verbatim turns
+            summary_tokens: Length cap of the summary
+            ttl: Lifetime of a cached summary since its last update
+        """
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.max_turns = max_turns
+        self.summary_tokens = summary_tokens
+        self.ttl = ttl
+        # Shared with other workers when CACHE_BACKEND is sqlite or redis
+        self.summaries = create_backend(namespace='chat_summary', max_entries=5000, max_bytes=16 * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._counts = {'turns': 0, 'summary_updates': 0, 'summary_errors': 0, 'unsummarized_messages': 0,
+                        'history_tokens': 0, 'prompt_tokens': 0, 'max_prompt_tokens': 0}
+
+    # ------------------------------------------------------------------
+    # Window
+    # ------------------------------------------------------------------
+
+    def window(self, session_id: Any, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """
+        History text for the next prompt.
+
+        Args:
+            session_id: Chat session key
+            messages: Stored history, oldest first (without the new user message)
+
+        Returns:
+            Dictionary with text (summary plus verbatim turns), summary, turns
+            (verbatim turn count), history_tokens and unsummarized (older
+            messages the summary does not cover yet)
+        """
+        if not messages:
+            with self._lock:
+                self._counts['turns'] += 1
+            return {'text': '', 'summary': '', 'turns': 0, 'history_tokens': 0, 'unsummarized': 0}
+
+        turns = split_turns(messages)
+        summary, folded = self._cached_summary(session_id)
+        summary_text = f"Summary of the earlier conversation: {summary}" if summary else ""
+        budget = self.token_budget - estimate_tokens(summary_text)
+
+        kept: List[List[Dict[str, str]]] = []
+        for turn in reversed(turns[-self.max_turns:] if self.max_turns > 0 else []):
+            tokens = estimate_tokens(format_messages(turn))
+            if tokens > budget:
+                if not kept:
+                    # The latest turn alone is over budget: keep its start rather than nothing
+                    kept.append(self._clip_turn(turn, budget))
+                break
+            kept.append(turn)
+            budget -= tokens
+        kept.reverse()
+
+        older = [message for turn in turns[:len(turns) - len(kept)] for message in turn]
+        unsummarized = self._uncovered(messages, older, folded)
+        if unsummarized and self.summarize is not None:
+            self._queue_update(session_id, summary, unsummarized, folded)
+
+        verbatim = format_messages([message for turn in kept for message in turn])
+        text = "\n".join(part for part in (summary_text, verbatim) if part)
+        history_tokens = estimate_tokens(text)
+        with self._lock:
+            self._counts['turns'] += 1
+            self._counts['history_tokens'] += history_tokens
+            self._counts['unsummarized_messages'] += len(unsummarized)
+        return {'text': text, 'summary': summary, 'turns': len(kept),
+                'history_tokens': history_tokens, 'unsummarized': len(unsummarized)}
+
+    @staticmethod
+    def _clip_turn(turn: List[Dict[str, str]], budget: int) -> List[Dict[str, str]]:
+        share = max(1, budget // len(turn))
+        return [{'type': message['type'], 'content': clip_to_tokens(message['content'], share)} for message in turn]
+
+    @staticmethod
+    def _uncovered(messages: List[Dict[str, str]], older: List[Dict[str, str]], folded: List[str]) -> List[Dict[str, str]]:
+        """
+        Older messages the summary has not folded in yet: those after the newest
+        folded message still stored, and never one the summary already holds,
+        even once trim_history has dropped the messages before it.
+        """
+        if not older or not folded:
+            return older
+        folded_set = set(folded)
+        hashes = [_message_hash(message) for message in messages]
+        start = 0
+        for index in range(len(hashes) - 1, -1, -1):
+            if hashes[index] in folded_set:
+                # May point into the verbatim turns when the window grew again
+                start = index + 1
+                break
+        return [message for message, digest in zip(older[start:], hashes[start:]) if digest not in folded_set]
+
+    # ------------------------------------------------------------------
+    # Rolling summary
+    # ------------------------------------------------------------------
+
+    def _cached_summary(self, session_id: Any) -> Tuple[str, List[str]]:
+        """Summary text and the hashes of the messages folded into it, oldest first."""
+        entry = self.summaries.get(str(session_id))
+        if entry is None:
+            return "", []
+        payload, stored_at = entry
+        if time.time() - stored_at > self.ttl:
+            return "", []
+        try:
+            data = json.loads(payload.decode('utf-8'))
+            # Summaries written before folded hashes were kept only record the last one
+            return data['summary'], data.get('folded') or [data['covered']]
+        except (ValueError, KeyError) as e:
+            logger.error(f"Discarding unreadable chat summary: {e}")
+            return "", []
+
+    def _queue_update(self, session_id: Any, summary: str, messages: List[Dict[str, str]], folded: List[str]) -> None:
+        key = str(session_id)
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+        folded = (folded + [_message_hash(message) for message in messages])[-FOLDED_HASHES:]
+        _summary_executor.submit(self._update_summary, key, summary, messages, folded)
+
+    def _update_summary(self, key: str, summary: str, messages: List[Dict[str, str]], folded: List[str]) -> None:
+        try:
+            updated = clip_to_tokens(self.summarize(summary, messages, self.summary_tokens).strip(), self.summary_tokens)
+            payload = json.dumps({'summary': updated, 'covered': folded[-1], 'folded': folded}).encode('utf-8')
+            self.summaries.set(key, payload, time.time(), self.ttl)
+            with self._lock:
+                self._counts['summary_updates'] += 1
+        except Exception as e:
+            logger.error(f"Chat summary update failed: {e}")
+            with self._lock:
+                self._counts['summary_errors'] += 1
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def reset(self, session_id: Any) -> None:
+        """Forget a session's summary (new conversation)."""
+        self.summaries.delete(str(session_id))
+
+    # ------------------------------------------------------------------
+    # Counters
+    # ------------------------------------------------------------------
+
+    def record_prompt(self, prompt: str) -> int:
+        """
+        Count the tokens of a finished answer prompt.
+
+        Returns:
+            Estimated prompt tokens
+        """
+        tokens = estimate_tokens(prompt)
+        with self._lock:
+            self._counts['prompt_tokens'] += tokens
+            self._counts['max_prompt_tokens'] = max(self._counts['max_prompt_tokens'], tokens)
+        return tokens
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counts)
+            stats['pending_summaries'] = len(self._pending)
+        turns = stats['turns']
+        stats['avg_history_tokens'] = stats['history_tokens'] / turns if turns else 0.0
+        stats['avg_prompt_tokens'] = stats['prompt_tokens'] / turns if turns else 0.0
+        stats['token_budget'] = self.token_budget
+        stats['max_turns'] = self.max_turns
+        return stats
+
+
+# Singleton instance
+_history_manager_instance = None
+
+
+def get_history_manager(
+    summarize: Optional[Callable[[str, List[Dict[str, str]], int], str]] = None
+) -> HistoryManager:
+    """
+    Get or create the shared history manager.
+
+    Args:
+        summarize: Summary function, used when the manager is created
+                   (or set later if it was created without one)
+    """
+    global _history_manager_instance
+    if _history_manager_instance is None:
+        _history_manager_instance = HistoryManager(summarize)
+    elif summarize is not None and _history_manager_instance.summarize is None:
+        _history_manager_instance.summarize = summarize
+    return _history_manager_instance
@@ -0,0 +1,283 @@
+"""
+Chat Session Store
+Bounded per-user chat histories in a compact encoding, kept in process,
+in the application database or on a Redis-compatible server so every
+worker sees the same conversation
+"""
+
+import json
+import os
+import zlib
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from api.cache import CacheStats, LRUCache, redact_url
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Per-session caps: oldest messages are dropped first
+CHAT_SESSION_MAX_MESSAGES = int(os.getenv("CHAT_SESSION_MAX_MESSAGES", "40"))
+CHAT_SESSION_MAX_CHARS = int(os.getenv("CHAT_SESSION_MAX_CHARS", "24000"))
+
+# Sessions idle for longer than this are forgotten
+CHAT_SESSION_TTL = float(os.getenv("CHAT_SESSION_TTL", str(7 * 24 * 3600)))
+
+# Sessions kept by the in-process backend
+CHAT_SESSION_MAX_SESSIONS = int(os.getenv("CHAT_SESSION_MAX_SESSIONS", "5000"))
+
+# Message types as stored (one letter each) and as used by the chat route
+_TYPE_CODES = {'human': 'h', 'ai': 'a'}
+_CODE_TYPES = {code: message_type for message_type, code in _TYPE_CODES.items()}
+
+
+def trim_history(
+    messages: List[Dict[str, str]],
+    max_messages: int = CHAT_SESSION_MAX_MESSAGES,
+    max_chars: int = CHAT_SESSION_MAX_CHARS
+) -> List[Dict[str, str]]:
+    """
+    Newest messages that fit both caps.
+
+    Args:
+        messages: {"type": "human" | "ai", "content"} dictionaries, oldest first
+        max_messages: Maximum number of messages kept
+        max_chars: Maximum summed content length kept
+
+    Returns:
+        Suffix of `messages`, starting with a human message when possible
+    """
+    kept, chars = [], 0
+    for message in reversed(messages[-max_messages:] if max_messages > 0 else []):
+        chars += len(message['content'])
+        if kept and chars > max_chars:
+            break
+        kept.append(message)
+    kept.reverse()
+    # Never start the history with a reply whose question was dropped
+    while len(kept) > 1 and kept[0]['type'] != 'human':
+        kept.pop(0)
+    return kept
+
+
+def encode_history(messages: List[Dict[str, str]]) -> bytes:
+    """Compact form: zlib-compressed JSON array of [type code, content] pairs."""
+    pairs = [[_TYPE_CODES.get(message['type'], 'a'), message['content']] for message in messages]
+    return zlib.compress(json.dumps(pairs, separators=(',', ':'), ensure_ascii=False).encode('utf-8'))
+
+
+def decode_history(payload: Optional[bytes]) -> List[Dict[str, str]]:
+    """Inverse of encode_history; unreadable payloads decode to an empty history."""
+    if not payload:
+        return []
+    try:
+        pairs = json.loads(zlib.decompress(payload).decode('utf-8'))
+        return [{'type': _CODE_TYPES.get(code, 'ai'), 'content': content} for code, content in pairs]
+    except (zlib.error, ValueError, TypeError) as e:
+        logger.error(f"Discarding unreadable chat session: {e}")
+        return []
+
+
+class ChatSessionStore:
+    """
+    Interface of a chat history backend.
+
+    Histories are lists of {"type": "human" | "ai", "content"} dictionaries
+    keyed by session id (the user id); save() applies the per-session caps
+    and restarts the idle TTL.
+    """
+
+    name = 'base'
+
+    def __init__(self, ttl: float = CHAT_SESSION_TTL):
+        self.ttl = ttl
+        self.stats = CacheStats()
+
+    def get(self, session_id: Any) -> List[Dict[str, str]]:
+        payload = self._read(str(session_id))
+        self.stats.incr('hits' if payload else 'misses')
+        return decode_history(payload)
+
+    def save(self, session_id: Any, messages: List[Dict[str, str]]) -> None:
+        self._write(str(session_id), encode_history(trim_history(messages)))
+
+    def clear(self, session_id: Any) -> None:
+        self._delete(str(session_id))
+
+    def _read(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def _write(self, key: str, payload: bytes) -> None:
+        raise NotImplementedError
+
+    def _delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def info(self) -> Dict[str, Any]:
+        info = self.stats.as_dict()
+        info.update({'backend': self.name, 'ttl': self.ttl,
+                     'max_messages': CHAT_SESSION_MAX_MESSAGES, 'max_chars': CHAT_SESSION_MAX_CHARS})
+        return info
+
+
+class MemorySessionStore(ChatSessionStore):
+    """Per-process LRU of encoded sessions; history is lost on restart and not shared by workers."""
+
+    name = 'memory'
+
+    def __init__(self, ttl: float = CHAT_SESSION_TTL, max_sessions: int = CHAT_SESSION_MAX_SESSIONS):
+        super().__init__(ttl)
+        self.sessions = LRUCache(max_entries=max_sessions, ttl=ttl)
+
+    def _read(self, key: str) -> Optional[bytes]:
+        return self.sessions.get(key)
+
+    def _write(self, key: str, payload: bytes) -> None:
+        self.sessions.set(key, payload)
+
+    def _delete(self, key: str) -> None:
+        self.sessions.delete(key)
+
+    def info(self) -> Dict[str, Any]:
+        info = super().info()
+        info.update({'sessions': len(self.sessions), 'bytes': self.sessions.info()['bytes']})
+        return info
+
+
+class SQLSessionStore(ChatSessionStore):
+    """
+    Sessions in the chat_session table of the application database.
+    Must be used inside a Flask app context; expired rows are pruned every
+    PRUNE_EVERY writes.
+    """
+
+    name = 'sql'
+
+    PRUNE_EVERY = 500
+
+    def __init__(self, ttl: float = CHAT_SESSION_TTL):
+        super().__init__(ttl)
+        from models import db, ChatSession
+        self.db = db
+        self.model = ChatSession
+        self._writes = 0
+
+    def _cutoff(self) -> datetime:
+        return datetime.utcnow() - timedelta(seconds=self.ttl)
+
+    def _read(self, key: str) -> Optional[bytes]:
+        try:
+            row = self.db.session.get(self.model, int(key))
+        except Exception as e:
+            logger.error(f"Chat session read failed: {e}")
+            self.db.session.rollback()
+            self.stats.incr('errors')
+            return None
+        if row is None or row.updated_at < self._cutoff():
+            return None
+        return row.history
+
+    def _write(self, key: str, payload: bytes) -> None:
+        try:
+            row = self.db.session.get(self.model, int(key))
+            if row is None:
+                row = self.model(user_id=int(key))
+                self.db.session.add(row)
+            row.history = payload
+            row.updated_at = datetime.utcnow()
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self.model.query.filter(self.model.updated_at < self._cutoff()).delete()
+            self.db.session.commit()
+        except Exception as e:
+            logger.error(f"Chat session write failed: {e}")
+            self.db.session.rollback()
+            self.stats.incr('errors')
+
+    def _delete(self, key: str) -> None:
+        self.model.query.filter_by(user_id=int(key)).delete()
+        self.db.session.commit()
+
+
+class RedisSessionStore(ChatSessionStore):
+    """
+    Sessions on any Redis-compatible server (Redis, Valkey, KeyDB, a local
+    stand-in); the idle TTL is the key expiry.
+    """
+
+    name = 'redis'
+
+    def __init__(self, url: str, ttl: float = CHAT_SESSION_TTL, prefix: str = 'frameiq:chat:'):
+        super().__init__(ttl)
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("The redis chat session store requires the 'redis' package (pip install redis)")
+        self.url = url
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+
+    def _read(self, key: str) -> Optional[bytes]:
+        try:
+            return self.client.get(self.prefix + key)
+        except Exception as e:
+            logger.error(f"Redis chat session read failed: {e}")
+            self.stats.incr('errors')
+            return None
+
+    def _write(self, key: str, payload: bytes) -> None:
+        try:
+            self.client.set(self.prefix + key, payload, px=max(1, int(self.ttl * 1000)))
+        except Exception as e:
+            logger.error(f"Redis chat session write failed: {e}")
+            self.stats.incr('errors')
+
+    def _delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+    def info(self) -> Dict[str, Any]:
+        info = super().info()
+        info['server'] = redact_url(self.url)
+        return info
+
+
+def create_session_store(kind: Optional[str] = None) -> ChatSessionStore:
+    """
+    Build the chat session store from configuration.
+
+    Environment variables:
+    - CHAT_SESSION_BACKEND: memory (default), sql or redis
+    - CHAT_SESSION_REDIS_URL: server URL (redis backend, defaults to CACHE_REDIS_URL)
+
+    Falls back to the in-process store if the shared one cannot be opened.
+
+    Args:
+        kind: Backend name, overriding CHAT_SESSION_BACKEND
+
+    Returns:
+        ChatSessionStore instance
+    """
+    kind = (kind or os.getenv("CHAT_SESSION_BACKEND", "memory")).lower()
+    try:
+        if kind == 'sql':
+            return SQLSessionStore()
+        if kind == 'redis':
+            url = os.getenv("CHAT_SESSION_REDIS_URL") or os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+            return RedisSessionStore(url)
+    except Exception as e:
+        logger.error(f"Could not open {kind} chat session store, using in-process store: {e}")
+    return MemorySessionStore()
+
+
+# Singleton instance
+_session_store_instance = None
+
+
+def get_session_store() -> ChatSessionStore:
+    """Get or create the shared chat session store."""
+    global _session_store_instance
+    if _session_store_instance is None:
+        _session_store_instance = create_session_store()
+    return _session_store_instance
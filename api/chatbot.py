@@ -5,6 +5,8 @@ from dotenv import load_dotenv
 from datetime import datetime
 import re
 
+from api.llm_gateway import get_llm_gateway
+
 # Load environment variables
 load_dotenv()
 
@@ -13,6 +15,12 @@ GROQ_API_KEY = os.getenv("groq_api_key")
 # Default model
 DEFAULT_MODEL = "llama-3.3-70b-versatile"
 
+# Models that classify prompts instead of answering them
+SAFETY_MODELS = ("meta-llama/llama-guard-4-12b",)
+
+# Small fast model that folds old chat turns into the rolling summary
+SUMMARY_MODEL = os.getenv("CHAT_SUMMARY_MODEL", "llama-3.1-8b-instant")
+
 # Dictionary to store model-specific chatbots
 model_chatbots = {}
 
@@ -65,6 +73,95 @@ def clean_json_response(content):
     
     return content
 
+# Single-pass replies end with this marker followed by the recommended titles as JSON
+MEDIA_JSON_MARKER = "MEDIA_JSON:"
+
+# Appended to answer prompts so the reply carries its own title list (no extraction call)
+STRUCTURED_REPLY_INSTRUCTIONS = f"""**Output format:**
+Write your reply for the user first. Then, on a new line at the very end, write {MEDIA_JSON_MARKER} followed by
+a single-line JSON object listing every title you recommended, in order:
+{MEDIA_JSON_MARKER} {{"movies": [{{"title": "...", "year": 2010}}], "tv_shows": [{{"title": "...", "year": null}}]}}
+- Anime movies go in "movies", anime series in "tv_shows"
+- Use the plain title only (no director names, no "(anime)" suffixes); year is a number or null
+- If you did not recommend any title (e.g. you asked a question), use empty lists
+- Never mention {MEDIA_JSON_MARKER} or the JSON in the reply itself"""
+
+
+def with_structured_media(prompt):
+    """Answer prompt plus the trailing MEDIA_JSON instructions"""
+    return f"{prompt}\n\n{STRUCTURED_REPLY_INSTRUCTIONS}"
+
+
+def split_structured_reply(content):
+    """
+    Split a single-pass reply into the text for the user and its media lists.
+    
+    Args:
+        content: Raw model output, optionally ending with a MEDIA_JSON block
+    
+    Returns:
+        Tuple of (reply, movies, tv_shows); movies and tv_shows are None when
+        the block is missing or not valid JSON, so callers can fall back
+    """
+    marker = content.rfind(MEDIA_JSON_MARKER)
+    if marker < 0:
+        return content.strip(), None, None
+    
+    reply = content[:marker].rstrip()
+    # Models sometimes open a code fence or bold the marker; drop the leftovers
+    reply = re.sub(r"(```(json)?|\*\*)\s*$", "", reply).rstrip()
+    try:
+        data = json.loads(clean_json_response(content[marker + len(MEDIA_JSON_MARKER):].strip()))
+    except json.JSONDecodeError:
+        print(f"Invalid MEDIA_JSON block: {content[marker:][:200]}")
+        return reply, None, None
+    if not isinstance(data, dict):
+        return reply, None, None
+    
+    def entries(items):
+        return [
+            {"title": str(item["title"]).strip(), "year": item.get("year")}
+            for item in (items if isinstance(items, list) else [])
+            if isinstance(item, dict) and str(item.get("title") or "").strip()
+        ]
+    return reply, entries(data.get("movies")), entries(data.get("tv_shows"))
+
+class MediaJsonStreamFilter:
+    """
+    Passes a streamed reply through chunk by chunk, withholding the trailing
+    MEDIA_JSON block (and any partial marker at the end of a chunk).
+    """
+    
+    def __init__(self):
+        self._pending = ""
+        self._done = False
+    
+    def feed(self, text):
+        """Text that is safe to show now"""
+        if self._done:
+            return ""
+        self._pending += text
+        marker = self._pending.find(MEDIA_JSON_MARKER)
+        if marker >= 0:
+            self._done = True
+            visible, self._pending = self._pending[:marker], ""
+            return visible
+        # Hold back the longest tail that could still turn into the marker
+        keep = 0
+        for size in range(min(len(MEDIA_JSON_MARKER) - 1, len(self._pending)), 0, -1):
+            if MEDIA_JSON_MARKER.startswith(self._pending[-size:]):
+                keep = size
+                break
+        cut = len(self._pending) - keep
+        visible, self._pending = self._pending[:cut], self._pending[cut:]
+        return visible
+    
+    def flush(self):
+        """Whatever was held back, once the stream has ended without a marker"""
+        visible = "" if self._done else self._pending
+        self._pending = ""
+        return visible
+
 def is_recent_release(date_string, months_threshold=6):
     """Check if a release date is recent (within the last N months)."""
     if not date_string:
@@ -129,23 +226,51 @@ def extract_media_with_llm(bot_reply, model_name="llama-3.3-70b-versatile"):
     """
     
     try:
-        # Get the chatbot for the specified model
-        chatbot = get_chatbot(model_name)
-        analysis_response = chatbot.invoke(llm_prompt)
+        # Through the gateway, so an unhealthy model is routed around
+        analysis_content, _ = get_llm_gateway().invoke(llm_prompt, model_name)
         
         # Clean the JSON response by removing any markdown code block syntax
-        cleaned_content = clean_json_response(analysis_response.content)
+        cleaned_content = clean_json_response(analysis_content)
         analysis_data = json.loads(cleaned_content)
         
         return analysis_data.get("movies", []), analysis_data.get("tv_shows", [])
     except json.JSONDecodeError as e:
-        print(f"Invalid JSON from LLM analysis: {analysis_response.content}")
+        print(f"Invalid JSON from LLM analysis: {analysis_content}")
         print(f"JSON decode error: {e}")
         return [], []
     except Exception as e:
         print(f"Error in LLM media extraction: {e}")
         return [], []
 
+def summarize_conversation(previous_summary, messages, max_tokens, model_name=SUMMARY_MODEL):
+    """
+    Fold older chat messages into the running conversation summary.
+    
+    Args:
+        previous_summary: Summary so far ("" for none)
+        messages: {"type": "human" | "ai", "content"} dictionaries to fold in
+        max_tokens: Length cap of the new summary
+        model_name: Model used for the summary
+    
+    Returns:
+        Updated summary text
+    """
+    conversation = "\n".join(
+        f"{'User' if msg['type'] == 'human' else 'Assistant'}: {msg['content']}" for msg in messages
+    )
+    prompt = f"""Update the summary of a conversation between a user and a movie/TV recommendation assistant.
+Keep the user's stated tastes, dislikes, languages, platforms and the titles already recommended or rejected.
+Drop greetings and anything else a later recommendation would not need.
+Answer with the summary only, in at most {max_tokens * 3 // 4} words.
+
+Current summary:
+{previous_summary or "(none)"}
+
+New messages:
+{conversation}"""
+    summary, _ = get_llm_gateway().invoke(prompt, model_name)
+    return summary
+
 def extract_media_titles(text):
     """
     Extract potential movie/TV show titles from text, with special handling for new releases.
@@ -498,6 +623,6 @@ def is_safety_model_response(content, model_name):
     """
     Check if the response is from a safety model (like Llama Guard) that returns "safe"
     """
-    if model_name == "meta-llama/llama-guard-4-12b":
+    if model_name in SAFETY_MODELS:
         return content.lower().strip() == "safe"
     return False
\ No newline at end of file
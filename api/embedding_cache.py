@@ -0,0 +1,215 @@
+"""
+Embedding Caches
+Persists each catalog item's embedding with a content hash so
+generate_embeddings.py only re-encodes and re-uploads items whose description
+or metadata changed, and keeps recently used query embeddings so repeated
+chat searches skip the encoder
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import threading
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from api.cache import LRUCache
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def description_hash(description: str, model_name: str) -> str:
+    """Key for the embedding itself: same text + same model = same vector."""
+    return hashlib.sha256(f"{model_name}\n{description}".encode('utf-8')).hexdigest()
+
+
+def record_hash(embedding_key: str, metadata: Dict[str, Any]) -> str:
+    """Key for the stored record: embedding plus metadata, so metadata-only edits are re-uploaded."""
+    payload = embedding_key + json.dumps(metadata, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    id -> (embedding key, record key, vector), stored as one .npz file.
+
+    Vectors are reused whenever the embedding key matches; an item whose
+    record key also matches is already in Chroma and needs no upsert.
+    """
+
+    def __init__(self, path: str, model_name: str):
+        self.path = path
+        self.model_name = model_name
+        self.entries: Dict[str, Tuple[str, str, np.ndarray]] = {}
+
+    def load(self) -> int:
+        """
+        Read the cache file, discarding it if it was written for another model.
+
+        Returns:
+            Number of cached items
+        """
+        if not os.path.exists(self.path):
+            return 0
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if str(data['model']) != self.model_name:
+                    logger.info(f"Embedding cache was built with {data['model']}, ignoring it")
+                    return 0
+                for item_id, embed_key, rec_key, vector in zip(
+                    data['ids'], data['embedding_keys'], data['record_keys'], data['vectors']
+                ):
+                    self.entries[str(item_id)] = (str(embed_key), str(rec_key), vector)
+        except (OSError, KeyError, ValueError) as e:
+            logger.error(f"Could not read embedding cache {self.path}: {e}")
+            self.entries = {}
+        return len(self.entries)
+
+    def save(self) -> None:
+        """Write the cache atomically (temp file + rename)."""
+        if not self.entries:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        ids = list(self.entries)
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            model=np.array(self.model_name),
+            ids=np.array(ids),
+            embedding_keys=np.array([self.entries[i][0] for i in ids]),
+            record_keys=np.array([self.entries[i][1] for i in ids]),
+            vectors=np.stack([self.entries[i][2] for i in ids]).astype(np.float32)
+        )
+        os.replace(tmp_path, self.path)
+
+    def vector_for(self, item_id: str, embedding_key: str) -> Optional[np.ndarray]:
+        entry = self.entries.get(item_id)
+        return entry[2] if entry is not None and entry[0] == embedding_key else None
+
+    def put(self, item_id: str, embedding_key: str, rec_key: str, vector) -> None:
+        self.entries[item_id] = (embedding_key, rec_key, np.asarray(vector, dtype=np.float32))
+
+    def remove(self, item_id: str) -> None:
+        self.entries.pop(item_id, None)
+
+    def diff(self, records: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+        """
+        Classify catalog records against the cache.
+
+        Args:
+            records: Dictionaries with id, embedding_key and record_key
+
+        Returns:
+            Dictionary of new / changed / unchanged / deleted id lists; changed
+            items are split into reembed (description changed) and metadata_only
+        """
+        report = {'new': [], 'changed': [], 'reembed': [], 'metadata_only': [], 'unchanged': [], 'deleted': []}
+        seen = set()
+        for record in records:
+            item_id = record['id']
+            seen.add(item_id)
+            entry = self.entries.get(item_id)
+            if entry is None:
+                report['new'].append(item_id)
+            elif entry[1] == record['record_key']:
+                report['unchanged'].append(item_id)
+            else:
+                report['changed'].append(item_id)
+                report['metadata_only' if entry[0] == record['embedding_key'] else 'reembed'].append(item_id)
+        report['deleted'] = [item_id for item_id in self.entries if item_id not in seen]
+        return report
+
+
+def normalize_query(text: str) -> str:
+    """Cache key for a query: lower case, whitespace collapsed (the encoder is uncased)."""
+    return " ".join(str(text).lower().split())
+
+
+class QueryEmbeddingCache:
+    """
+    LRU cache of query text -> embedding, optionally saved to an .npz file so a
+    restarted worker starts warm. The file is written every `save_every` new
+    entries and at interpreter exit.
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[List[str]], np.ndarray],
+        model_name: str,
+        max_entries: int = 4096,
+        path: Optional[str] = None,
+        save_every: int = 256
+    ):
+        self.encode = encode
+        self.model_name = model_name
+        self.path = path
+        self.save_every = save_every
+        self.cache = LRUCache(max_entries=max_entries, sizeof=lambda vector: 1)
+        self._unsaved = 0
+        self._save_lock = threading.Lock()
+        if path:
+            self.load()
+            atexit.register(self.save)
+
+    def get(self, text: str) -> np.ndarray:
+        """
+        Embedding for a query, encoding it on a miss.
+
+        Args:
+            text: Query text
+
+        Returns:
+            Unit-length float32 vector
+        """
+        key = normalize_query(text)
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = self.encode([key])[0]
+            self.cache.set(key, vector)
+            self._unsaved += 1
+            if self.path and self._unsaved >= self.save_every:
+                self.save()
+        return vector
+
+    def load(self) -> int:
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if str(data['model']) != self.model_name:
+                    return 0
+                for key, vector in zip(data['keys'], data['vectors']):
+                    self.cache.set(str(key), vector)
+        except (OSError, KeyError, ValueError) as e:
+            logger.error(f"Could not read query embedding cache {self.path}: {e}")
+        logger.info(f"Loaded {len(self.cache)} cached query embeddings")
+        return len(self.cache)
+
+    def save(self) -> None:
+        items = self.cache.items()
+        if not self.path or not items:
+            return
+        with self._save_lock:
+            self._unsaved = 0
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                tmp_path = f"{self.path}.{os.getpid()}.tmp.npz"
+                np.savez(
+                    tmp_path,
+                    model=np.array(self.model_name),
+                    keys=np.array([key for key, _ in items]),
+                    vectors=np.stack([vector for _, vector in items]).astype(np.float32)
+                )
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.error(f"Could not save query embedding cache {self.path}: {e}")
+
+    def info(self) -> Dict[str, Any]:
+        info = self.cache.info()
+        info['persisted_to'] = self.path
+        return info
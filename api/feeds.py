@@ -0,0 +1,113 @@
+"""
+Home Page Feed Loader
+Fetches the home page's TMDb rows concurrently under an overall deadline
+"""
+
+import os
+import threading
+import time
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+
+from api.tmdb_client import (
+    fetch_now_playing_movies, fetch_popular_movies, fetch_upcoming_movies,
+    fetch_trending_people, fetch_airing_today_shows, fetch_on_the_air_shows,
+    fetch_popular_shows, fetch_trending_movies
+)
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Seconds the home page waits for TMDb before rendering whatever rows are ready
+HOME_FEED_DEADLINE = float(os.getenv("HOME_FEED_DEADLINE", "4"))
+
+# Independent home page rows, keyed by template variable name
+HOME_FEEDS = {
+    'trending_backdrops': fetch_trending_movies,
+    'now_playing': fetch_now_playing_movies,
+    'popular': fetch_popular_movies,
+    'airing_today': fetch_airing_today_shows,
+    'on_the_air': fetch_on_the_air_shows,
+    'popular_shows': fetch_popular_shows,
+    'trending_people': fetch_trending_people,
+}
+
+# Shared by all requests; feeds that miss the deadline keep running and warm the cache
+_feed_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='home-feed')
+
+
+def load_home_feeds(deadline: Optional[float] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Load every home page row in parallel.
+
+    Upcoming movies depend on the now-playing and popular rows (their ids are
+    excluded), so that row is submitted from a done-callback once both have
+    finished; no pool worker ever waits on another task. Rows that fail or are
+    still pending when the deadline passes render as empty lists.
+
+    Args:
+        deadline: Overall time budget in seconds (defaults to HOME_FEED_DEADLINE)
+
+    Returns:
+        Dictionary of row name -> list of items
+    """
+    deadline = HOME_FEED_DEADLINE if deadline is None else deadline
+    deadline_at = time.monotonic() + deadline
+
+    futures = {name: _feed_executor.submit(fetch) for name, fetch in HOME_FEEDS.items()}
+    futures['upcoming'] = _chain_upcoming([futures['now_playing'], futures['popular']])
+
+    wait(futures.values(), timeout=max(0.0, deadline_at - time.monotonic()))
+
+    feeds = {}
+    for name, future in futures.items():
+        if not future.done():
+            logger.warning(f"Home feed '{name}' missed the {deadline}s deadline, rendering without it")
+            feeds[name] = []
+        elif future.exception() is not None:
+            logger.error(f"Home feed '{name}' failed: {future.exception()}")
+            feeds[name] = []
+        else:
+            feeds[name] = future.result()
+    return feeds
+
+
+def _chain_upcoming(dependencies: List[Future]) -> Future:
+    """
+    Future for the upcoming row, started once every dependency has finished.
+
+    Returns:
+        Future resolved with fetch_upcoming_movies(exclude_ids=...) of the
+        dependencies' movie ids
+    """
+    upcoming = Future()
+    remaining = [len(dependencies)]
+    lock = threading.Lock()
+
+    def relay(task: Future) -> None:
+        if task.exception() is not None:
+            upcoming.set_exception(task.exception())
+        else:
+            upcoming.set_result(task.result())
+
+    def dependency_done(_: Future) -> None:
+        with lock:
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+        exclude_ids = set()
+        for dependency in dependencies:
+            if dependency.exception() is None:
+                exclude_ids |= {movie['id'] for movie in dependency.result() or []}
+            # A failed row can't be deduped against; show upcoming anyway
+        try:
+            _feed_executor.submit(fetch_upcoming_movies, exclude_ids=exclude_ids).add_done_callback(relay)
+        except RuntimeError as e:
+            # Executor shut down (interpreter exit)
+            upcoming.set_exception(e)
+
+    for dependency in dependencies:
+        dependency.add_done_callback(dependency_done)
+    return upcoming
@@ -0,0 +1,235 @@
+"""
+Lexical Index for Hybrid Retrieval
+In-memory BM25 inverted index over catalog metadata (titles, keywords, cast,
+crew, genres) and reciprocal rank fusion with vector search results
+"""
+
+import math
+import threading
+import time
+import logging
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from api.title_index import MIN_TITLE_COVERAGE, normalize_title
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Metadata fields indexed (as written by prepare_metadata) and their term weights
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'original_title': 3.0,
+    'alternative_titles': 2.0,
+    'collection_name': 2.0,
+    'director': 1.5,
+    'created_by': 1.5,
+    'cast': 1.0,
+    'keywords': 1.0,
+    'genres': 1.0,
+}
+
+# Fields that identify an item by name, used by title resolution
+TITLE_FIELDS = ('title', 'original_title', 'alternative_titles')
+
+STOPWORDS = {
+    'a', 'an', 'and', 'the', 'of', 'in', 'on', 'to', 'for', 'with', 'like', 'me', 'some', 'movie',
+    'movies', 'film', 'films', 'show', 'shows', 'series', 'tv', 'similar', 'suggest', 'recommend',
+    'want', 'watch', 'something', 'good', 'best', 'any', 'is', 'are', 'i', 'that', 'from', 'about'
+}
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Standard reciprocal rank fusion constant
+RRF_K = 60
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in normalize_title(text).split() if token not in STOPWORDS]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = RRF_K) -> List[Tuple[str, float]]:
+    """
+    Fuse ranked id lists: score(id) = sum over lists of 1 / (k + rank).
+
+    Args:
+        rankings: Ranked id lists, best first
+        k: Damping constant
+
+    Returns:
+        (id, fused score) pairs, best first
+    """
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda pair: pair[1], reverse=True)
+
+
+class BM25Index:
+    """
+    Field-weighted BM25 over catalog metadata.
+
+    Each item is one document whose term frequencies are the field-weighted
+    token counts across FIELD_WEIGHTS. Items can be added or removed
+    incrementally; build() replaces everything.
+    """
+
+    def __init__(self):
+        self.source = None
+        self.built_at = 0.0
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._lengths: Dict[str, float] = {}
+        self._title_tokens: Dict[str, frozenset] = {}
+        self._metadata: Dict[str, Dict[str, Any]] = {}
+        self._total_length = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self.built_at > 0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    @staticmethod
+    def _terms(metadata: Dict[str, Any]) -> Counter:
+        terms = Counter()
+        for field, weight in FIELD_WEIGHTS.items():
+            value = metadata.get(field)
+            if not value or value == 'Unknown':
+                continue
+            for token in tokenize(str(value).replace('|', ' ')):
+                terms[token] += weight
+        return terms
+
+    def _insert(self, item_id: str, metadata: Dict[str, Any]) -> None:
+        terms = self._terms(metadata)
+        for token, weight in terms.items():
+            self._postings.setdefault(token, {})[item_id] = weight
+        length = sum(terms.values())
+        self._lengths[item_id] = length
+        self._total_length += length
+        self._title_tokens[item_id] = frozenset(
+            token for field in TITLE_FIELDS for token in tokenize(str(metadata.get(field) or '').replace('|', ' '))
+        )
+        self._metadata[item_id] = metadata
+
+    def _discard(self, item_id: str) -> None:
+        metadata = self._metadata.pop(item_id, None)
+        if metadata is None:
+            return
+        for token in self._terms(metadata):
+            posting = self._postings.get(token)
+            if posting is not None:
+                posting.pop(item_id, None)
+                if not posting:
+                    del self._postings[token]
+        self._total_length -= self._lengths.pop(item_id, 0.0)
+        self._title_tokens.pop(item_id, None)
+
+    def build(self, rows: Iterable[Tuple[str, Dict[str, Any], Any]], source: Any = None) -> int:
+        """
+        Replace the index contents.
+
+        Args:
+            rows: (id, metadata, document) tuples; documents are not indexed
+            source: Identifier of the data the index was built from
+
+        Returns:
+            Number of items indexed
+        """
+        fresh = BM25Index()
+        for item_id, metadata, _ in rows:
+            fresh._insert(item_id, metadata or {})
+        with self._lock:
+            self._postings, self._lengths = fresh._postings, fresh._lengths
+            self._title_tokens, self._metadata = fresh._title_tokens, fresh._metadata
+            self._total_length = fresh._total_length
+            self.source = source
+            self.built_at = time.time()
+        logger.info(f"Lexical index built: {len(self._lengths)} items, {len(self._postings)} terms")
+        return len(self._lengths)
+
+    def add(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            for item_id, metadata in zip(ids, metadatas):
+                self._discard(item_id)
+                self._insert(item_id, metadata or {})
+
+    def remove(self, item_id: str) -> None:
+        with self._lock:
+            self._discard(item_id)
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 50,
+        predicate: Optional[Callable[[Dict[str, Any]], bool]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        BM25 ranking for a free-text query.
+
+        Args:
+            query: Free text
+            top_k: Number of results
+            predicate: Optional metadata test; items failing it are dropped before the cut-off
+
+        Returns:
+            (id, score) pairs, best first
+        """
+        tokens = set(tokenize(query))
+        with self._lock:
+            n = len(self._lengths)
+            if not tokens or not n:
+                return []
+            avgdl = self._total_length / n
+            scores = defaultdict(float)
+            for token in tokens:
+                posting = self._postings.get(token)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                for item_id, tf in posting.items():
+                    norm = K1 * (1 - B + B * self._lengths[item_id] / avgdl)
+                    scores[item_id] += idf * tf * (K1 + 1) / (tf + norm)
+            if predicate is not None:
+                scores = {item_id: score for item_id, score in scores.items() if predicate(self._metadata[item_id])}
+        return sorted(scores.items(), key=lambda pair: pair[1], reverse=True)[:top_k]
+
+    def resolve_title(self, title: str, year: Optional[str] = None) -> Optional[str]:
+        """
+        Best item with a title containing every token of `title` and made up
+        of at least MIN_TITLE_COVERAGE of them (and, if given, released in
+        `year`); catches word-order and partial titles the exact title index
+        misses.
+
+        Returns:
+            Item id or None
+        """
+        wanted = set(tokenize(title))
+        if not wanted:
+            return None
+        for item_id, _ in self.search(title, top_k=20):
+            with self._lock:
+                title_tokens = self._title_tokens.get(item_id, frozenset())
+                metadata = self._metadata.get(item_id, {})
+            if not wanted <= title_tokens or not self._covers(wanted, metadata):
+                continue
+            if year and str(metadata.get('release_year', '')) != str(year):
+                continue
+            return item_id
+        return None
+
+    @staticmethod
+    def _covers(wanted: set, metadata: Dict[str, Any]) -> bool:
+        """Whether one of the item's titles is (nearly) all of `wanted`: "alien" alone is not "Alien: Romulus"."""
+        for field in TITLE_FIELDS:
+            for title in str(metadata.get(field) or '').split('|'):
+                tokens = set(tokenize(title))
+                if tokens and wanted <= tokens and len(wanted) >= MIN_TITLE_COVERAGE * len(tokens):
+                    return True
+        return False
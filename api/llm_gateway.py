@@ -0,0 +1,498 @@
+"""
+LLM Gateway
+Single entry point for chat model calls: async invocation on a shared worker
+pool, per-model latency and error tracking, a circuit breaker that routes
+around degraded models before they fail a request, optional hedging to a
+fast fallback model, and a fake model for offline runs
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Fast model used when the requested one is unavailable, slow or (for safety models) not an answerer
+LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", "llama-3.1-8b-instant")
+
+# Model that backs up the fallback model itself
+LLM_SECONDARY_FALLBACK = os.getenv("LLM_SECONDARY_FALLBACK", "llama-3.3-70b-versatile")
+
+# Seconds before a call is abandoned
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+
+# Hedging: start the fallback model too once the primary is slower than this latency percentile
+LLM_HEDGE = os.getenv("LLM_HEDGE", "false").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+
+# Circuit breaker: consecutive failures or windowed error rate that open it, and how long it stays open
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+# Calls slower than this count as failures for the breaker (0 disables)
+LLM_SLOW_CALL = float(os.getenv("LLM_SLOW_CALL", "20"))
+
+# Serve every model from FakeChatModel (offline development and tests)
+LLM_FAKE = os.getenv("LLM_FAKE", "false").lower() == "true"
+
+# Calls recorded per model for percentiles and error rates
+WINDOW_SIZE = 100
+
+# Fewest recorded calls before percentiles and error rates are trusted
+MIN_SAMPLES = 10
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class FakeMessage:
+    """Stand-in for a LangChain message: the generated text in .content."""
+
+    def __init__(self, content: str):
+        self.content = content
+
+
+class FakeChatModel:
+    """
+    Offline chat model with the invoke / stream interface of ChatGroq.
+
+    Replies with `reply` (by default an echo of the prompt's last line) after
+    `latency` seconds, and raises RuntimeError with probability `error_rate`.
+    """
+
+    def __init__(
+        self,
+        reply: Optional[str] = None,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        chunk_size: int = 8
+    ):
+        self.reply = reply
+        self.latency = latency
+        self.error_rate = error_rate
+        self.chunk_size = chunk_size
+        self.calls = 0
+
+    def _answer(self, prompt: Any) -> str:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            raise RuntimeError("Fake model failure")
+        if self.reply is not None:
+            return self.reply
+        last_line = str(prompt).strip().splitlines()[-1] if str(prompt).strip() else ""
+        return f"(offline reply) {last_line}"
+
+    def invoke(self, prompt: Any) -> FakeMessage:
+        return FakeMessage(self._answer(prompt))
+
+    def stream(self, prompt: Any) -> Iterator[FakeMessage]:
+        text = self._answer(prompt)
+        for start in range(0, len(text), self.chunk_size):
+            yield FakeMessage(text[start:start + self.chunk_size])
+
+
+class ModelHealth:
+    """
+    Rolling latency / outcome window and circuit breaker of one model.
+
+    The breaker opens after `failures` consecutive failures, or when the
+    windowed error rate reaches `error_rate`. While open, calls are routed
+    elsewhere; after `cooldown` seconds one trial call is let through
+    (half open) and its outcome closes or re-opens the breaker. Other calls
+    finishing meanwhile (e.g. abandoned hedges started before the breaker
+    opened) are counted but never taken for the trial.
+    """
+
+    def __init__(
+        self,
+        failures: int = LLM_BREAKER_FAILURES,
+        error_rate: float = LLM_BREAKER_ERROR_RATE,
+        cooldown: float = LLM_BREAKER_COOLDOWN
+    ):
+        self.failure_threshold = failures
+        self.error_rate_threshold = error_rate
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=WINDOW_SIZE)
+        self._outcomes = deque(maxlen=WINDOW_SIZE)
+        self._consecutive_failures = 0
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.counts = {'calls': 0, 'errors': 0, 'slow_calls': 0, 'rejected': 0, 'fallbacks': 0, 'hedges': 0,
+                       'hedge_wins': 0, 'breaker_opened': 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+            self._state = HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    def admit(self) -> Optional[str]:
+        """
+        Admit a call to this model now.
+
+        Returns:
+            CLOSED, HALF_OPEN when the call claimed the trial (record it with
+            trial=True), or None when the call has to go elsewhere
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return CLOSED
+            if state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return HALF_OPEN
+            self.counts['rejected'] += 1
+            return None
+
+    def allow(self) -> bool:
+        """Whether a call may go to this model now (claims the trial call when half open)."""
+        return self.admit() is not None
+
+    def record(self, latency: float, ok: bool, slow: bool = False, trial: bool = False) -> None:
+        """
+        Record one finished call; slow calls count as failures for the breaker only.
+        While half open only the trial call's outcome (trial=True) closes or re-opens it.
+        """
+        with self._lock:
+            self.counts['calls'] += 1
+            if ok:
+                self._latencies.append(latency)
+            else:
+                self.counts['errors'] += 1
+            if slow:
+                self.counts['slow_calls'] += 1
+            failed = not ok or slow
+            self._outcomes.append(failed)
+            self._consecutive_failures = self._consecutive_failures + 1 if failed else 0
+
+            if self._current_state() == HALF_OPEN:
+                if not trial:
+                    return
+                self._trial_in_flight = False
+                if failed:
+                    self._open()
+                else:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                return
+            error_rate = sum(self._outcomes) / len(self._outcomes)
+            if self._state == CLOSED and (
+                self._consecutive_failures >= self.failure_threshold or
+                (len(self._outcomes) >= MIN_SAMPLES and error_rate >= self.error_rate_threshold)
+            ):
+                self._open()
+
+    def _open(self) -> None:
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self.counts['breaker_opened'] += 1
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Latency percentile of successful calls, or None with too few samples."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if len(latencies) < MIN_SAMPLES:
+            return None
+        index = min(len(latencies) - 1, max(0, int(round(pct / 100 * len(latencies))) - 1))
+        return latencies[index]
+
+    def incr(self, field: str) -> None:
+        with self._lock:
+            self.counts[field] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        p50, p95 = self.percentile(50), self.percentile(95)
+        with self._lock:
+            stats = dict(self.counts)
+            stats['state'] = self._current_state()
+            stats['window_error_rate'] = round(sum(self._outcomes) / len(self._outcomes), 4) if self._outcomes else 0.0
+        stats['p50_latency'] = p50
+        stats['p95_latency'] = p95
+        return stats
+
+
+class LLMGateway:
+    """
+    Routes prompts to chat models.
+
+    ainvoke() picks the requested model unless its breaker is open, races it
+    against the fallback model when hedging applies, and falls back when the
+    call fails or its reply is rejected by `validate`. invoke() is the
+    blocking form for synchronous callers. Model calls run on a shared
+    thread pool, so the event loop never blocks on the provider SDK.
+    """
+
+    def __init__(
+        self,
+        client_factory: Optional[Callable[[str], Any]] = None,
+        fallback_model: str = LLM_FALLBACK_MODEL,
+        timeout: float = LLM_TIMEOUT,
+        hedge: bool = LLM_HEDGE,
+        hedge_percentile: float = LLM_HEDGE_PERCENTILE,
+        slow_call: float = LLM_SLOW_CALL,
+        fake: bool = LLM_FAKE,
+        max_workers: int = 16
+    ):
+        """
+        Args:
+            client_factory: Model name -> client with invoke() / stream(); defaults to api.chatbot.get_chatbot
+            fallback_model: Model used when the requested one is routed around
+            timeout: Seconds before a call is abandoned
+            hedge: Start the fallback as well when the primary is slow
+            hedge_percentile: Primary latency percentile after which to hedge
+            slow_call: Calls slower than this count as failures for the breaker (0 disables)
+            fake: Serve unregistered models from FakeChatModel
+            max_workers: Concurrent model calls
+        """
+        self.client_factory = client_factory
+        self.fallback_model = fallback_model
+        self.timeout = timeout
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.slow_call = slow_call
+        self.fake = fake
+        self._clients: Dict[str, Any] = {}
+        self._health: Dict[str, ModelHealth] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm')
+
+    # ------------------------------------------------------------------
+    # Models
+    # ------------------------------------------------------------------
+
+    def register(self, model_name: str, client: Any) -> None:
+        """Serve `model_name` from a specific client (e.g. a FakeChatModel in tests)."""
+        with self._lock:
+            self._clients[model_name] = client
+
+    def client(self, model_name: str) -> Any:
+        with self._lock:
+            client = self._clients.get(model_name)
+            if client is None and self.fake:
+                client = self._clients[model_name] = FakeChatModel()
+        if client is not None:
+            return client
+        if self.client_factory is None:
+            # Imported lazily so the gateway (and its fake model) work without the provider SDK
+            from api.chatbot import get_chatbot
+            self.client_factory = get_chatbot
+        return self.client_factory(model_name)
+
+    def health(self, model_name: str) -> ModelHealth:
+        with self._lock:
+            if model_name not in self._health:
+                self._health[model_name] = ModelHealth()
+            return self._health[model_name]
+
+    def fallback_for(self, model_name: str) -> str:
+        return LLM_SECONDARY_FALLBACK if model_name == self.fallback_model else self.fallback_model
+
+    def route(self, model_name: str) -> str:
+        """Requested model, or its fallback while the requested model's breaker is open."""
+        return self._route(model_name)[0]
+
+    def _route(self, model_name: str) -> Tuple[str, bool]:
+        """route() plus whether the call is the requested model's half-open trial."""
+        state = self.health(model_name).admit()
+        if state is not None:
+            return model_name, state == HALF_OPEN
+        fallback = self.fallback_for(model_name)
+        logger.warning(f"Circuit open for {model_name}, routing to {fallback}")
+        return fallback, False
+
+    # ------------------------------------------------------------------
+    # Calls
+    # ------------------------------------------------------------------
+
+    def _call(self, model_name: str, prompt: Any, trial: bool = False) -> str:
+        """One blocking model call, recorded in the model's health window."""
+        started = time.perf_counter()
+        try:
+            content = self.client(model_name).invoke(prompt).content
+        except Exception:
+            self.health(model_name).record(time.perf_counter() - started, ok=False, trial=trial)
+            raise
+        latency = time.perf_counter() - started
+        self.health(model_name).record(latency, ok=True, slow=bool(self.slow_call) and latency > self.slow_call,
+                                       trial=trial)
+        return content
+
+    async def _acall(self, model_name: str, prompt: Any, trial: bool = False) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call, model_name, prompt, trial)
+
+    def _hedge_delay(self, model_name: str, hedge: Optional[float]) -> Optional[float]:
+        if hedge is not None:
+            return hedge
+        if not self.hedge:
+            return None
+        return self.health(model_name).percentile(self.hedge_percentile)
+
+    async def ainvoke(
+        self,
+        prompt: Any,
+        model_name: str,
+        validate: Optional[Callable[[str], bool]] = None,
+        hedge: Optional[float] = None,
+        fallback: Optional[str] = None,
+        failover: bool = True
+    ) -> Tuple[str, str]:
+        """
+        Generate a reply.
+
+        Args:
+            prompt: Prompt string or message list
+            model_name: Requested model
+            validate: Reply check; a rejected reply is replaced by the fallback model's
+            hedge: Seconds after which the fallback is started alongside the primary
+                   (overrides the percentile-based delay; None = gateway default)
+            fallback: Model to fall back to instead of the gateway's
+            failover: False = only `model_name` may answer: no routing around
+                      its breaker, hedging or fallback (e.g. safety models,
+                      whose verdict must not be replaced by another model's reply)
+
+        Returns:
+            Tuple of (reply text, model that produced it)
+        """
+        if not failover:
+            state = self.health(model_name).admit()
+            if state is None:
+                raise RuntimeError(f"Circuit open for {model_name}")
+            content = await asyncio.wait_for(self._acall(model_name, prompt, state == HALF_OPEN), self.timeout)
+            return content, model_name
+
+        primary, trial = self._route(model_name)
+        fallback = fallback if fallback and fallback != primary else self.fallback_for(primary)
+        accept = validate or (lambda content: True)
+        deadline = time.monotonic() + self.timeout
+
+        tasks = {asyncio.ensure_future(self._acall(primary, prompt, trial)): primary}
+        delay = self._hedge_delay(primary, hedge)
+        hedged = False
+        if delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                # Primary slower than usual: race the fallback against it
+                self.health(primary).incr('hedges')
+                hedged = True
+                tasks[asyncio.ensure_future(self._acall(fallback, prompt))] = fallback
+
+        last_error: Optional[BaseException] = None
+        seen = set()
+        try:
+            while True:
+                pending = [task for task in tasks if not task.done()]
+                if pending:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError(f"No reply from {', '.join(tasks.values())} within {self.timeout}s")
+                    await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+
+                for task, name in tasks.items():
+                    if not task.done() or task in seen:
+                        continue
+                    seen.add(task)
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                        logger.error(f"LLM call to {name} failed: {last_error}")
+                        continue
+                    content = task.result()
+                    if accept(content):
+                        if name != primary:
+                            self.health(primary).incr('hedge_wins' if hedged else 'fallbacks')
+                        return content, name
+                    logger.info(f"Reply from {name} rejected, using {fallback}")
+
+                if fallback not in tasks.values():
+                    # Primary failed or was rejected before any hedge started
+                    tasks[asyncio.ensure_future(self._acall(fallback, prompt))] = fallback
+                elif all(task.done() for task in tasks):
+                    if last_error is not None:
+                        raise last_error
+                    # Every reply was rejected: return the fallback's anyway rather than nothing
+                    fallback_task = next(task for task, name in tasks.items() if name == fallback)
+                    return fallback_task.result(), fallback
+        finally:
+            for task in tasks:
+                # Losers keep running on the pool; their results are only recorded in the health window
+                task.cancel()
+
+    def invoke(
+        self,
+        prompt: Any,
+        model_name: str,
+        validate: Optional[Callable[[str], bool]] = None,
+        hedge: Optional[float] = None,
+        fallback: Optional[str] = None,
+        failover: bool = True
+    ) -> Tuple[str, str]:
+        """Blocking ainvoke() for synchronous callers (not for use inside a running event loop)."""
+        return asyncio.run(self.ainvoke(prompt, model_name, validate=validate, hedge=hedge, fallback=fallback,
+                                        failover=failover))
+
+    def stream(self, prompt: Any, model_name: str) -> Iterator[Tuple[str, str]]:
+        """
+        Stream a reply from the routed model, falling back if it fails before the first chunk.
+
+        Yields:
+            (text chunk, model name) tuples
+        """
+        primary, trial = self._route(model_name)
+        candidates = [primary, self.fallback_for(primary)]
+        for attempt, name in enumerate(candidates):
+            trial = trial and name == primary
+            started = time.perf_counter()
+            sent = False
+            try:
+                for chunk in self.client(name).stream(prompt):
+                    sent = True
+                    yield chunk.content, name
+            except Exception as e:
+                self.health(name).record(time.perf_counter() - started, ok=False, trial=trial)
+                if sent or attempt == len(candidates) - 1:
+                    raise
+                logger.error(f"Streaming from {name} failed before the first token, using {candidates[-1]}: {e}")
+                continue
+            latency = time.perf_counter() - started
+            self.health(name).record(latency, ok=True, slow=bool(self.slow_call) and latency > self.slow_call,
+                                     trial=trial)
+            return
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            models = list(self._health.items())
+        return {
+            'fallback_model': self.fallback_model,
+            'hedging': self.hedge,
+            'fake': self.fake,
+            'models': {name: health.get_stats() for name, health in models},
+        }
+
+
+# Singleton instance
+_llm_gateway_instance = None
+
+
+def get_llm_gateway() -> LLMGateway:
+    """Get or create the shared LLM gateway."""
+    global _llm_gateway_instance
+    if _llm_gateway_instance is None:
+        _llm_gateway_instance = LLMGateway()
+    return _llm_gateway_instance
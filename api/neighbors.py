@@ -0,0 +1,179 @@
+"""
+Item-to-Item Neighbour Graph
+Top-K most similar catalog items per item, computed with blocked matrix
+multiplication and stored as memory-mapped arrays for constant-time lookups
+"""
+
+import io
+import json
+import os
+import tarfile
+import tempfile
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Neighbours kept per item
+DEFAULT_NEIGHBORS = 20
+
+# Files of a saved graph (no suffix), the only members taken from a downloaded archive
+GRAPH_FILES = ('neighbors.npy', 'scores.npy', 'ids.json')
+
+# Rows multiplied against the full matrix at a time (bounds memory to block x n floats)
+DEFAULT_BLOCK_SIZE = 1024
+
+
+def build_neighbor_graph(
+    matrix: np.ndarray,
+    k: int = DEFAULT_NEIGHBORS,
+    block_size: int = DEFAULT_BLOCK_SIZE
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Exact top-k cosine neighbours of every row, excluding the row itself.
+
+    Args:
+        matrix: (n, dim) row-normalised embeddings
+        k: Neighbours per row
+        block_size: Rows per matrix multiplication block
+
+    Returns:
+        (indices int32 (n, k), scores float16 (n, k)), best first
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    n = matrix.shape[0]
+    k = min(k, n - 1)
+    indices = np.zeros((n, max(k, 0)), dtype=np.int32)
+    scores = np.zeros((n, max(k, 0)), dtype=np.float16)
+    if k <= 0:
+        return indices, scores
+
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        block = matrix[start:stop] @ matrix.T
+        # Never list an item as its own neighbour
+        block[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(block, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        indices[start:stop] = np.take_along_axis(top, order, axis=1)
+        scores[start:stop] = np.take_along_axis(top_scores, order, axis=1)
+    return indices, scores
+
+
+class NeighborGraph:
+    """
+    Read-only neighbour table: ids.json plus neighbors.npy (int32 row indices)
+    and scores.npy (float16 cosine similarities), memory-mapped on load.
+    """
+
+    def __init__(self, ids: Sequence[str], indices: np.ndarray, scores: np.ndarray):
+        self.ids = list(ids)
+        self.indices = indices
+        self.scores = scores
+        self._rows: Dict[str, int] = {item_id: row for row, item_id in enumerate(self.ids)}
+
+    @property
+    def k(self) -> int:
+        return self.indices.shape[1] if self.indices.ndim == 2 else 0
+
+    def __contains__(self, item_id) -> bool:
+        return str(item_id) in self._rows
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, ids: Sequence[str], matrix: np.ndarray, k: int = DEFAULT_NEIGHBORS) -> 'NeighborGraph':
+        indices, scores = build_neighbor_graph(matrix, k=k)
+        return cls(ids, indices, scores)
+
+    def save(self, directory: str, suffix: str = "") -> None:
+        """
+        Write the graph; files are named neighbors{suffix}.npy, scores{suffix}.npy, ids{suffix}.json.
+        """
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, f"neighbors{suffix}.npy"), self.indices)
+        np.save(os.path.join(directory, f"scores{suffix}.npy"), self.scores)
+        with open(os.path.join(directory, f"ids{suffix}.json"), 'w') as f:
+            json.dump(self.ids, f)
+
+    @classmethod
+    def load(cls, directory: str, suffix: str = "") -> Optional['NeighborGraph']:
+        """Memory-map a saved graph, or return None if it is missing or unreadable."""
+        try:
+            indices = np.load(os.path.join(directory, f"neighbors{suffix}.npy"), mmap_mode='r')
+            scores = np.load(os.path.join(directory, f"scores{suffix}.npy"), mmap_mode='r')
+            with open(os.path.join(directory, f"ids{suffix}.json")) as f:
+                ids = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load neighbour graph from {directory}: {e}")
+            return None
+        return cls(ids, indices, scores)
+
+    def neighbors(self, item_id, k: int = 10) -> Optional[List[Tuple[str, float]]]:
+        """
+        Nearest neighbours of an item.
+
+        Args:
+            item_id: Catalog id
+            k: Neighbours wanted (at most the graph's k)
+
+        Returns:
+            List of (id, cosine similarity) best first, or None if the item
+            is not in the graph
+        """
+        row = self._rows.get(str(item_id))
+        if row is None:
+            return None
+        k = min(k, self.k)
+        return [(self.ids[i], float(s)) for i, s in zip(self.indices[row, :k], self.scores[row, :k])]
+
+
+def fetch_neighbor_graph(url: str, directory: str, timeout: float = 60) -> Optional[NeighborGraph]:
+    """
+    Download a graph published as a .tar.gz (see the update-embeddings
+    workflow) and install it in `directory`.
+
+    Only the three graph files are extracted, each written to a temporary
+    name first and renamed into place, so a reader never sees a partial file.
+
+    Args:
+        url: Archive URL
+        directory: Target directory (NEIGHBOR_GRAPH_DIR)
+        timeout: Download timeout in seconds
+
+    Returns:
+        The loaded graph, or None if the download or archive failed
+    """
+    import requests
+
+    try:
+        response = requests.get(url, timeout=timeout)
+        response.raise_for_status()
+        members = {}
+        with tarfile.open(fileobj=io.BytesIO(response.content), mode='r:gz') as archive:
+            for member in archive.getmembers():
+                name = os.path.basename(member.name)
+                if member.isfile() and name in GRAPH_FILES:
+                    members[name] = archive.extractfile(member).read()
+        missing = [name for name in GRAPH_FILES if name not in members]
+        if missing:
+            raise ValueError(f"archive lacks {', '.join(missing)}")
+
+        os.makedirs(directory, exist_ok=True)
+        for name, payload in members.items():
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.")
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, os.path.join(directory, name))
+    except (requests.RequestException, tarfile.TarError, OSError, ValueError) as e:
+        logger.error(f"Could not fetch neighbour graph from {url}: {e}")
+        return None
+    return NeighborGraph.load(directory)
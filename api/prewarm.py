@@ -0,0 +1,229 @@
+"""
+Background Feed Pre-warmer
+Refreshes the home page and genre feeds ahead of their cache expiry so that
+user requests for /, /genre/<name> and /tv_genre/<name> are always cache hits
+"""
+
+import heapq
+import os
+import random
+import threading
+import time
+import logging
+from typing import Callable, List, Optional
+
+from api.feeds import HOME_FEEDS
+from api.tmdb_client import (
+    fetch_upcoming_movies, fetch_movies_by_genre, fetch_shows_by_genre,
+    get_cache_ttl, refresh_ahead, MOVIE_GENRE_IDS, TV_GENRE_IDS
+)
+from api.tmdb_transport import TMDB_BASE_URL
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Refresh once an entry has used this share of its TTL
+PREWARM_REFRESH_FRACTION = float(os.getenv("TMDB_PREWARM_FRACTION", "0.8"))
+
+# +/- share of the interval added as jitter so refreshes don't line up
+PREWARM_JITTER = 0.1
+
+# Host-wide lock file: only the worker holding it runs the pre-warmer
+PREWARM_LOCK_PATH = os.getenv("TMDB_PREWARM_LOCK", os.path.join("/tmp", "frameiq_prewarm.lock"))
+
+# Seconds between attempts of the other workers to take over the lock (e.g. after the holder is recycled)
+PREWARM_LOCK_RETRY = 60.0
+
+# Endpoint paths behind each home feed, used to look up its TTL
+HOME_FEED_PATHS = {
+    'trending_backdrops': '/trending/movie/day',
+    'now_playing': '/movie/now_playing',
+    'popular': '/movie/popular',
+    'upcoming': '/movie/upcoming',
+    'airing_today': '/tv/airing_today',
+    'on_the_air': '/tv/on_the_air',
+    'popular_shows': '/tv/popular',
+    'trending_people': '/trending/person/week',
+}
+
+
+class PrewarmJob:
+    """One feed kept warm: a fetch function plus the TTL of the endpoint it hits."""
+
+    def __init__(self, name: str, fetch: Callable[[], object], path: str):
+        self.name = name
+        self.fetch = fetch
+        self.ttl = get_cache_ttl(TMDB_BASE_URL + path)
+
+    def next_delay(self) -> float:
+        interval = self.ttl * PREWARM_REFRESH_FRACTION
+        return interval * random.uniform(1 - PREWARM_JITTER, 1 + PREWARM_JITTER)
+
+
+def build_prewarm_jobs() -> List[PrewarmJob]:
+    """
+    Every feed the site renders from tmdb_client: the eight home rows plus one
+    discover feed per movie and TV genre slug.
+
+    Returns:
+        List of PrewarmJob
+    """
+    feeds = dict(HOME_FEEDS)
+    feeds['upcoming'] = fetch_upcoming_movies
+    jobs = [PrewarmJob(name, fetch, HOME_FEED_PATHS[name]) for name, fetch in feeds.items()]
+
+    for slug, genre_id in MOVIE_GENRE_IDS.items():
+        jobs.append(PrewarmJob(f"genre:{slug}", lambda g=genre_id: fetch_movies_by_genre(g), '/discover/movie'))
+    for slug, genre_id in TV_GENRE_IDS.items():
+        jobs.append(PrewarmJob(f"tv_genre:{slug}", lambda g=genre_id: fetch_shows_by_genre(g), '/discover/tv'))
+    return jobs
+
+
+class FeedPrewarmer:
+    """
+    Single daemon thread running a jittered refresh schedule.
+
+    Each run refetches the feed only if its cached entry has used
+    PREWARM_REFRESH_FRACTION of its TTL, so several workers sharing one cache
+    backend don't all refetch the same feed. New payloads replace cache entries
+    in one write; readers see either the old or the new data, never a miss.
+    """
+
+    def __init__(self, jobs: Optional[List[PrewarmJob]] = None, startup_spread: float = 30.0):
+        self.jobs = jobs if jobs is not None else build_prewarm_jobs()
+        self.startup_spread = startup_spread
+        self.runs = 0
+        self.failures = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='feed-prewarmer', daemon=True)
+        self._thread.start()
+        logger.info(f"Feed pre-warmer started for {len(self.jobs)} feeds")
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        # Spread the initial warm-up over a short window after boot
+        now = time.monotonic()
+        schedule = [(now + random.uniform(0, self.startup_spread), i) for i in range(len(self.jobs))]
+        heapq.heapify(schedule)
+
+        while not self._stop.is_set():
+            due, index = schedule[0]
+            wait = due - time.monotonic()
+            if wait > 0:
+                self._stop.wait(wait)
+                continue
+            heapq.heappop(schedule)
+            job = self.jobs[index]
+            self._refresh(job)
+            heapq.heappush(schedule, (time.monotonic() + job.next_delay(), index))
+
+    def _refresh(self, job: PrewarmJob) -> None:
+        try:
+            # Threshold sits below the earliest jittered run so our own last refresh never blocks the next
+            with refresh_ahead(PREWARM_REFRESH_FRACTION * (1 - PREWARM_JITTER)):
+                job.fetch()
+            self.runs += 1
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Pre-warm of '{job.name}' failed: {e}")
+
+    def get_stats(self) -> dict:
+        return {'feeds': len(self.jobs), 'runs': self.runs, 'failures': self.failures,
+                'running': self._thread is not None and self._thread.is_alive()}
+
+
+# Singleton instance
+_prewarmer_instance = None
+_lock_file = None
+_standby_thread = None
+_start_lock = threading.Lock()
+
+
+def _acquire_host_lock(path: str) -> bool:
+    """
+    Take the host-wide pre-warmer lock without blocking. The lock is held by
+    an open file for the life of the process and released by the OS when the
+    process exits.
+    """
+    global _lock_file
+    if _lock_file is not None:
+        return True
+    try:
+        import fcntl
+    except ImportError:
+        # No flock on this platform: every process pre-warms
+        return True
+    handle = open(path, 'a')
+    try:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+    _lock_file = handle
+    return True
+
+
+def _standby(path: str) -> None:
+    while True:
+        try:
+            if _acquire_host_lock(path):
+                break
+        except OSError as e:
+            logger.warning(f"Pre-warmer lock {path} unavailable: {e}")
+        time.sleep(PREWARM_LOCK_RETRY)
+    logger.info("Took over the feed pre-warmer lock")
+    _start()
+
+
+def _start() -> FeedPrewarmer:
+    global _prewarmer_instance
+    with _start_lock:
+        if _prewarmer_instance is None:
+            _prewarmer_instance = FeedPrewarmer()
+            _prewarmer_instance.start()
+        return _prewarmer_instance
+
+
+def start_prewarmer(lock_path: str = PREWARM_LOCK_PATH) -> Optional[FeedPrewarmer]:
+    """
+    Start the feed pre-warmer in at most one process per host (idempotent).
+
+    Call it from a serving process (gunicorn's post_worker_init, or the
+    development server's reloaded child), not at import. The first process
+    to take the lock at `lock_path` runs the pre-warmer; the others keep
+    retrying in the background and take over if the holder exits.
+
+    Args:
+        lock_path: Lock file shared by the processes of one host
+
+    Returns:
+        FeedPrewarmer instance, or None if another process holds the lock
+    """
+    global _standby_thread
+    if _prewarmer_instance is not None:
+        return _prewarmer_instance
+    try:
+        acquired = _acquire_host_lock(lock_path)
+    except OSError as e:
+        logger.error(f"Could not open pre-warmer lock {lock_path}, pre-warming in this process: {e}")
+        acquired = True
+    if acquired:
+        return _start()
+    with _start_lock:
+        if _standby_thread is None:
+            logger.info("Feed pre-warmer runs in another process on this host; standing by")
+            _standby_thread = threading.Thread(target=_standby, args=(lock_path,), name='feed-prewarmer-standby', daemon=True)
+            _standby_thread.start()
+    return None
+
+
+def get_prewarmer() -> Optional[FeedPrewarmer]:
+    return _prewarmer_instance
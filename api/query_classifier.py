@@ -0,0 +1,286 @@
+"""
+Local Chat Query Classifier
+Answers the chat analysis questions (is this about recent content, which
+title and year, which search filters) with keyword lists, year patterns and
+the local catalog's title index, so only ambiguous messages need the LLM
+"""
+
+import difflib
+import re
+import threading
+import time
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from api.search_filters import parse_filters
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# First release year the catalog treats as recent
+RECENT_FROM_YEAR = 2022
+
+# Temporal cues from rag_helper.is_recent_movie_query (the media-type words there are not recency cues)
+RECENT_PHRASES = (
+    'recent', 'latest', 'newest', 'upcoming', 'current', 'currently', 'modern', 'trending',
+    'fresh', 'hot', 'this year', 'last year', 'coming out', 'just released', 'just came out',
+    'came out', 'out now', 'in theaters', 'in theatre', 'brand new', 'popular now'
+)
+
+# "new" is a recency cue except as part of a name ("new york", "the new world")
+NEW_NOT_RECENT = (
+    'york', 'zealand', 'jersey', 'mexico', 'orleans', 'delhi', 'england', 'hampshire', 'hope', 'world',
+    'girl', 'wave', 'age', 'moon', 'amsterdam'
+)
+_NEW_CUE = re.compile(r"(?<![\w-])new(?![\w-])(?!\s+(?:" + "|".join(NEW_NOT_RECENT) + r")\b)")
+
+# Single words that misspellings ("recnt", "latst") are matched against
+RECENT_WORDS = ('recent', 'latest', 'newest', 'upcoming', 'trending', 'released')
+
+# Words that make a message a recommendation request even without a title
+REQUEST_WORDS = (
+    'recommend', 'suggest', 'watch', 'movie', 'movies', 'film', 'films', 'show', 'shows',
+    'series', 'anime', 'something', 'looking for', 'what should', 'any good'
+)
+
+MEDIA_TYPE_WORDS = {
+    'anime': ('anime',),
+    'movie': ('movie', 'movies', 'film', 'films'),
+    'tv': ('tv', 'show', 'shows', 'series', 'sitcom', 'sitcoms', 'drama series', 'k-drama', 'kdrama'),
+}
+
+LANGUAGE_WORDS = {
+    'korean': 'ko', 'k-drama': 'ko', 'kdrama': 'ko', 'japanese': 'ja', 'spanish': 'es', 'french': 'fr',
+    'german': 'de', 'italian': 'it', 'hindi': 'hi', 'bollywood': 'hi', 'tamil': 'ta', 'telugu': 'te',
+    'chinese': 'zh', 'mandarin': 'zh', 'cantonese': 'cn', 'turkish': 'tr', 'thai': 'th', 'danish': 'da',
+    'swedish': 'sv', 'norwegian': 'no', 'portuguese': 'pt', 'brazilian': 'pt', 'russian': 'ru', 'polish': 'pl',
+}
+
+HIGH_RATING_PHRASES = ('highly rated', 'top rated', 'top-rated', 'best rated', 'well rated', 'critically acclaimed')
+POPULAR_PHRASES = ('popular', 'well known', 'well-known', 'mainstream')
+
+# Values used for the vague phrases above (same as the LLM analysis prompt)
+HIGH_RATING = 7.5
+POPULAR_VOTES = 500
+
+_YEAR = re.compile(r"\b(19\d{2}|20\d{2})\b")
+_YEAR_RANGE = re.compile(r"\b(from|in|since|after|before|until)\s+(19\d{2}|20\d{2})\b")
+_DECADE = re.compile(r"\b(19\d|20\d)0s\b|(?<![\w'])'?([5-9])0s\b")
+_MIN_RATING = re.compile(r"\b(?:rated|rating|score)\s*(?:above|over|of at least|at least|>=?|\+)?\s*(\d(?:\.\d)?)\b")
+_QUOTED = re.compile(r"[\"“]([^\"”]{2,80})[\"”]|(?:^|\s)['‘]([^'’]{2,80})['’](?=\s|$|[.,!?])")
+_SIMILAR_TO = re.compile(
+    r"\b(?:like|similar to|such as|in the vein of|reminds? me of|along the lines of|same vibe as|vibes? of)\s+(.+)",
+    re.IGNORECASE
+)
+# Where a title after "like ..." ends
+_TITLE_END = re.compile(
+    r"\s+(?:from|in|released|but|with|that|which|and|or|please|for|made|on|starring)\b|\s*\(?\b(?:19|20)\d{2}\b\)?|[?.!,;]",
+    re.IGNORECASE
+)
+_TITLE_PREFIX = re.compile(r"^(?:the\s+)?(?:movie|film|show|tv show|series|anime)\s+", re.IGNORECASE)
+
+
+def _contains(text: str, phrase: str) -> bool:
+    return re.search(r"(?<![\w-])" + re.escape(phrase) + r"(?![\w-])", text) is not None
+
+
+class QueryClassifier:
+    """
+    Rule-based replacement for the chat route's LLM analysis prompt.
+
+    classify() returns the same fields as the LLM analysis
+    (is_recent_content_query, title, year, confidence, filters). Confidence
+    is "low" when the message names a title that is not in the local catalog
+    and has no recency cue, or does not look like a recommendation request;
+    callers send those messages to the LLM. Counters track how many
+    messages were resolved locally and how many were escalated.
+    """
+
+    def __init__(self, title_lookup: Optional[Callable[[str], Optional[Dict[str, Any]]]] = None):
+        self.title_lookup = title_lookup
+        self._lock = threading.Lock()
+        self._counts = {'queries': 0, 'local': 0, 'escalated': 0, 'llm_errors': 0}
+        self._local_seconds = 0.0
+
+    # ------------------------------------------------------------------
+    # Classification
+    # ------------------------------------------------------------------
+
+    def classify(self, message: str) -> Dict[str, Any]:
+        """
+        Analyse a chat message locally.
+
+        Args:
+            message: User message
+
+        Returns:
+            Dictionary with is_recent_content_query, title, year, confidence
+            (high/medium/low), filters and catalog_match (whether the title is
+            in the local catalog)
+        """
+        started = time.perf_counter()
+        text = " ".join(str(message).lower().split())
+        current_year = datetime.now().year
+
+        year = self._year(text, current_year)
+        title = self._title(message)
+        catalog_match = bool(title) and self._in_catalog(title)
+        recent_cue = self._has_recent_cue(text)
+        recent = recent_cue or catalog_match or bool(year and int(year) >= RECENT_FROM_YEAR)
+
+        if catalog_match or (recent and (recent_cue or not title)):
+            confidence = 'high'
+        elif recent or (not title and any(_contains(text, word) for word in REQUEST_WORDS)):
+            confidence = 'medium'
+        else:
+            # Unknown title without other cues, or not obviously a recommendation request
+            confidence = 'low'
+
+        result = {
+            'is_recent_content_query': recent,
+            'title': title,
+            'year': year,
+            'confidence': confidence,
+            'filters': self._filters(text, current_year, has_title=bool(title)),
+            'catalog_match': catalog_match,
+        }
+        with self._lock:
+            self._counts['queries'] += 1
+            self._counts['local' if confidence != 'low' else 'escalated'] += 1
+            self._local_seconds += time.perf_counter() - started
+        return result
+
+    def _has_recent_cue(self, text: str) -> bool:
+        if any(_contains(text, phrase) for phrase in RECENT_PHRASES) or _NEW_CUE.search(text):
+            return True
+        # Misspelled cues: "recnt", "latst", "trendng"
+        return any(
+            difflib.get_close_matches(token, RECENT_WORDS, n=1, cutoff=0.8)
+            for token in re.findall(r"[a-z]{5,}", text)
+        )
+
+    @staticmethod
+    def _year(text: str, current_year: int) -> Optional[str]:
+        match = _YEAR.search(text)
+        if match:
+            return match.group(1)
+        if _contains(text, 'this year'):
+            return str(current_year)
+        if _contains(text, 'last year'):
+            return str(current_year - 1)
+        return None
+
+    @staticmethod
+    def _title(message: str) -> Optional[str]:
+        """Title the user compares against: quoted text first, then whatever follows "like" / "similar to"."""
+        quoted = _QUOTED.search(message)
+        if quoted:
+            return (quoted.group(1) or quoted.group(2)).strip()
+        similar = _SIMILAR_TO.search(message)
+        if not similar:
+            return None
+        title = _TITLE_END.split(similar.group(1), maxsplit=1)[0]
+        title = _TITLE_PREFIX.sub("", title.strip()).strip(" '\"")
+        if not title or title.lower() in ('this', 'that', 'it', 'these', 'those', 'them'):
+            return None
+        return title
+
+    def _in_catalog(self, title: str) -> bool:
+        if self.title_lookup is None:
+            return False
+        try:
+            return self.title_lookup(title) is not None
+        except Exception as e:
+            logger.error(f"Title lookup failed for '{title}': {e}")
+            return False
+
+    @staticmethod
+    def _filters(text: str, current_year: int, has_title: bool) -> Optional[Dict[str, Any]]:
+        filters: Dict[str, Any] = {}
+
+        media_types = [media for media, words in MEDIA_TYPE_WORDS.items() if any(_contains(text, w) for w in words)]
+        if media_types:
+            # "anime series" is anime, not TV in general
+            filters['media_type'] = 'anime' if 'anime' in media_types else (media_types[0] if len(media_types) == 1 else None)
+
+        # A year next to a compared title is that title's year, not a constraint on the results
+        if not has_title:
+            range_match = _YEAR_RANGE.search(text)
+            decade = _DECADE.search(text)
+            if range_match:
+                word, year = range_match.group(1), int(range_match.group(2))
+                if word in ('from', 'in'):
+                    filters['year_from'] = filters['year_to'] = year
+                elif word == 'since':
+                    filters['year_from'] = year
+                elif word == 'after':
+                    filters['year_from'] = year + 1
+                else:
+                    filters['year_to'] = year - 1 if word == 'before' else year
+            elif decade:
+                # "2010s", or "90s" / "'80s" for the 1900s
+                filters['year_from'] = int(decade.group(1)) * 10 if decade.group(1) else 1900 + int(decade.group(2)) * 10
+                filters['year_to'] = filters['year_from'] + 9
+            elif _contains(text, 'this year'):
+                filters['year_from'] = filters['year_to'] = current_year
+            elif _contains(text, 'last year'):
+                filters['year_from'] = filters['year_to'] = current_year - 1
+            else:
+                # Bare year: "best horror movies 2024"
+                bare_year = _YEAR.search(text)
+                if bare_year:
+                    filters['year_from'] = filters['year_to'] = int(bare_year.group(1))
+
+        rating = _MIN_RATING.search(text)
+        if rating:
+            filters['min_rating'] = rating.group(1)
+        elif any(_contains(text, phrase) for phrase in HIGH_RATING_PHRASES):
+            filters['min_rating'] = HIGH_RATING
+        if any(_contains(text, phrase) for phrase in POPULAR_PHRASES):
+            filters['min_votes'] = POPULAR_VOTES
+
+        for word, language in LANGUAGE_WORDS.items():
+            if _contains(text, word):
+                filters['language'] = language
+                break
+
+        return parse_filters(filters)
+
+    # ------------------------------------------------------------------
+    # Counters
+    # ------------------------------------------------------------------
+
+    def record_llm_error(self) -> None:
+        """Count an escalated message whose LLM analysis failed as well."""
+        with self._lock:
+            self._counts['llm_errors'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counts)
+            local_seconds = self._local_seconds
+        stats['llm_rate'] = stats['escalated'] / stats['queries'] if stats['queries'] else 0.0
+        stats['avg_classify_us'] = local_seconds / stats['queries'] * 1e6 if stats['queries'] else 0.0
+        return stats
+
+
+# Singleton instance
+_query_classifier_instance = None
+
+
+def get_query_classifier(title_lookup: Optional[Callable[[str], Optional[Dict[str, Any]]]] = None) -> QueryClassifier:
+    """
+    Get or create the shared classifier.
+
+    Args:
+        title_lookup: Catalog title lookup, used when the classifier is created
+                      (or set later if it was created without one)
+    """
+    global _query_classifier_instance
+    if _query_classifier_instance is None:
+        _query_classifier_instance = QueryClassifier(title_lookup)
+    elif title_lookup is not None and _query_classifier_instance.title_lookup is None:
+        _query_classifier_instance.title_lookup = title_lookup
+    return _query_classifier_instance
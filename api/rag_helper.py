@@ -4,10 +4,10 @@ Provides vector database search and context injection for LLM
 """
 
 from api.vector_db import get_vector_db
+from api.search_filters import describe as describe_filters
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 import re
-import json
 
 
 # Initialize vector database
@@ -33,9 +33,9 @@ def search_tmdb_for_media(title: str, year: Optional[str] = None) -> Optional[Di
         Dictionary with media info or None if not found
     """
     try:
-        import requests
         import os
         from dotenv import load_dotenv
+        from api.tmdb_transport import get_tmdb_transport
         
         load_dotenv()
         TMDB_API_KEY = os.getenv("TMDB_API_KEY")
@@ -44,6 +44,8 @@ def search_tmdb_for_media(title: str, year: Optional[str] = None) -> Optional[Di
             print("  ✗ TMDb API key not found")
             return None
         
+        tmdb_http = get_tmdb_transport()
+        
         # Try searching for TV shows first
         tv_url = f"https://api.themoviedb.org/3/search/tv"
         params = {
@@ -54,7 +56,7 @@ def search_tmdb_for_media(title: str, year: Optional[str] = None) -> Optional[Di
         if year:
             params["first_air_date_year"] = year
         
-        response = requests.get(tv_url, params=params, timeout=5)
+        response = tmdb_http.get(tv_url, params=params, timeout=5)
         results = response.json().get("results", [])
         
         # If not found in TV, try movies
@@ -68,7 +70,7 @@ def search_tmdb_for_media(title: str, year: Optional[str] = None) -> Optional[Di
             if year:
                 params_movie["year"] = year
             
-            response = requests.get(movie_url, params=params_movie, timeout=5)
+            response = tmdb_http.get(movie_url, params=params_movie, timeout=5)
             results = response.json().get("results", [])
             media_type = "movie"
         else:
@@ -122,13 +124,14 @@ def is_recent_movie_query(query: str) -> bool:
     return any(indicator in query_lower for indicator in recent_indicators)
 
 
-def search_vector_db(query: str, top_k: int = 5) -> Optional[Dict[str, Any]]:
+def search_vector_db(query: str, top_k: int = 5, filters: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
     """
-    Search the vector database for relevant media.
+    Search the vector database for relevant media (BM25 + vector, rank-fused).
     
     Args:
         query: Search query
         top_k: Number of results to return
+        filters: Optional structured filters (media type, years, rating, votes, language)
     
     Returns:
         Search results or None if RAG is disabled
@@ -137,7 +140,7 @@ def search_vector_db(query: str, top_k: int = 5) -> Optional[Dict[str, Any]]:
         return None
     
     try:
-        results = vector_db.search(query, top_k=top_k)
+        results = vector_db.hybrid_search(query, top_k=top_k, filters=filters)
         return results
     except Exception as e:
         print(f"Error searching vector database: {e}")
@@ -203,59 +206,12 @@ def format_vector_context(search_results: Dict[str, Any]) -> str:
     return "\n".join(context_parts)
 
 
-def extract_media_name_from_query(query: str) -> tuple[Optional[str], Optional[str]]:
-    """
-    Extract the media name and year that the user is asking about from their query.
-    
-    Args:
-        query: User's query
-    
-    Returns:
-        Tuple of (media_name, year) or (None, None)
-    """
-    try:
-        from api.chatbot import get_chatbot, clean_json_response
-        
-        # Determine the current year for "this year" queries
-        current_year = datetime.now().year
-        
-        extraction_prompt = f"""Extract the movie/TV show name and year the user is asking about. Return ONLY valid JSON.
-
-Current year: {current_year}
-
-Query: {query}
-
-Examples:
-- "suggest me movie like weapon" → {{"media": "weapon", "year": null}}
-- "movies similar to Inception from 2010" → {{"media": "Inception", "year": "2010"}}
-- "horror films like The Conjuring released this year" → {{"media": "The Conjuring", "year": "{current_year}"}}
-- "tv shows like Breaking Bad" → {{"media": "Breaking Bad", "year": null}}
-- "anime similar to Attack on Titan" → {{"media": "Attack on Titan", "year": null}}
-
-Return format:
-{{"media": "name here", "year": "YYYY or null"}}"""
-        
-        response = get_chatbot().invoke(extraction_prompt)
-        cleaned = clean_json_response(response.content)
-        data = json.loads(cleaned)
-        media_name = data.get("media", "").strip()
-        year = data.get("year")
-        
-        if media_name:
-            year_str = f" ({year})" if year else ""
-            print(f"🎬 RAG: Extracted media: '{media_name}'{year_str}")
-            return media_name, year
-        return None, None
-    except Exception as e:
-        print(f"  ✗ Error extracting media name: {e}")
-        return None, None
-
-
 def enhance_prompt_with_rag(
     user_message: str, 
     chat_history: str = "",
     source_title: str = None,
-    source_year: str = None
+    source_year: str = None,
+    filters: Optional[Dict[str, Any]] = None
 ) -> tuple[str, bool, list]:
     """
     Enhance the user's prompt with RAG context.
@@ -267,6 +223,7 @@ def enhance_prompt_with_rag(
         chat_history: Previous chat history (optional)
         source_title: Source media title (provided by LLM analysis)
         source_year: Source media year (provided by LLM analysis)
+        filters: Structured filters from the analysis step, pushed into retrieval
     
     Returns:
         Tuple of (enhanced_prompt, rag_used, media_ids)
@@ -275,50 +232,53 @@ def enhance_prompt_with_rag(
         return user_message, False, []
     
     search_results = None
+    search_query = None
     
-    # If LLM provided source title, use hybrid search
+    # If LLM provided source title, resolve it locally in one pass
     if source_title:
-        print(f"  → Step 1: Exact title search for: '{source_title}' ({source_year or 'any year'})")
+        print(f"  → Step 1: Local title lookup for: '{source_title}' ({source_year or 'any year'})")
         
-        # Try exact match first
-        exact_match = vector_db.search_by_exact_title(source_title, source_year)
+        # Title index (exact, prefix, fuzzy), then BM25 over title fields
+        exact_match = vector_db.resolve_title(source_title, source_year)
         
         if exact_match:
-            print(f"  ✓ Exact match found!")
+            print(f"  ✓ Match found: {exact_match['metadata'].get('title')}")
             
-            # Use the exact match's description to find similar items
-            search_results = search_vector_db(exact_match['document'], top_k=6)
+            if filters:
+                # Neighbours of the match's stored embedding that pass the filters (match first)
+                search_results = vector_db.similar_by_id(exact_match['id'], top_k=6, include_self=True, filters=filters)
+            else:
+                # Precomputed neighbours of the match; the match itself is already in hand
+                neighbors = vector_db.get_neighbors(exact_match['id'], k=5, with_items=True)
+                search_results = {
+                    "ids": [[str(exact_match['id'])] + [n['id'] for n in neighbors]],
+                    "documents": [[exact_match['document']] + [n['document'] for n in neighbors]],
+                    "metadatas": [[exact_match['metadata']] + [n['metadata'] for n in neighbors]],
+                    "distances": [[0.0] + [1.0 - n['score'] for n in neighbors]],
+                }
             
         else:
-            print(f"  ✗ No exact match found")
-            print(f"  → Step 2: Trying semantic search...")
-            
-            # Fallback to semantic search
-            search_query = f"{source_title} {source_year or ''}"
-            search_results = search_vector_db(search_query, top_k=5)
+            print(f"  ✗ Not in the local catalog")
+            print(f"  → Step 2: Trying TMDb fallback...")
             
-            # Validate semantic search results
-            if search_results and search_results.get('ids') and search_results['ids'][0]:
-                first_result_title = search_results['metadatas'][0][0].get('title', '').lower()
-                source_title_lower = source_title.lower()
-                
-                # Check if first result is actually relevant
-                if source_title_lower not in first_result_title and first_result_title not in source_title_lower:
-                    print(f"  ✗ Semantic search returned irrelevant: '{search_results['metadatas'][0][0].get('title')}'")
-                    print(f"  → Step 3: Trying TMDb fallback...")
-                    
-                    # Try TMDb fallback
-                    tmdb_result = search_tmdb_for_media(source_title, source_year)
-                    if tmdb_result:
-                        print(f"  ✓ Found on TMDb: {tmdb_result['title']}")
-                        search_query = f"{tmdb_result['title']} {tmdb_result.get('overview', '')[:200]}"
-                        search_results = search_vector_db(search_query, top_k=5)
-                    else:
-                        print(f"  ✗ Not found on TMDb either")
-                        return user_message, False, []
+            tmdb_result = search_tmdb_for_media(source_title, source_year)
+            if tmdb_result:
+                print(f"  ✓ Found on TMDb: {tmdb_result['title']}")
+                search_query = f"{tmdb_result['title']} {tmdb_result.get('overview', '')[:200]}"
+                search_results = search_vector_db(search_query, top_k=5, filters=filters)
+            else:
+                print(f"  ✗ Not found on TMDb either")
+                return user_message, False, []
     else:
-        # No source title, do general search
-        search_results = search_vector_db(user_message, top_k=5)
+        # No source title, do general (hybrid lexical + vector) search
+        search_query = user_message
+        search_results = search_vector_db(search_query, top_k=5, filters=filters)
+    
+    if search_query and filters and (not search_results or not search_results['ids'][0]):
+        # Nothing in the catalog passes the filters; better loose matches than none
+        print(f"  ✗ No matches for filters ({describe_filters(filters)}), searching without them")
+        filters = None
+        search_results = search_vector_db(search_query, top_k=5)
     
     if not search_results or not search_results.get('ids') or not search_results['ids'][0]:
         return user_message, False, []
@@ -329,6 +289,13 @@ def enhance_prompt_with_rag(
     # Format context
     context = format_vector_context(search_results)
     
+    # Results were already narrowed by the filters, so the type-matching rules are only needed without them
+    if filters:
+        scope_instructions = f"- The database results already match the user's constraints: {describe_filters(filters)}"
+    else:
+        scope_instructions = """- **IMPORTANT**: If the source is a TV SHOW, prioritize recommending other TV SHOWS from the list
+- **IMPORTANT**: If the source is a MOVIE, prioritize recommending other MOVIES from the list"""
+    
     # Create enhanced prompt with clearer instructions
     enhanced_prompt = f"""You are a media recommendation assistant with access to an up-to-date database of movies and TV shows.
 
@@ -341,8 +308,7 @@ def enhance_prompt_with_rag(
 - Each item is labeled as [Movie] or [TV Show] - PAY ATTENTION to this distinction
 - The FIRST item listed is likely the source media the user is asking about
 - The OTHER items are semantically similar based on themes, genres, and style
-- **IMPORTANT**: If the source is a TV SHOW, prioritize recommending other TV SHOWS from the list
-- **IMPORTANT**: If the source is a MOVIE, prioritize recommending other MOVIES from the list
+{scope_instructions}
 - You can also recommend additional movies/shows from your general knowledge
 - Explain WHY each recommendation is similar (matching genres, themes, tone, creator style, etc.)
 - Focus on thematic similarity: if source is horror/mystery, recommend other horror/mystery content
@@ -387,3 +353,21 @@ def get_rag_stats() -> Dict[str, Any]:
             'total_movies': 0,
             'status': f'error: {str(e)}'
         }
+
+
+def preload_encoder(mode: Optional[str] = None) -> str:
+    """
+    Load the sentence-transformer ahead of the first chat request.
+    
+    Args:
+        mode: lazy (load on first search), background (load on a thread) or
+              eager (block until loaded); defaults to ENCODER_PRELOAD
+    
+    Returns:
+        The mode applied
+    """
+    import os
+    mode = (mode or os.getenv("ENCODER_PRELOAD", "lazy")).lower()
+    if mode in ('background', 'eager') and RAG_ENABLED and vector_db is not None:
+        vector_db.preload_encoder(background=(mode == 'background'))
+    return mode
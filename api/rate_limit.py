@@ -0,0 +1,186 @@
+"""
+Rate Limiting
+Token-bucket limiters for outbound API budgets, in-process or shared by all
+worker processes on a host through a SQLite file
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import logging
+from typing import Any, Dict
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class _WaitStats:
+    """Counts acquisitions and the time callers spent waiting for tokens."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.delayed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, waited: float) -> None:
+        with self._lock:
+            self.acquired += 1
+            if waited > 0:
+                self.delayed += 1
+                self.total_wait += waited
+                self.max_wait = max(self.max_wait, waited)
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'acquired': self.acquired,
+                'delayed': self.delayed,
+                'total_wait_s': round(self.total_wait, 3),
+                'avg_wait_ms': round(self.total_wait / self.delayed * 1000, 1) if self.delayed else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 1),
+            }
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+    Refills at `rate` tokens per second up to `capacity`; acquire() only blocks
+    when the bucket is empty.
+    """
+
+    scope = 'process'
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.stats = _WaitStats()
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self, tokens: float) -> float:
+        """Take tokens if available; otherwise return the seconds until they will be."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1) -> float:
+        """
+        Take tokens from the bucket, sleeping only while it is empty.
+
+        Returns:
+            Seconds spent waiting
+
+        Raises:
+            ValueError: If more tokens are requested than the bucket can hold
+        """
+        if tokens > self.capacity:
+            raise ValueError(f"Cannot acquire {tokens} tokens from a bucket of capacity {self.capacity}")
+        waited = 0.0
+        while True:
+            delay = self._take(tokens)
+            if delay <= 0:
+                self.stats.record(waited)
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self.stats.as_dict()
+        stats.update({'scope': self.scope, 'rate': self.rate, 'capacity': self.capacity})
+        return stats
+
+
+class SQLiteTokenBucket(TokenBucket):
+    """
+    Token bucket whose state lives in a SQLite row, so every worker process on
+    the host draws from one budget. Each take is a single IMMEDIATE transaction.
+    """
+
+    scope = 'host'
+
+    def __init__(self, rate: float, capacity: float, path: str, name: str = 'tmdb'):
+        super().__init__(rate, capacity)
+        self.path = path
+        self.name = name
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets "
+            "(name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        conn.execute(
+            "INSERT OR IGNORE INTO rate_buckets (name, tokens, updated) VALUES (?, ?, ?)",
+            (name, capacity, time.time())
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode; transactions are opened explicitly in _take
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _take(self, tokens: float) -> float:
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT tokens, updated FROM rate_buckets WHERE name = ?", (self.name,)).fetchone()
+            now = time.time()
+            available = min(self.capacity, row[0] + max(0.0, now - row[1]) * self.rate)
+            if available >= tokens:
+                available -= tokens
+                delay = 0.0
+            else:
+                delay = (tokens - available) / self.rate
+            conn.execute("UPDATE rate_buckets SET tokens = ?, updated = ? WHERE name = ?", (available, now, self.name))
+            conn.execute("COMMIT")
+            return delay
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            # Never stall requests on a broken lock file; fall back to the local bucket
+            logger.error(f"Shared rate limiter unavailable, using process-local budget: {e}")
+            return super()._take(tokens)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        stats['path'] = self.path
+        return stats
+
+
+def create_rate_limiter(rate: float, capacity: float, name: str = 'tmdb') -> TokenBucket:
+    """
+    Build a token bucket from configuration.
+
+    Environment variables:
+    - RATE_LIMIT_BACKEND: process (default) or sqlite (shared by all workers on the host)
+    - RATE_LIMIT_SQLITE_PATH: state file for the sqlite backend
+
+    Args:
+        rate: Tokens added per second
+        capacity: Maximum burst
+        name: Bucket name (separates budgets in the shared file)
+
+    Returns:
+        TokenBucket instance
+    """
+    if os.getenv("RATE_LIMIT_BACKEND", "process").lower() == 'sqlite':
+        path = os.getenv("RATE_LIMIT_SQLITE_PATH", os.path.join("/tmp", "frameiq_ratelimit.sqlite3"))
+        try:
+            return SQLiteTokenBucket(rate, capacity, path, name=name)
+        except sqlite3.Error as e:
+            logger.error(f"Could not open shared rate limiter at {path}: {e}")
+    return TokenBucket(rate, capacity)
@@ -0,0 +1,147 @@
+"""
+Profile Recommendation Engine
+Builds personalised recommendations from a user's watchlist, wishlist and
+viewing history, shared by /profile/recommendations and its preview endpoint
+"""
+
+import hashlib
+import random
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from api.cache import LRUCache
+from api.tmdb_client import fetch_tmdb_recommendations, resolve_posters, POSTER_PLACEHOLDER
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# User items used as recommendation seeds
+MAX_SEED_ITEMS = 15
+
+# Total recommendations, and how many a single seed may contribute
+MAX_RECOMMENDATIONS = 18
+MAX_RECS_PER_SEED = 3
+
+# The profile page preview shows the head of the full list
+PREVIEW_SIZE = 6
+
+# Per-user results: user id -> (fingerprint of the user's lists, recommendations)
+_user_recommendations = LRUCache(max_entries=2000, ttl=1800, sizeof=lambda entry: 1)
+
+# Seed lookups for one user run in parallel
+_seed_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='profile-recs')
+
+
+def _user_seed_items(user) -> List[Dict[str, Any]]:
+    """Unique (by TMDb id) items across the user's three lists, as plain dicts."""
+    seen = set()
+    items = []
+    for item in list(user.watchlist) + list(user.wishlist) + list(user.viewed_media):
+        if item.tmdb_id not in seen:
+            seen.add(item.tmdb_id)
+            items.append({'tmdb_id': item.tmdb_id, 'media_type': item.media_type, 'title': item.title})
+    return items
+
+
+def _fingerprint(items: List[Dict[str, Any]]) -> str:
+    """Stable hash of the user's lists; changes whenever an item is added or removed."""
+    keys = sorted(f"{item['media_type']}:{item['tmdb_id']}" for item in items)
+    return hashlib.md5("|".join(keys).encode()).hexdigest()
+
+
+def _fetch_seed(seed: Dict[str, Any]) -> List[Dict[str, Any]]:
+    try:
+        return fetch_tmdb_recommendations(seed['tmdb_id'], seed['media_type'] == 'movie')
+    except Exception as e:
+        print(f"Error fetching recommendations for {seed['title']}: {e}")
+        return []
+
+
+def compute_recommendations(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Build recommendations from seed items.
+
+    Seeds are shuffled for diversity, their TMDb recommendations are fetched
+    concurrently, and candidates are merged in seed order: at most
+    MAX_RECS_PER_SEED per seed, none the user already owns, no duplicates.
+
+    Args:
+        items: Seed items with tmdb_id, media_type and title
+
+    Returns:
+        List of recommendation dictionaries
+    """
+    owned_ids = {item['tmdb_id'] for item in items}
+    seeds = list(items)
+    random.shuffle(seeds)
+    seeds = seeds[:MAX_SEED_ITEMS]
+
+    seed_results = list(_seed_executor.map(_fetch_seed, seeds))
+
+    recommendations = []
+    picked = {'movie': [], 'tv': []}
+    processed_ids = set()
+    for seed, tmdb_recs in zip(seeds, seed_results):
+        if len(recommendations) >= MAX_RECOMMENDATIONS:
+            break
+        is_movie = seed['media_type'] == 'movie'
+        recs_added_for_this_item = 0
+        for rec in tmdb_recs:
+            if rec['id'] in processed_ids or rec['id'] in owned_ids:
+                continue
+            recommendations.append({
+                'id': rec['id'],
+                'title': rec['title'] if is_movie else rec['name'],
+                'poster': None,  # Filled in below
+                'media_type': seed['media_type'],
+                'release_date': rec.get('release_date') if is_movie else rec.get('first_air_date', 'N/A'),
+                'based_on': seed['title']  # What this recommendation is based on
+            })
+            picked[seed['media_type']].append(rec)
+            processed_ids.add(rec['id'])
+            recs_added_for_this_item += 1
+            if recs_added_for_this_item >= MAX_RECS_PER_SEED or len(recommendations) >= MAX_RECOMMENDATIONS:
+                break
+
+    # Payload poster_paths cover most candidates; only the rest are looked up, concurrently
+    posters = {
+        media_type: resolve_posters(picked[media_type], is_movie=(media_type == 'movie'))
+        for media_type in ('movie', 'tv')
+    }
+    for rec in recommendations:
+        rec['poster'] = posters[rec['media_type']].get(rec['id'], POSTER_PLACEHOLDER)
+
+    return recommendations
+
+
+def get_profile_recommendations(user) -> List[Dict[str, Any]]:
+    """
+    Recommendations for a user, cached until their lists change.
+
+    The cache entry carries a fingerprint of the user's lists, so adding or
+    removing any item recomputes on the next request without the list routes
+    having to invalidate anything.
+
+    Args:
+        user: User model instance
+
+    Returns:
+        List of recommendation dictionaries (at most MAX_RECOMMENDATIONS)
+    """
+    items = _user_seed_items(user)
+    fingerprint = _fingerprint(items)
+
+    cached = _user_recommendations.get(user.id)
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    recommendations = compute_recommendations(items)
+    _user_recommendations.set(user.id, (fingerprint, recommendations))
+    return recommendations
+
+
+def get_profile_recommendations_preview(user) -> List[Dict[str, Any]]:
+    """First PREVIEW_SIZE entries of the user's full recommendation list."""
+    return get_profile_recommendations(user)[:PREVIEW_SIZE]
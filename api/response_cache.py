@@ -0,0 +1,235 @@
+"""
+Semantic Chat Response Cache
+Reuses the reply and poster cards of an earlier first-turn question when a new
+question is the same after normalisation or close enough in embedding space,
+per model and only while the catalog it was answered from is unchanged
+"""
+
+import os
+import re
+import threading
+import time
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from api.embedding_cache import normalize_query
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Cosine similarity from which two questions share an answer
+CHAT_CACHE_THRESHOLD = float(os.getenv("CHAT_CACHE_THRESHOLD", "0.92"))
+
+# Entry lifetime; a new catalog version (any re-ingest) invalidates entries before that
+CHAT_CACHE_TTL = float(os.getenv("CHAT_CACHE_TTL", "21600"))
+
+# Questions kept per model
+CHAT_CACHE_MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "2000"))
+
+_NUMBER = re.compile(r"\d+")
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def question_key(question: str) -> str:
+    """Exact-match key: normalised text without punctuation ("Best horror movies 2024?" == "best horror movies 2024")."""
+    return normalize_query(_PUNCTUATION.sub(" ", str(question)))
+
+
+class _ModelBucket:
+    """Questions answered by one model: exact-key index plus a unit-vector matrix for similarity."""
+
+    def __init__(self):
+        self.entries: List[Dict[str, Any]] = []
+        self.by_key: Dict[str, Dict[str, Any]] = {}
+        self.matrix: Optional[np.ndarray] = None
+
+    def rebuild(self) -> None:
+        self.by_key = {entry['key']: entry for entry in self.entries}
+        vectors = [entry['vector'] for entry in self.entries if entry['vector'] is not None]
+        self.matrix = np.vstack(vectors).astype(np.float32) if vectors else None
+
+
+class SemanticResponseCache:
+    """
+    Question -> response cache matched by meaning.
+
+    A lookup first tries the exact normalised question, then the nearest
+    stored question of the same model by cosine similarity. Questions with
+    different numbers ("2023" vs "2024", "top 5" vs "top 10") never share
+    an answer. Entries expire after `ttl` seconds or as soon as the catalog
+    version changes.
+    """
+
+    def __init__(
+        self,
+        encode: Optional[Callable[[str], Optional[np.ndarray]]] = None,
+        catalog_version: Optional[Callable[[], Any]] = None,
+        threshold: float = CHAT_CACHE_THRESHOLD,
+        ttl: float = CHAT_CACHE_TTL,
+        max_entries: int = CHAT_CACHE_MAX_ENTRIES
+    ):
+        """
+        Args:
+            encode: Question -> unit-length embedding, or None when the encoder is
+                    unavailable (lookups then only match exactly)
+            catalog_version: Returns a value that changes whenever the catalog is refreshed
+            threshold: Minimum cosine similarity for a semantic hit
+            ttl: Entry lifetime in seconds
+            max_entries: Entries kept per model (oldest dropped first)
+        """
+        self.encode = encode
+        self.catalog_version = catalog_version
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._buckets: Dict[str, _ModelBucket] = {}
+        self._lock = threading.Lock()
+        self._counts = {'lookups': 0, 'exact_hits': 0, 'semantic_hits': 0, 'misses': 0, 'stores': 0, 'errors': 0}
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            self._counts[field] += 1
+
+    def _version(self) -> Any:
+        try:
+            return self.catalog_version() if self.catalog_version is not None else None
+        except Exception as e:
+            logger.error(f"Catalog version unavailable: {e}")
+            return None
+
+    def _embed(self, question: str) -> Optional[np.ndarray]:
+        if self.encode is None:
+            return None
+        try:
+            vector = self.encode(question)
+        except Exception as e:
+            logger.error(f"Question embedding failed: {e}")
+            self._count('errors')
+            return None
+        return None if vector is None else np.asarray(vector, dtype=np.float32)
+
+    def _is_live(self, entry: Dict[str, Any], version: Any, now: float) -> bool:
+        return entry['version'] == version and now - entry['stored_at'] <= self.ttl
+
+    def _prune(self, bucket: _ModelBucket, version: Any, now: float) -> None:
+        live = [entry for entry in bucket.entries if self._is_live(entry, version, now)]
+        if len(live) > self.max_entries:
+            live = live[-self.max_entries:]
+        if len(live) != len(bucket.entries):
+            bucket.entries = live
+            bucket.rebuild()
+
+    # ------------------------------------------------------------------
+    # Lookup / store
+    # ------------------------------------------------------------------
+
+    def lookup(self, question: str, model_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Cached response for a first-turn question.
+
+        Args:
+            question: User message
+            model_name: Model the answer must come from
+
+        Returns:
+            Copy of the stored response dictionary, or None
+        """
+        self._count('lookups')
+        key = question_key(question)
+        version, now = self._version(), time.time()
+
+        with self._lock:
+            bucket = self._buckets.get(model_name)
+            entry = bucket.by_key.get(key) if bucket is not None else None
+            has_vectors = bucket is not None and bucket.matrix is not None
+        if entry is not None and self._is_live(entry, version, now):
+            self._count('exact_hits')
+            return dict(entry['response'])
+        if not has_vectors:
+            self._count('misses')
+            return None
+
+        vector = self._embed(question)
+        if vector is None:
+            self._count('misses')
+            return None
+        numbers = _NUMBER.findall(key)
+        with self._lock:
+            self._prune(bucket, version, now)
+            if bucket.matrix is None:
+                entry = None
+            else:
+                candidates = [e for e in bucket.entries if e['vector'] is not None]
+                scores = bucket.matrix @ vector
+                entry = None
+                for row in np.argsort(-scores)[:5]:
+                    if scores[row] < self.threshold:
+                        break
+                    if candidates[row]['numbers'] == numbers:
+                        entry = candidates[row]
+                        break
+        if entry is None:
+            self._count('misses')
+            return None
+        self._count('semantic_hits')
+        logger.info(f"Chat cache: '{question[:60]}' answered as '{entry['question'][:60]}'")
+        return dict(entry['response'])
+
+    def store(self, question: str, model_name: str, response: Dict[str, Any]) -> None:
+        """
+        Remember the response to a first-turn question.
+
+        Args:
+            question: User message
+            model_name: Model that was asked
+            response: JSON response sent to the client (reply and cards)
+        """
+        key = question_key(question)
+        entry = {
+            'key': key,
+            'question': question,
+            'numbers': _NUMBER.findall(key),
+            'vector': self._embed(question),
+            'response': dict(response),
+            'version': self._version(),
+            'stored_at': time.time(),
+        }
+        with self._lock:
+            bucket = self._buckets.setdefault(model_name, _ModelBucket())
+            bucket.entries = [e for e in bucket.entries if e['key'] != key] + [entry]
+            self._prune(bucket, entry['version'], entry['stored_at'])
+            bucket.rebuild()
+            self._counts['stores'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counts)
+            stats['entries'] = {model: len(bucket.entries) for model, bucket in self._buckets.items()}
+        hits = stats['exact_hits'] + stats['semantic_hits']
+        stats['hit_rate'] = round(hits / stats['lookups'], 4) if stats['lookups'] else 0.0
+        stats['threshold'] = self.threshold
+        return stats
+
+
+# Singleton instance
+_response_cache_instance = None
+
+
+def get_response_cache(
+    encode: Optional[Callable[[str], Optional[np.ndarray]]] = None,
+    catalog_version: Optional[Callable[[], Any]] = None
+) -> SemanticResponseCache:
+    """
+    Get or create the shared response cache.
+
+    Args:
+        encode: Question encoder, used when the cache is created
+        catalog_version: Catalog version callback, used when the cache is created
+    """
+    global _response_cache_instance
+    if _response_cache_instance is None:
+        _response_cache_instance = SemanticResponseCache(encode, catalog_version)
+    return _response_cache_instance
@@ -0,0 +1,223 @@
+"""
+Structured Search Filters
+Media type, release year range, minimum rating / vote count and original
+language restrictions for catalog searches, translated into a Chroma `where`
+clause, a metadata predicate, or a NumPy row mask over a local mirror
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Catalog media_type values covered by each filter value
+MEDIA_TYPE_GROUPS = {
+    'movie': ('movie', 'anime_movie'),
+    'tv': ('tv', 'anime_tv'),
+    'anime': ('anime_tv', 'anime_movie'),
+    'anime_movie': ('anime_movie',),
+    'anime_tv': ('anime_tv',),
+}
+
+MEDIA_TYPE_ALIASES = {
+    'movies': 'movie', 'film': 'movie', 'films': 'movie',
+    'show': 'tv', 'shows': 'tv', 'series': 'tv', 'tv_show': 'tv', 'tv show': 'tv', 'tv shows': 'tv',
+}
+
+FILTER_KEYS = ('media_type', 'year_from', 'year_to', 'min_rating', 'min_votes', 'language')
+
+# Year bounds accepted by parse_filters, and the range an open-ended filter spans on records without release_year_num
+MIN_YEAR, MAX_YEAR = 1870, 2100
+
+
+def _to_int(value) -> Optional[int]:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def release_year_num(metadata: Dict[str, Any]) -> int:
+    """Numeric release year of a stored item (0 when unknown); older records only carry the string field."""
+    year = metadata.get('release_year_num')
+    if isinstance(year, (int, float)) and year:
+        return int(year)
+    return _to_int(str(metadata.get('release_year') or '')[:4]) or 0
+
+
+def parse_filters(data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Validate filters produced by the chat analysis step.
+
+    Args:
+        data: Loosely typed dictionary with any of FILTER_KEYS
+
+    Returns:
+        Dictionary with only the usable keys, or None if nothing is left
+    """
+    if not isinstance(data, dict):
+        return None
+    filters = {}
+
+    media_type = str(data.get('media_type') or '').strip().lower()
+    media_type = MEDIA_TYPE_ALIASES.get(media_type, media_type)
+    if media_type in MEDIA_TYPE_GROUPS:
+        filters['media_type'] = media_type
+
+    for key in ('year_from', 'year_to'):
+        year = _to_int(data.get(key))
+        if year and MIN_YEAR <= year <= MAX_YEAR:
+            filters[key] = year
+    if filters.get('year_from') and filters.get('year_to') and filters['year_from'] > filters['year_to']:
+        filters['year_from'], filters['year_to'] = filters['year_to'], filters['year_from']
+
+    min_rating = _to_float(data.get('min_rating'))
+    if min_rating and 0 < min_rating <= 10:
+        filters['min_rating'] = min_rating
+    min_votes = _to_int(data.get('min_votes'))
+    if min_votes and min_votes > 0:
+        filters['min_votes'] = min_votes
+
+    language = str(data.get('language') or '').strip().lower()
+    if len(language) == 2 and language.isalpha():
+        filters['language'] = language
+
+    return filters or None
+
+
+def _year_clause(year_from: Optional[int], year_to: Optional[int]) -> Dict[str, Any]:
+    """
+    Year range on the numeric release_year_num field written by
+    scripts/generate_embeddings.py, or on the release_year string of items
+    ingested before that field existed (same results as matches()).
+    """
+    bounds = []
+    if year_from:
+        bounds.append({'release_year_num': {'$gte': year_from}})
+    if year_to:
+        bounds.append({'release_year_num': {'$lte': year_to}})
+    numeric = bounds[0] if len(bounds) == 1 else {'$and': bounds}
+    # Open-ended ranges on the string field stop a few years past today
+    last = year_to or min(MAX_YEAR, datetime.now().year + 5)
+    years = [str(year) for year in range(year_from or MIN_YEAR, last + 1)]
+    return {'$or': [numeric, {'release_year': {'$in': years}}]}
+
+
+def to_where(filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Chroma `where` clause for structured filters."""
+    if not filters:
+        return None
+    clauses: List[Dict[str, Any]] = []
+    if filters.get('media_type'):
+        clauses.append({'media_type': {'$in': list(MEDIA_TYPE_GROUPS[filters['media_type']])}})
+    if filters.get('year_from') or filters.get('year_to'):
+        clauses.append(_year_clause(filters.get('year_from'), filters.get('year_to')))
+    if filters.get('min_rating'):
+        clauses.append({'vote_average': {'$gte': filters['min_rating']}})
+    if filters.get('min_votes'):
+        clauses.append({'vote_count': {'$gte': filters['min_votes']}})
+    if filters.get('language'):
+        clauses.append({'original_language': filters['language']})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {'$and': clauses}
+
+
+def merge_where(*clauses: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """AND together any number of `where` clauses, skipping empty ones."""
+    clauses = [clause for clause in clauses if clause]
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {'$and': clauses}
+
+
+def matches(metadata: Dict[str, Any], filters: Optional[Dict[str, Any]]) -> bool:
+    """Whether one item's metadata satisfies the filters (same semantics as to_where)."""
+    if not filters:
+        return True
+    if filters.get('media_type') and metadata.get('media_type', 'movie') not in MEDIA_TYPE_GROUPS[filters['media_type']]:
+        return False
+    year = release_year_num(metadata)
+    if filters.get('year_from') and year < filters['year_from']:
+        return False
+    if filters.get('year_to') and (not year or year > filters['year_to']):
+        return False
+    if filters.get('min_rating') and (_to_float(metadata.get('vote_average')) or 0) < filters['min_rating']:
+        return False
+    if filters.get('min_votes') and (_to_int(metadata.get('vote_count')) or 0) < filters['min_votes']:
+        return False
+    if filters.get('language') and str(metadata.get('original_language') or '').lower() != filters['language']:
+        return False
+    return True
+
+
+def describe(filters: Optional[Dict[str, Any]]) -> str:
+    """Short human-readable summary, e.g. "TV shows, 2023-2025, rated 7+"."""
+    if not filters:
+        return ""
+    parts = []
+    if filters.get('media_type'):
+        parts.append({'movie': 'movies', 'tv': 'TV shows', 'anime': 'anime',
+                      'anime_movie': 'anime movies', 'anime_tv': 'anime series'}[filters['media_type']])
+    year_from, year_to = filters.get('year_from'), filters.get('year_to')
+    if year_from and year_to:
+        parts.append(str(year_from) if year_from == year_to else f"{year_from}-{year_to}")
+    elif year_from:
+        parts.append(f"{year_from} or later")
+    elif year_to:
+        parts.append(f"{year_to} or earlier")
+    if filters.get('min_rating'):
+        parts.append(f"rated {filters['min_rating']:g}+")
+    if filters.get('min_votes'):
+        parts.append(f"{filters['min_votes']}+ votes")
+    if filters.get('language'):
+        parts.append(f"original language '{filters['language']}'")
+    return ", ".join(parts)
+
+
+class FilterColumns:
+    """
+    Columnar copy of the filterable metadata of a fixed list of items, so a
+    filter becomes a boolean row mask in a few vectorised comparisons.
+    """
+
+    def __init__(self, metadatas: List[Dict[str, Any]]):
+        self.media_types = np.array([str(m.get('media_type', 'movie')) for m in metadatas])
+        self.years = np.array([release_year_num(m) for m in metadatas], dtype=np.int32)
+        self.ratings = np.array([_to_float(m.get('vote_average')) or 0.0 for m in metadatas], dtype=np.float32)
+        self.votes = np.array([_to_int(m.get('vote_count')) or 0 for m in metadatas], dtype=np.int64)
+        self.languages = np.array([str(m.get('original_language') or '').lower() for m in metadatas])
+
+    def __len__(self) -> int:
+        return len(self.years)
+
+    def mask(self, filters: Optional[Dict[str, Any]]) -> np.ndarray:
+        """
+        Rows that satisfy the filters.
+
+        Returns:
+            Boolean array with one entry per item
+        """
+        mask = np.ones(len(self.years), dtype=bool)
+        if not filters:
+            return mask
+        if filters.get('media_type'):
+            mask &= np.isin(self.media_types, MEDIA_TYPE_GROUPS[filters['media_type']])
+        if filters.get('year_from'):
+            mask &= self.years >= filters['year_from']
+        if filters.get('year_to'):
+            mask &= (self.years > 0) & (self.years <= filters['year_to'])
+        if filters.get('min_rating'):
+            mask &= self.ratings >= filters['min_rating']
+        if filters.get('min_votes'):
+            mask &= self.votes >= filters['min_votes']
+        if filters.get('language'):
+            mask &= self.languages == filters['language']
+        return mask
@@ -0,0 +1,242 @@
+"""
+Title Index for the Movie Vector Database
+Normalized in-memory lookup of catalog titles (title, original title,
+alternative titles, base title) with prefix and fuzzy fallbacks
+"""
+
+import bisect
+import difflib
+import re
+import threading
+import time
+import unicodedata
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Match quality, best first
+EXACT, ALTERNATIVE, BASE = 0, 1, 2
+
+# Separator used for the alternative_titles metadata field (titles often contain commas)
+ALTERNATIVE_TITLES_SEPARATOR = " | "
+
+# Shortest query that may fall back to prefix / fuzzy matching
+MIN_FALLBACK_LENGTH = 3
+
+# Share of a title a partial query must cover ("Alien" is not "Alien: Romulus")
+MIN_TITLE_COVERAGE = 0.8
+
+FUZZY_CUTOFF = 0.88
+
+_ARTICLE = re.compile(r"^(the|a|an) ")
+
+
+def normalize_title(title: str) -> str:
+    """
+    Canonical form used for every key and query: accents stripped, lower case,
+    '&' spelled out, apostrophes dropped, other punctuation turned into spaces.
+    """
+    title = unicodedata.normalize('NFKD', str(title))
+    title = "".join(ch for ch in title if not unicodedata.combining(ch)).lower()
+    title = title.replace('&', ' and ')
+    title = re.sub(r"['’`]", "", title)
+    title = re.sub(r"[^\w\s]", " ", title)
+    return " ".join(title.split())
+
+
+def title_keys(metadata: Dict[str, Any]) -> List[Tuple[str, int]]:
+    """Every (normalized key, match quality) an item should be found under."""
+    keys = []
+    for field in ('title', 'original_title'):
+        if metadata.get(field):
+            keys.append((normalize_title(metadata[field]), EXACT))
+    for alternative in str(metadata.get('alternative_titles') or '').split('|'):
+        if alternative.strip():
+            keys.append((normalize_title(alternative), ALTERNATIVE))
+
+    title = str(metadata.get('title') or '')
+    if '(' in title:
+        # "Dune (2021)" is also found as "dune"
+        keys.append((normalize_title(title.split('(')[0]), BASE))
+    for key, _ in list(keys):
+        stripped = _ARTICLE.sub("", key)
+        if stripped != key:
+            # "The Matrix" is also found as "matrix"
+            keys.append((stripped, BASE))
+    return [(key, quality) for key, quality in keys if key]
+
+
+class TitleIndex:
+    """
+    Thread-safe title -> catalog item index.
+
+    Lookups try an exact key match, then (for queries of at least
+    MIN_FALLBACK_LENGTH characters) the keys the query is a whole-word prefix
+    of covering MIN_TITLE_COVERAGE of the key, then difflib close matches
+    among keys sharing the query's first letter.
+    Items are added and removed incrementally; build() replaces everything.
+    """
+
+    def __init__(self, refresh_interval: float = 3600):
+        self.refresh_interval = refresh_interval
+        self.source = None
+        self.built_at = 0.0
+        self._lock = threading.Lock()
+        self._rows: Dict[str, Dict[str, Any]] = {}
+        self._keys: Dict[str, Dict[str, int]] = {}
+        self._sorted_keys: List[str] = []
+        self._sorted_dirty = False
+
+    @property
+    def ready(self) -> bool:
+        return self.built_at > 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def is_stale(self) -> bool:
+        return not self.ready or time.time() - self.built_at > self.refresh_interval
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+
+    def build(self, rows: Iterable[Tuple[str, Dict[str, Any], Optional[str]]], source: Any = None) -> int:
+        """
+        Replace the index contents.
+
+        Args:
+            rows: (id, metadata, document or None) tuples
+            source: Identifier of the data the index was built from
+
+        Returns:
+            Number of items indexed
+        """
+        new_rows, new_keys = {}, {}
+        for item_id, metadata, document in rows:
+            new_rows[item_id] = {'id': item_id, 'metadata': metadata or {}, 'document': document}
+            for key, quality in title_keys(metadata or {}):
+                bucket = new_keys.setdefault(key, {})
+                bucket[item_id] = min(quality, bucket.get(item_id, quality))
+        sorted_keys = sorted(new_keys)
+
+        with self._lock:
+            self._rows, self._keys, self._sorted_keys = new_rows, new_keys, sorted_keys
+            self._sorted_dirty = False
+            self.source = source
+            self.built_at = time.time()
+        logger.info(f"Title index built: {len(new_rows)} items, {len(sorted_keys)} keys")
+        return len(new_rows)
+
+    def add(self, ids: List[str], metadatas: List[Dict[str, Any]], documents: Optional[List[str]] = None) -> None:
+        """Insert or replace items (e.g. after an upsert)."""
+        with self._lock:
+            for i, item_id in enumerate(ids):
+                self._discard(item_id)
+                metadata = metadatas[i] or {}
+                self._rows[item_id] = {
+                    'id': item_id,
+                    'metadata': metadata,
+                    'document': documents[i] if documents else None
+                }
+                for key, quality in title_keys(metadata):
+                    bucket = self._keys.setdefault(key, {})
+                    bucket[item_id] = min(quality, bucket.get(item_id, quality))
+            self._sorted_dirty = True
+
+    def remove(self, item_id: str) -> None:
+        with self._lock:
+            self._discard(item_id)
+            self._sorted_dirty = True
+
+    def _discard(self, item_id: str) -> None:
+        row = self._rows.pop(item_id, None)
+        if row is None:
+            return
+        for key, _ in title_keys(row['metadata']):
+            bucket = self._keys.get(key)
+            if bucket is not None:
+                bucket.pop(item_id, None)
+                if not bucket:
+                    del self._keys[key]
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+
+    def lookup(self, title: str, year: Optional[str] = None, exact_only: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Find the catalog item for a title.
+
+        Args:
+            title: Title as written by the user or the LLM
+            year: Optional release year; only items from that year match
+            exact_only: Skip the prefix and fuzzy fallbacks
+
+        Returns:
+            Dictionary with id, metadata and document (None when the index was
+            built without documents), or None
+        """
+        query = normalize_title(title)
+        if not query:
+            return None
+
+        with self._lock:
+            if self._sorted_dirty:
+                self._sorted_keys = sorted(self._keys)
+                self._sorted_dirty = False
+            match = self._best(self._keys.get(query), year, query)
+            fallback = not exact_only and len(query) >= MIN_FALLBACK_LENGTH
+            if match is None and fallback:
+                match = self._best(self._prefix_candidates(query), year, query)
+            if match is None and fallback:
+                match = self._best(self._fuzzy_candidates(query), year, query)
+            return dict(match) if match else None
+
+    def _prefix_candidates(self, query: str, limit: int = 50) -> Dict[str, int]:
+        candidates = {}
+        # Only keys that continue with a new word ("her" never matches "heretic")
+        prefix = query + " "
+        start = bisect.bisect_left(self._sorted_keys, prefix)
+        for key in self._sorted_keys[start:start + limit]:
+            if not key.startswith(prefix):
+                break
+            if len(query) < MIN_TITLE_COVERAGE * len(key):
+                continue
+            for item_id, quality in self._keys[key].items():
+                candidates[item_id] = min(quality, candidates.get(item_id, quality))
+        return candidates
+
+    def _fuzzy_candidates(self, query: str) -> Dict[str, int]:
+        # Only compare against keys with the same first letter
+        lo = bisect.bisect_left(self._sorted_keys, query[0])
+        hi = bisect.bisect_left(self._sorted_keys, chr(ord(query[0]) + 1))
+        candidates = {}
+        for key in difflib.get_close_matches(query, self._sorted_keys[lo:hi], n=3, cutoff=FUZZY_CUTOFF):
+            for item_id, quality in self._keys[key].items():
+                candidates[item_id] = min(quality, candidates.get(item_id, quality))
+        return candidates
+
+    def _best(self, candidates: Optional[Dict[str, int]], year: Optional[str], query: str) -> Optional[Dict[str, Any]]:
+        if not candidates:
+            return None
+        best, best_rank = None, None
+        for item_id, quality in candidates.items():
+            row = self._rows.get(item_id)
+            if row is None:
+                continue
+            metadata = row['metadata']
+            if year and str(metadata.get('release_year', '')) != str(year):
+                continue
+            # Better match quality first, then the closest title length, then the more popular item
+            title_gap = abs(len(normalize_title(metadata.get('title', ''))) - len(query))
+            rank = (quality, title_gap, -float(metadata.get('popularity') or 0))
+            if best_rank is None or rank < best_rank:
+                best, best_rank = row, rank
+        return best
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {'items': len(self._rows), 'keys': len(self._keys), 'built_at': self.built_at, 'source': self.source}
@@ -0,0 +1,297 @@
+"""
+Chat Card Title Resolver
+Turns the titles recommended in a chat reply into poster cards: duplicates
+are resolved once, the local catalog is tried before TMDb search, lookups run
+concurrently under a deadline, and results are cached across users
+"""
+
+import os
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from api.cache import LRUCache
+from api.chatbot import is_recent_release, is_upcoming_release
+from api.search_filters import MEDIA_TYPE_GROUPS
+from api.title_index import normalize_title
+from api.tmdb_client import (
+    TMDB_API_KEY, POSTER_PLACEHOLDER, build_poster_url, cached_tmdb_request, fetch_poster, poster_cache
+)
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Seconds a chat reply waits for its cards; titles still pending get a placeholder
+CHAT_CARD_DEADLINE = float(os.getenv("CHAT_CARD_DEADLINE", "3"))
+
+# How long a resolved title, or a title TMDb does not know, is reused
+RESOLVED_TTL = 24 * 3600
+NOT_FOUND_TTL = 3600
+
+# Card sections of a chat response and the TMDb endpoint each one searches
+SECTIONS = (("movies", "movie"), ("tv_shows", "tv"))
+
+# Shared by all requests; lookups that miss the deadline keep running and warm the cache
+_resolver_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='chat-cards')
+
+# Cached value for titles neither the catalog nor TMDb could find
+_NOT_FOUND = {}
+
+
+def _tmdb_type(catalog_media_type: str) -> str:
+    """TMDb endpoint of a catalog media_type (anime_movie -> movie, anime_tv -> tv)."""
+    return 'tv' if catalog_media_type in MEDIA_TYPE_GROUPS['tv'] else 'movie'
+
+
+class TitleResolver:
+    """
+    Batched (title, year, media type) -> TMDb item resolution.
+
+    A resolved item is a small dictionary (id, media_type, title,
+    release_date, poster_url); cards are built from it on every request so
+    RECENT / UPCOMING labels stay current while the item itself is cached.
+    """
+
+    def __init__(
+        self,
+        catalog_lookup: Optional[Callable[[str, Optional[str]], Optional[Dict[str, Any]]]] = None,
+        deadline: float = CHAT_CARD_DEADLINE,
+        max_entries: int = 20000
+    ):
+        """
+        Args:
+            catalog_lookup: (title, year) -> catalog match with id and metadata, or None
+            deadline: Default time budget in seconds for one batch
+            max_entries: Bound on cached titles
+        """
+        self.catalog_lookup = catalog_lookup
+        self.deadline = deadline
+        self.cache = LRUCache(max_entries=max_entries, ttl=RESOLVED_TTL, sizeof=lambda item: 1)
+        self._lock = threading.Lock()
+        self._counts = {'titles': 0, 'lookups': 0, 'cache_hits': 0, 'catalog_hits': 0,
+                        'tmdb_hits': 0, 'not_found': 0, 'timeouts': 0, 'errors': 0}
+
+    def _count(self, field: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counts[field] += amount
+
+    # ------------------------------------------------------------------
+    # Batch resolution
+    # ------------------------------------------------------------------
+
+    def resolve(
+        self,
+        movies: List[Dict[str, Any]],
+        tv_shows: List[Dict[str, Any]],
+        deadline: Optional[float] = None
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Build the poster cards for a reply's recommended titles.
+
+        Args:
+            movies: {"title", "year"} dictionaries from the reply
+            tv_shows: {"title", "year"} dictionaries from the reply
+            deadline: Time budget in seconds (defaults to the resolver's)
+
+        Returns:
+            Dictionary with "movies" and "tv_shows" card lists, in reply order
+        """
+        deadline = self.deadline if deadline is None else deadline
+        deadline_at = time.monotonic() + deadline
+
+        requested = {"movies": movies or [], "tv_shows": tv_shows or []}
+        wanted: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        for key, media_type in SECTIONS:
+            for media in requested[key]:
+                if not media.get("title"):
+                    continue
+                self._count('titles')
+                wanted.setdefault(self._cache_key(media, media_type), media)
+
+        resolved: Dict[Tuple[str, str, str], Any] = {}
+        futures = {}
+        for cache_key, media in wanted.items():
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self._count('cache_hits')
+                resolved[cache_key] = cached
+            else:
+                futures[cache_key] = _resolver_executor.submit(
+                    self._resolve_one, media["title"], media.get("year"), cache_key[2], cache_key
+                )
+
+        if futures:
+            wait(futures.values(), timeout=max(0.0, deadline_at - time.monotonic()))
+        for cache_key, future in futures.items():
+            if not future.done():
+                logger.warning(f"Card for '{wanted[cache_key]['title']}' missed the {deadline}s deadline")
+                self._count('timeouts')
+            elif future.exception() is not None:
+                logger.error(f"Card lookup for '{wanted[cache_key]['title']}' failed: {future.exception()}")
+                self._count('errors')
+            else:
+                resolved[cache_key] = future.result()
+
+        cards = {"movies": [], "tv_shows": []}
+        seen = set()
+        for key, media_type in SECTIONS:
+            for media in requested[key]:
+                if not media.get("title"):
+                    continue
+                cache_key = self._cache_key(media, media_type)
+                item = resolved.get(cache_key)
+                # One card per TMDb item, however many ways the reply spelled it
+                card_id = (item['media_type'], item['id']) if item else cache_key
+                if card_id in seen:
+                    continue
+                seen.add(card_id)
+                if item:
+                    cards[key].append(self._card(item))
+                else:
+                    cards[key].append(self._placeholder(media, timed_out=cache_key not in resolved))
+        return cards
+
+    @staticmethod
+    def _cache_key(media: Dict[str, Any], media_type: str) -> Tuple[str, str, str]:
+        return (normalize_title(media["title"]), str(media.get("year") or ""), media_type)
+
+    def _resolve_one(self, title: str, year: Optional[str], media_type: str, cache_key) -> Dict[str, Any]:
+        """Catalog, then TMDb search; the result (found or not) is cached."""
+        self._count('lookups')
+        item = self._from_catalog(title, year, media_type)
+        if item is not None:
+            self._count('catalog_hits')
+        else:
+            item = self._from_tmdb(title, year, media_type)
+            self._count('tmdb_hits' if item else 'not_found')
+        if item:
+            self.cache.set(cache_key, item)
+        else:
+            print(f"⚠️ No {media_type} results found for: {title}")
+            self.cache.set(cache_key, _NOT_FOUND, ttl=NOT_FOUND_TTL)
+        return item
+
+    # ------------------------------------------------------------------
+    # Sources
+    # ------------------------------------------------------------------
+
+    def _from_catalog(self, title: str, year: Optional[str], media_type: str) -> Optional[Dict[str, Any]]:
+        """Catalog items carry the TMDb id; only the poster may need a details call."""
+        if self.catalog_lookup is None:
+            return None
+        try:
+            match = self.catalog_lookup(title, year)
+        except Exception as e:
+            logger.error(f"Catalog lookup failed for '{title}': {e}")
+            return None
+        if match is None:
+            return None
+        metadata = match.get('metadata') or {}
+        if metadata.get('media_type', 'movie') not in MEDIA_TYPE_GROUPS[media_type]:
+            return None
+
+        tmdb_type = _tmdb_type(metadata.get('media_type', 'movie'))
+        media_id = int(match['id']) if str(match['id']).isdigit() else match['id']
+        if metadata.get('poster_path'):
+            poster_url = build_poster_url(metadata['poster_path'])
+            poster_cache.set((tmdb_type, media_id), poster_url)
+        else:
+            # Catalogs collected before poster_path was stored
+            poster_url = fetch_poster(media_id, is_movie=tmdb_type == 'movie', max_retries=1)
+        return {
+            'id': media_id,
+            'media_type': tmdb_type,
+            'title': metadata.get('title') or title,
+            'release_date': metadata.get('release_date') or '',
+            'poster_url': poster_url,
+        }
+
+    @staticmethod
+    def _from_tmdb(title: str, year: Optional[str], media_type: str) -> Optional[Dict[str, Any]]:
+        """First search result, with the year if known and again without it on a miss."""
+        url = (f"https://api.themoviedb.org/3/search/{media_type}?api_key={TMDB_API_KEY}"
+               f"&query={quote(str(title))}&page=1&include_adult=true")
+        results = []
+        if year:
+            year_param = 'year' if media_type == 'movie' else 'first_air_date_year'
+            results = cached_tmdb_request(f"{url}&{year_param}={quote(str(year))}").get("results") or []
+        if not results:
+            results = cached_tmdb_request(url).get("results") or []
+        if not results:
+            return None
+
+        media_info = results[0]
+        poster_url = build_poster_url(media_info.get("poster_path"))
+        if media_info.get("poster_path"):
+            poster_cache.set((media_type, media_info["id"]), poster_url)
+        return {
+            'id': media_info["id"],
+            'media_type': media_type,
+            'title': media_info.get("title") if media_type == "movie" else media_info.get("name"),
+            'release_date': (media_info.get("release_date") if media_type == "movie"
+                             else media_info.get("first_air_date")) or '',
+            'poster_url': poster_url,
+        }
+
+    # ------------------------------------------------------------------
+    # Cards
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _card(item: Dict[str, Any]) -> Dict[str, Any]:
+        release_date = item['release_date']
+        release_status = ""
+        if is_upcoming_release(release_date):
+            release_status = " (UPCOMING)"
+        elif is_recent_release(release_date):
+            release_status = " (RECENT)"
+        return {
+            "title": item['title'],
+            "year": release_date[:4] if release_date else "Unknown",
+            "poster_url": item['poster_url'],
+            "tmdb_link": f"/{item['media_type']}/{item['id']}",
+            "release_status": release_status
+        }
+
+    @staticmethod
+    def _placeholder(media: Dict[str, Any], timed_out: bool) -> Dict[str, Any]:
+        """Card for a title that was not found, or whose lookup missed the deadline."""
+        return {
+            "title": media["title"],
+            "year": media.get("year") or "N/A",
+            "poster_url": POSTER_PLACEHOLDER,
+            "tmdb_link": "#",
+            "release_status": "" if timed_out else " (Not found in database)"
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counts)
+        stats['cache'] = self.cache.info()
+        return stats
+
+
+# Singleton instance
+_title_resolver_instance = None
+
+
+def get_title_resolver(
+    catalog_lookup: Optional[Callable[[str, Optional[str]], Optional[Dict[str, Any]]]] = None
+) -> TitleResolver:
+    """
+    Get or create the shared resolver.
+
+    Args:
+        catalog_lookup: Catalog title lookup, used when the resolver is created
+                        (or set later if it was created without one)
+    """
+    global _title_resolver_instance
+    if _title_resolver_instance is None:
+        _title_resolver_instance = TitleResolver(catalog_lookup)
+    elif catalog_lookup is not None and _title_resolver_instance.catalog_lookup is None:
+        _title_resolver_instance.catalog_lookup = catalog_lookup
+    return _title_resolver_instance
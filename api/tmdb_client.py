@@ -1,10 +1,15 @@
 import requests
-import time
 import os
 from dotenv import load_dotenv
 from datetime import datetime
 import hashlib
-from functools import lru_cache
+import re
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from api.cache import LRUCache, ResponseCache, create_backend
+from api.tmdb_transport import get_tmdb_transport
 
 # Load environment variables
 load_dotenv()
@@ -12,33 +17,103 @@ load_dotenv()
 TMDB_API_KEY = os.getenv("TMDB_API_KEY")
 TMDB_API_KEY_2 = os.getenv("TMDB_API_KEY_2")
 
-# Simple in-memory cache for TMDB data
-tmdb_cache = {}
+# Shared pooled session for every TMDb call
+tmdb_http = get_tmdb_transport()
+
+# Genre slugs used by /genre/<name> and /tv_genre/<name>, mapped to TMDb genre ids
+MOVIE_GENRE_IDS = {
+    'romance': 10749, 'horror': 27, 'fantasy': 14, 'science_fiction': 878, 'mystery': 9648,
+    'western': 37, 'drama': 18, 'action': 28, 'comedy': 35, 'thriller': 53, 'adventure': 12,
+    'animation': 16, 'crime': 80, 'family': 10751, 'history': 36, 'music': 10402, 'war': 10752,
+    'documentary': 99, 'tv_movie': 10770
+}
+TV_GENRE_IDS = {
+    'action_adventure': 10759, 'animation': 16, 'comedy': 35, 'crime': 80, 'documentary': 99,
+    'drama': 18, 'family': 10751, 'kids': 10762, 'mystery': 9648, 'news': 10763, 'reality': 10764,
+    'sci_fi_fantasy': 10765, 'soap': 10766, 'talk': 10767, 'war_politics': 10768, 'western': 37
+}
+
+# Freshness windows (seconds) per TMDb endpoint family; first matching path fragment wins
+TMDB_CACHE_TTLS = [
+    ('/trending/', 1800),
+    ('/search/', 600),
+    ('/discover/', 3 * 3600),
+    ('/recommendations', 6 * 3600),
+    ('/now_playing', 3600),
+    ('/upcoming', 3600),
+    ('/popular', 3600),
+    ('/airing_today', 3600),
+    ('/on_the_air', 3600),
+]
+TMDB_DETAILS_TTL = 24 * 3600
+TMDB_DEFAULT_TTL = 3600
+
+# Bounded TMDb response cache (backend selected by CACHE_BACKEND, see api/cache.py)
+tmdb_cache = ResponseCache(
+    create_backend(
+        os.getenv("TMDB_CACHE_BACKEND"),
+        namespace='tmdb',
+        max_entries=int(os.getenv("TMDB_CACHE_MAX_ENTRIES", "2048")),
+        max_bytes=int(os.getenv("TMDB_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    ),
+    stale_ttl=float(os.getenv("TMDB_CACHE_STALE_TTL", "3600"))
+)
+
+# Per-thread refresh-ahead setting used by the background pre-warmer
+_refresh_state = threading.local()
+
+# Poster URLs by (media_type, id), filled from any payload that carries poster_path
+POSTER_PLACEHOLDER = "https://via.placeholder.com/500x750?text=No+Image"
+poster_cache = LRUCache(max_entries=20000, ttl=7 * 24 * 3600, sizeof=lambda url: 1)
+
+# Resolves posters missing from payloads without serialising the lookups
+_poster_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='poster')
 
 def get_cache_key(*args):
     """Generate a cache key from arguments"""
     return hashlib.md5(str(args).encode()).hexdigest()
 
-def cached_tmdb_request(url, max_age=3600):
+def get_cache_ttl(url):
+    """Pick the freshness window for a TMDb URL based on its endpoint"""
+    path = urlparse(url).path
+    for fragment, ttl in TMDB_CACHE_TTLS:
+        if fragment in path:
+            return ttl
+    if re.match(r'^/3/(movie|tv|person)/\d+$', path):
+        return TMDB_DETAILS_TTL
+    return TMDB_DEFAULT_TTL
+
+def get_cache_stats():
+    """Hit/miss/eviction counters and storage usage of the TMDb cache"""
+    return tmdb_cache.info()
+
+@contextmanager
+def refresh_ahead(fraction):
+    """
+    Within this block, refetch any cached TMDb response older than `fraction`
+    of its TTL and swap the new payload in, instead of serving it from cache.
+    """
+    previous = getattr(_refresh_state, 'fraction', None)
+    _refresh_state.fraction = fraction
+    try:
+        yield
+    finally:
+        _refresh_state.fraction = previous
+
+def cached_tmdb_request(url, max_age=None):
     """Make a TMDB request with caching"""
     cache_key = get_cache_key(url)
-    current_time = time.time()
-    
-    # Check if we have a cached response that's still valid
-    if cache_key in tmdb_cache:
-        cached_data, timestamp = tmdb_cache[cache_key]
-        if current_time - timestamp < max_age:
-            print(f"Cache hit for {url}")
-            return cached_data
+    ttl = max_age if max_age is not None else get_cache_ttl(url)
+    fraction = getattr(_refresh_state, 'fraction', None)
+    refresh_after = ttl * fraction if fraction is not None else None
     
-    # Make the request
-    print(f"Making request to {url}")
-    response = requests.get(url)
-    data = response.json()
+    def fetch():
+        print(f"Making request to {url}")
+        response = tmdb_http.get(url)
+        # Only successful responses are cached; error payloads are returned once
+        return response.json(), response.status_code == 200
     
-    # Cache the response
-    tmdb_cache[cache_key] = (data, current_time)
-    return data
+    return tmdb_cache.get_or_fetch(cache_key, fetch, ttl, refresh_after=refresh_after)
 
 def fetch_now_playing_movies(max_movies=18):
     url = f"https://api.themoviedb.org/3/movie/now_playing?api_key={TMDB_API_KEY}&language=en-US&page=1"
@@ -174,44 +249,78 @@ def fetch_shows_by_genre(genre_id, max_shows=50):
     data = cached_tmdb_request(url)
     return data.get('results', [])[:max_shows]
 
+def build_poster_url(poster_path):
+    """Full w500 poster URL for a TMDb poster_path, or the placeholder"""
+    return f"https://image.tmdb.org/t/p/w500{poster_path}" if poster_path else POSTER_PLACEHOLDER
+
+def remember_posters(results, is_movie=True):
+    """Cache the poster of every TMDb result that already carries a poster_path"""
+    media_type = "movie" if is_movie else "tv"
+    for item in results:
+        if item.get('id') is not None and item.get('poster_path'):
+            poster_cache.set((media_type, item['id']), build_poster_url(item['poster_path']))
+
 def fetch_poster(id, is_movie=True, max_retries=3, retry_delay=2):
     media_type = "movie" if is_movie else "tv"
+    cached = poster_cache.get((media_type, id))
+    if cached:
+        return cached
     url = f"https://api.themoviedb.org/3/{media_type}/{id}?api_key={TMDB_API_KEY}&language=en-US"
-    for attempt in range(max_retries):
-        try:
-            response = requests.get(url, timeout=5)
-            response.raise_for_status()
-            data = response.json()
-            poster_path = data.get('poster_path')
-            return f"https://image.tmdb.org/t/p/w500{poster_path}" if poster_path else "https://via.placeholder.com/500x750?text=No+Image"
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching poster (attempt {attempt + 1}/{max_retries}): {e}")
-            time.sleep(retry_delay)
-    print(f"Failed to fetch poster for {media_type}/{id} after {max_retries} retries.")
-    return "https://via.placeholder.com/500x750?text=No+Image"
+    try:
+        response = tmdb_http.get(url, max_retries=max_retries - 1, backoff=retry_delay)
+        response.raise_for_status()
+        data = response.json()
+        poster = build_poster_url(data.get('poster_path'))
+        poster_cache.set((media_type, id), poster)
+        return poster
+    except requests.exceptions.RequestException as e:
+        print(f"Failed to fetch poster for {media_type}/{id} after {max_retries} attempts: {e}")
+    return POSTER_PLACEHOLDER
+
+def resolve_posters(items, is_movie=True):
+    """
+    Map each TMDb result id to its poster URL.
+    Uses the payload's poster_path when present, then the poster cache, and
+    only fetches the remaining ids, concurrently.
+    """
+    media_type = "movie" if is_movie else "tv"
+    posters = {}
+    missing = []
+    for item in items:
+        if item.get('poster_path'):
+            posters[item['id']] = build_poster_url(item['poster_path'])
+            poster_cache.set((media_type, item['id']), posters[item['id']])
+        else:
+            cached = poster_cache.get((media_type, item['id']))
+            if cached:
+                posters[item['id']] = cached
+            else:
+                missing.append(item['id'])
+    if missing:
+        # Payload had no poster: a single quick attempt each, in parallel
+        fetched = _poster_executor.map(lambda media_id: fetch_poster(media_id, is_movie, max_retries=1), missing)
+        posters.update(zip(missing, fetched))
+    return posters
 
 def fetch_tmdb_recommendations(id, is_movie=True, max_recommendations=50):
     media_type = "movie" if is_movie else "tv"
     url = f"https://api.themoviedb.org/3/{media_type}/{id}/recommendations?api_key={TMDB_API_KEY}&language=en-US&page=1"
-    time.sleep(1)
     data = cached_tmdb_request(url)
-    return data.get('results', [])[:max_recommendations]
+    results = data.get('results', [])[:max_recommendations]
+    remember_posters(results, is_movie)
+    return results
 
 def fetch_movie_details(movie_id, max_retries=3, retry_delay=2):
     url = f"https://api.themoviedb.org/3/movie/{movie_id}?api_key={TMDB_API_KEY}&language=en-US&append_to_response=credits,videos,recommendations,reviews"
-    for attempt in range(max_retries):
-        try:
-            response = requests.get(url, timeout=5)
-            response.raise_for_status()
-            data = response.json()
-            if 'success' in data and not data['success']:
-                raise Exception(f"TMDb API error: {data.get('status_message', 'Unknown error')}")
-            break
-        except (requests.exceptions.RequestException, Exception) as e:
-            print(f"Attempt {attempt + 1}/{max_retries} failed for movie {movie_id}: {e}")
-            if attempt + 1 == max_retries:
-                raise Exception(f"Failed to fetch movie details after {max_retries} retries: {e}")
-            time.sleep(retry_delay)
+    try:
+        response = tmdb_http.get(url, max_retries=max_retries - 1, backoff=retry_delay)
+        response.raise_for_status()
+        data = response.json()
+        if 'success' in data and not data['success']:
+            raise Exception(f"TMDb API error: {data.get('status_message', 'Unknown error')}")
+    except (requests.exceptions.RequestException, Exception) as e:
+        print(f"Request failed for movie {movie_id}: {e}")
+        raise Exception(f"Failed to fetch movie details after {max_retries} attempts: {e}")
     
     print(f"Movie {movie_id} credits: {data.get('credits', {}).get('cast', [])[:12]}")  # Debug cast data
     
@@ -237,7 +346,7 @@ def fetch_movie_details(movie_id, max_retries=3, retry_delay=2):
     
     # Fetch certification
     release_url = f"https://api.themoviedb.org/3/movie/{movie_id}/release_dates?api_key={TMDB_API_KEY}"
-    release_response = requests.get(release_url)
+    release_response = tmdb_http.get(release_url)
     if release_response.status_code == 200:
         release_data = release_response.json()
         for result in release_data.get('results', []):
@@ -293,19 +402,15 @@ def fetch_movie_details(movie_id, max_retries=3, retry_delay=2):
 
 def fetch_tv_show_details(show_id, max_retries=3, retry_delay=2):
     url = f"https://api.themoviedb.org/3/tv/{show_id}?api_key={TMDB_API_KEY}&language=en-US&append_to_response=credits,videos,recommendations,reviews,seasons"
-    for attempt in range(max_retries):
-        try:
-            response = requests.get(url, timeout=5)
-            response.raise_for_status()
-            data = response.json()
-            if 'success' in data and not data['success']:
-                raise Exception(f"TMDb API error: {data.get('status_message', 'Unknown error')}")
-            break
-        except (requests.exceptions.RequestException, Exception) as e:
-            print(f"Attempt {attempt + 1}/{max_retries} failed for show {show_id}: {e}")
-            if attempt + 1 == max_retries:
-                raise Exception(f"Failed to fetch TV show details after {max_retries} retries: {e}")
-            time.sleep(retry_delay)
+    try:
+        response = tmdb_http.get(url, max_retries=max_retries - 1, backoff=retry_delay)
+        response.raise_for_status()
+        data = response.json()
+        if 'success' in data and not data['success']:
+            raise Exception(f"TMDb API error: {data.get('status_message', 'Unknown error')}")
+    except (requests.exceptions.RequestException, Exception) as e:
+        print(f"Request failed for show {show_id}: {e}")
+        raise Exception(f"Failed to fetch TV show details after {max_retries} attempts: {e}")
     
     show = {
         'id': data.get('id'),
@@ -383,55 +488,43 @@ def fetch_tv_show_details(show_id, max_retries=3, retry_delay=2):
 def fetch_actor_details(actor_id, max_retries=3, retry_delay=2):
     # Fetch actor details
     url = f"https://api.themoviedb.org/3/person/{actor_id}?api_key={TMDB_API_KEY}&language=en-US"
-    for attempt in range(max_retries):
-        try:
-            response = requests.get(url, timeout=5)
-            response.raise_for_status()
-            data = response.json()
-            if 'success' in data and not data['success']:
-                raise Exception(f"TMDb API error: {data.get('status_message', 'Unknown error')}")
-            break
-        except (requests.exceptions.RequestException, Exception) as e:
-            print(f"Attempt {attempt + 1}/{max_retries} failed for actor {actor_id}: {e}")
-            if attempt + 1 == max_retries:
-                raise Exception(f"Failed to fetch actor details after {max_retries} retries: {e}")
-            time.sleep(retry_delay)
+    try:
+        response = tmdb_http.get(url, max_retries=max_retries - 1, backoff=retry_delay)
+        response.raise_for_status()
+        data = response.json()
+        if 'success' in data and not data['success']:
+            raise Exception(f"TMDb API error: {data.get('status_message', 'Unknown error')}")
+    except (requests.exceptions.RequestException, Exception) as e:
+        print(f"Request failed for actor {actor_id}: {e}")
+        raise Exception(f"Failed to fetch actor details after {max_retries} attempts: {e}")
     
     actor_data = data
 
     # Fetch movie credits
     movie_credits_url = f"https://api.themoviedb.org/3/person/{actor_id}/movie_credits?api_key={TMDB_API_KEY}&language=en-US"
-    for attempt in range(max_retries):
-        try:
-            movie_response = requests.get(movie_credits_url, timeout=5)
-            movie_response.raise_for_status()
-            movie_credits_data = movie_response.json()
-            break
-        except requests.exceptions.RequestException as e:
-            print(f"Attempt {attempt + 1}/{max_retries} failed for movie credits of actor {actor_id}: {e}")
-            if attempt + 1 == max_retries:
-                raise Exception(f"Failed to fetch movie credits after {max_retries} retries: {e}")
-            time.sleep(retry_delay)
+    try:
+        movie_response = tmdb_http.get(movie_credits_url, max_retries=max_retries - 1, backoff=retry_delay)
+        movie_response.raise_for_status()
+        movie_credits_data = movie_response.json()
+    except requests.exceptions.RequestException as e:
+        print(f"Request failed for movie credits of actor {actor_id}: {e}")
+        raise Exception(f"Failed to fetch movie credits after {max_retries} attempts: {e}")
 
     # Fetch TV credits
     tv_credits_url = f"https://api.themoviedb.org/3/person/{actor_id}/tv_credits?api_key={TMDB_API_KEY}&language=en-US"
-    for attempt in range(max_retries):
-        try:
-            tv_response = requests.get(tv_credits_url, timeout=5)
-            tv_response.raise_for_status()
-            tv_credits_data = tv_response.json()
-            break
-        except requests.exceptions.RequestException as e:
-            print(f"Attempt {attempt + 1}/{max_retries} failed for TV credits of actor {actor_id}: {e}")
-            if attempt + 1 == max_retries:
-                raise Exception(f"Failed to fetch TV credits after {max_retries} retries: {e}")
-            time.sleep(retry_delay)
+    try:
+        tv_response = tmdb_http.get(tv_credits_url, max_retries=max_retries - 1, backoff=retry_delay)
+        tv_response.raise_for_status()
+        tv_credits_data = tv_response.json()
+    except requests.exceptions.RequestException as e:
+        print(f"Request failed for TV credits of actor {actor_id}: {e}")
+        raise Exception(f"Failed to fetch TV credits after {max_retries} attempts: {e}")
 
     # Fetch tagged images (deprecated but still functional)
     tagged_images = []
     try:
         tagged_images_url = f"https://api.themoviedb.org/3/person/{actor_id}/tagged_images?api_key={TMDB_API_KEY}"
-        tagged_response = requests.get(tagged_images_url)
+        tagged_response = tmdb_http.get(tagged_images_url)
         if tagged_response.status_code == 200 and ('success' not in tagged_response.json() or tagged_response.json()['success']):
             tagged_data = tagged_response.json()
             seen_file_paths = set()
@@ -459,7 +552,7 @@ def fetch_actor_details(actor_id, max_retries=3, retry_delay=2):
     }
     try:
         external_ids_url = f"https://api.themoviedb.org/3/person/{actor_id}/external_ids?api_key={TMDB_API_KEY}"
-        external_response = requests.get(external_ids_url)
+        external_response = tmdb_http.get(external_ids_url)
         if external_response.status_code == 200 and ('success' not in external_response.json() or external_response.json()['success']):
             external_ids_data = external_response.json()
             external_ids.update({
@@ -481,7 +574,7 @@ def fetch_actor_details(actor_id, max_retries=3, retry_delay=2):
     profile_images = []
     try:
         images_url = f"https://api.themoviedb.org/3/person/{actor_id}/images?api_key={TMDB_API_KEY}"
-        images_response = requests.get(images_url)
+        images_response = tmdb_http.get(images_url)
         if images_response.status_code == 200 and ('success' not in images_response.json() or images_response.json()['success']):
             images_data = images_response.json()
             profile_images = sorted(
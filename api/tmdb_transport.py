@@ -0,0 +1,257 @@
+"""
+TMDb HTTP Transport
+One pooled, keep-alive session shared by every TMDb call site, with timeouts,
+bounded concurrency, token-bucket rate limiting and jittered retries
+"""
+
+import os
+import random
+import threading
+import time
+import logging
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from api.rate_limit import create_rate_limiter
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TMDB_BASE_URL = "https://api.themoviedb.org/3"
+
+# Status codes worth retrying: rate limited or transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class _TransportMetrics:
+    """Counters for requests, retries, new connections (handshakes) and pool saturation."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.handshakes = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.saturated_waits = 0
+        self.total_latency = 0.0
+
+    def incr(self, field: str, amount: float = 1) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+    def enter(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def leave(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+
+class _CountingAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools report every new connection they open."""
+
+    def __init__(self, metrics: _TransportMetrics, **kwargs):
+        self._metrics = metrics
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        metrics = self._metrics
+
+        class CountingHTTPConnectionPool(HTTPConnectionPool):
+            def _new_conn(self):
+                metrics.incr('handshakes')
+                return super()._new_conn()
+
+        class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+            def _new_conn(self):
+                metrics.incr('handshakes')
+                return super()._new_conn()
+
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': CountingHTTPConnectionPool,
+            'https': CountingHTTPSConnectionPool,
+        }
+
+
+class TMDbTransport:
+    """
+    Shared HTTP client for api.themoviedb.org.
+
+    Configuration (environment variables):
+    - TMDB_POOL_SIZE: keep-alive connections and maximum concurrent requests (default 16)
+    - TMDB_TIMEOUT: per-request timeout in seconds (default 5)
+    - TMDB_RATE_LIMIT / TMDB_RATE_BURST: token bucket refill rate and size (default 40/s, burst 40);
+      RATE_LIMIT_BACKEND=sqlite shares the budget across worker processes
+    - TMDB_MAX_RETRIES: retries for connection errors, 429 and 5xx (default 2)
+    """
+
+    def __init__(
+        self,
+        pool_size: Optional[int] = None,
+        timeout: Optional[float] = None,
+        rate_limit: Optional[float] = None,
+        burst: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        backoff: float = 0.5
+    ):
+        self.pool_size = pool_size or int(os.getenv("TMDB_POOL_SIZE", "16"))
+        self.timeout = timeout or float(os.getenv("TMDB_TIMEOUT", "5"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("TMDB_MAX_RETRIES", "2"))
+        self.backoff = backoff
+        rate_limit = rate_limit or float(os.getenv("TMDB_RATE_LIMIT", "40"))
+        burst = burst or float(os.getenv("TMDB_RATE_BURST", str(rate_limit)))
+
+        self.metrics = _TransportMetrics()
+        self.rate_limiter = create_rate_limiter(rate_limit, burst, name='tmdb')
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+
+        self.session = requests.Session()
+        adapter = _CountingAdapter(
+            self.metrics,
+            pool_connections=4,
+            pool_maxsize=self.pool_size,
+            pool_block=True
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        backoff: Optional[float] = None
+    ) -> requests.Response:
+        """
+        GET a TMDb URL through the shared session.
+
+        Relative paths ("/movie/550") are resolved against the TMDb API base URL.
+        Connection errors, timeouts, 429 and 5xx responses are retried with
+        jittered exponential backoff (honouring Retry-After).
+
+        Args:
+            url: Absolute URL or path relative to TMDB_BASE_URL
+            params: Query parameters
+            timeout: Per-attempt timeout in seconds
+            max_retries: Retries after the first attempt
+            backoff: Base backoff in seconds
+
+        Returns:
+            The final requests.Response
+
+        Raises:
+            requests.exceptions.RequestException: if every attempt failed to connect
+        """
+        if url.startswith('/'):
+            url = TMDB_BASE_URL + url
+        timeout = timeout or self.timeout
+        max_retries = self.max_retries if max_retries is None else max_retries
+        backoff = self.backoff if backoff is None else backoff
+
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                response = self._send(url, params, timeout)
+                if response.status_code not in RETRY_STATUSES or attempt >= max_retries:
+                    return response
+                retry_after = response.headers.get('Retry-After')
+                logger.warning(f"TMDb returned {response.status_code} for {urlpath(url)}, retrying")
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt >= max_retries:
+                    self.metrics.incr('failures')
+                    raise
+                logger.warning(f"TMDb request to {urlpath(url)} failed ({e}), retrying")
+
+            attempt += 1
+            self.metrics.incr('retries')
+            time.sleep(self._backoff_delay(attempt, backoff, retry_after))
+
+    def get_json(self, url: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
+        """GET a TMDb URL and decode the JSON body."""
+        return self.get(url, params=params, **kwargs).json()
+
+    def _send(self, url: str, params: Optional[Dict[str, Any]], timeout: float) -> requests.Response:
+        self.rate_limiter.acquire()
+        if not self._slots.acquire(blocking=False):
+            # Every pooled connection is busy; count it and wait for a free slot
+            self.metrics.incr('saturated_waits')
+            self._slots.acquire()
+        self.metrics.enter()
+        started = time.monotonic()
+        try:
+            self.metrics.incr('requests')
+            return self.session.get(url, params=params, timeout=timeout)
+        finally:
+            self.metrics.incr('total_latency', time.monotonic() - started)
+            self.metrics.leave()
+            self._slots.release()
+
+    @staticmethod
+    def _backoff_delay(attempt: int, backoff: float, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        # Full jitter: uniform in [0, backoff * 2^(attempt-1)]
+        return random.uniform(0, backoff * (2 ** (attempt - 1)))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Transport metrics.
+
+        Returns:
+            Dictionary with request/retry counts, new connections opened
+            (TCP+TLS handshakes), connection reuse ratio and pool saturation
+        """
+        m = self.metrics
+        requests_made = m.requests
+        return {
+            'requests': requests_made,
+            'retries': m.retries,
+            'failures': m.failures,
+            'handshakes': m.handshakes,
+            'connection_reuse': round(1 - m.handshakes / requests_made, 4) if requests_made else 0.0,
+            'avg_latency_ms': round(m.total_latency / requests_made * 1000, 1) if requests_made else 0.0,
+            'pool_size': self.pool_size,
+            'in_flight': m.in_flight,
+            'peak_in_flight': m.peak_in_flight,
+            'saturated_waits': m.saturated_waits,
+            'rate_limiter': self.rate_limiter.get_stats(),
+        }
+
+
+def urlpath(url: str) -> str:
+    """Strip the query string (and with it the API key) from a URL for logging."""
+    return url.split('?', 1)[0]
+
+
+# Singleton instance
+_transport_instance = None
+_transport_lock = threading.Lock()
+
+
+def get_tmdb_transport() -> TMDbTransport:
+    """
+    Get or create the process-wide TMDb transport.
+
+    Returns:
+        TMDbTransport instance
+    """
+    global _transport_instance
+    if _transport_instance is None:
+        with _transport_lock:
+            if _transport_instance is None:
+                _transport_instance = TMDbTransport()
+    return _transport_instance
@@ -5,14 +5,46 @@ Handles embedding generation and similarity search for recent movies
 
 import chromadb
 from sentence_transformers import SentenceTransformer
+import copy
+import json
 import os
+import threading
+import time
 from typing import List, Dict, Any, Optional
 import logging
 
+import numpy as np
+
+from api.cache import LRUCache
+from api.embedding_cache import QueryEmbeddingCache, normalize_query
+from api.lexical_index import BM25Index, reciprocal_rank_fusion
+from api.neighbors import NeighborGraph, fetch_neighbor_graph
+from api.search_filters import matches, merge_where, to_where
+from api.title_index import TitleIndex
+from api.vector_mirror import VectorMirror
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Sentence-transformer used for every stored and query embedding
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+
+# Optional local copy of the model (see scripts/export_encoder.py); skips the Hugging Face download
+EMBEDDING_MODEL_PATH = os.getenv("EMBEDDING_MODEL_PATH")
+
+# Neighbour graph written by scripts/generate_embeddings.py
+NEIGHBOR_GRAPH_DIR = os.getenv("NEIGHBOR_GRAPH_DIR", os.path.join("data", "neighbor_graph"))
+
+# Published graph archive, downloaded at startup when none is deployed in NEIGHBOR_GRAPH_DIR
+NEIGHBOR_GRAPH_URL = os.getenv("NEIGHBOR_GRAPH_URL")
+
+# Seconds between checks of the catalog version published by the ingest script
+CATALOG_VERSION_INTERVAL = float(os.getenv("CATALOG_VERSION_INTERVAL", "60"))
+
+# int8 applies dynamic quantization to the encoder's Linear layers: faster CPU inference, less RSS
+EMBEDDING_QUANTIZE = os.getenv("EMBEDDING_QUANTIZE", "none").lower()
+
 
 class MovieVectorDB:
     """
@@ -51,16 +83,151 @@ class MovieVectorDB:
             metadata={"hnsw:space": "cosine"}  # Use cosine similarity
         )
         
+        # Optional local replica for in-process search (VECTOR_MIRROR=true)
+        self.mirror = None
+        if os.getenv("VECTOR_MIRROR", "false").lower() == "true":
+            self.mirror = VectorMirror()
+            self.mirror.load()
+            if self.mirror.is_stale(self.collection.count()):
+                # Queries go to Chroma Cloud until the sync finishes
+                self.mirror.sync_in_background(self.collection)
+        
+        # Precomputed "more like this" graph from the last ingest run, if deployed with the app
+        self.neighbor_graph = NeighborGraph.load(NEIGHBOR_GRAPH_DIR)
+        if self.neighbor_graph is not None:
+            logger.info(f"Neighbour graph loaded: {len(self.neighbor_graph)} items")
+        elif NEIGHBOR_GRAPH_URL:
+            # Not baked into this deployment: download it off the request path
+            threading.Thread(target=self._fetch_neighbor_graph, name='neighbor-graph-fetch', daemon=True).start()
+        
+        # Title lookups and BM25 for hybrid search, built off the request path
+        self.title_index = TitleIndex(refresh_interval=float(os.getenv("TITLE_INDEX_REFRESH", "3600")))
+        self.lexical_index = BM25Index()
+        self._local_index_thread = None
+        self._refresh_local_indexes()
+        
         # Initialize sentence transformer model (lazy loading)
         self.encoder = None  # Don't load on startup
+        self._encoder_lock = threading.Lock()
+        self._encoder_thread = None
+        self.encoder_error = None
+        self.encode_batch_size = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+        self._encode_pool = None
+        
+        # Repeated chat queries skip the encoder, identical searches skip the index
+        self.query_embeddings = QueryEmbeddingCache(
+            self.encode_texts,
+            EMBEDDING_MODEL,
+            max_entries=int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "4096")),
+            path=os.getenv("QUERY_EMBEDDING_CACHE_PATH") or None
+        )
+        self.search_results = LRUCache(
+            max_entries=int(os.getenv("SEARCH_RESULT_CACHE_SIZE", "1024")),
+            ttl=float(os.getenv("SEARCH_RESULT_TTL", "600")),
+            sizeof=lambda results: 1
+        )
+        self.stored_items = LRUCache(max_entries=2048, ttl=3600, sizeof=lambda item: 1)
+        self._generation = 0  # Bumped on every write so cached results never outlive the data
+        self._catalog_version = None
+        self._catalog_checked = None
+        self._catalog_lock = threading.Lock()
         logger.info("Vector database initialized successfully (model will load on first use)")
     
     def _ensure_encoder(self):
-        """Lazy load the sentence transformer model only when needed"""
-        if self.encoder is None:
-            logger.info("Loading sentence transformer model...")
-            self.encoder = SentenceTransformer('all-MiniLM-L6-v2')
-            logger.info("Model loaded successfully")
+        """Lazy load the sentence transformer model only when needed (thread-safe, loads once)"""
+        if self.encoder is not None:
+            return
+        with self._encoder_lock:
+            if self.encoder is None:
+                self.encoder = self._load_encoder()
+    
+    def _load_encoder(self) -> SentenceTransformer:
+        started = time.perf_counter()
+        source = EMBEDDING_MODEL_PATH if EMBEDDING_MODEL_PATH and os.path.isdir(EMBEDDING_MODEL_PATH) else EMBEDDING_MODEL
+        logger.info(f"Loading sentence transformer model from {source}...")
+        encoder = SentenceTransformer(source)
+        if EMBEDDING_QUANTIZE == 'int8':
+            import torch
+            encoder = torch.quantization.quantize_dynamic(encoder, {torch.nn.Linear}, dtype=torch.qint8)
+        logger.info(f"Model loaded successfully in {time.perf_counter() - started:.1f}s (quantize: {EMBEDDING_QUANTIZE})")
+        return encoder
+    
+    def preload_encoder(self, background: bool = True) -> None:
+        """
+        Load the encoder ahead of the first search.
+        
+        Args:
+            background: Load on a daemon thread instead of blocking the caller
+        """
+        if self.encoder is not None or (self._encoder_thread is not None and self._encoder_thread.is_alive()):
+            return
+        
+        def load():
+            try:
+                self._ensure_encoder()
+                # One throwaway encode initialises tokenizer and kernels as well
+                self.encoder.encode(["warm up"], show_progress_bar=False)
+            except Exception as e:
+                self.encoder_error = str(e)
+                logger.error(f"Encoder preload failed: {e}")
+        
+        if not background:
+            load()
+            return
+        self._encoder_thread = threading.Thread(target=load, name='encoder-preload', daemon=True)
+        self._encoder_thread.start()
+    
+    @property
+    def encoder_state(self) -> str:
+        """ready, loading, failed or lazy (not requested yet)"""
+        if self.encoder is not None:
+            return 'ready'
+        if self._encoder_thread is not None and self._encoder_thread.is_alive():
+            return 'loading'
+        return 'failed' if self.encoder_error else 'lazy'
+    
+    def start_encode_pool(self, processes: Optional[int] = None) -> None:
+        """
+        Start a multi-process encoding pool for bulk ingest (one CPU worker per process).
+        
+        Args:
+            processes: Worker processes (defaults to EMBED_PROCESSES; <= 1 keeps encoding in-process)
+        """
+        processes = processes if processes is not None else int(os.getenv("EMBED_PROCESSES", "0"))
+        if processes <= 1 or self._encode_pool is not None:
+            return
+        self._ensure_encoder()
+        self._encode_pool = self.encoder.start_multi_process_pool(target_devices=['cpu'] * processes)
+        logger.info(f"Started encoding pool with {processes} processes")
+    
+    def stop_encode_pool(self) -> None:
+        """Stop the multi-process encoding pool, if running"""
+        if self._encode_pool is not None:
+            self.encoder.stop_multi_process_pool(self._encode_pool)
+            self._encode_pool = None
+    
+    def encode_texts(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts in batches into unit-length embeddings.
+        
+        Args:
+            texts: Descriptions or queries
+        
+        Returns:
+            float32 array of shape (len(texts), dim)
+        """
+        self._ensure_encoder()
+        if self._encode_pool is not None and len(texts) > self.encode_batch_size:
+            vectors = self.encoder.encode_multi_process(texts, self._encode_pool, batch_size=self.encode_batch_size)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            return (vectors / np.where(norms == 0, 1, norms)).astype(np.float32)
+        return self.encoder.encode(
+            texts,
+            batch_size=self.encode_batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        ).astype(np.float32)
     
     def add_movie(
         self, 
@@ -83,7 +250,7 @@ class MovieVectorDB:
             description = self._create_description(title, overview, metadata)
             
             # Generate embedding
-            embedding = self.encoder.encode(description).tolist()
+            embedding = self.encode_texts([description])[0].tolist()
             
             # Clean metadata for ChromaDB (only str, int, float, bool allowed)
             clean_metadata = self._clean_metadata(metadata)
@@ -96,26 +263,32 @@ class MovieVectorDB:
                 metadatas=[clean_metadata]
             )
             
+            self.title_index.add([str(movie_id)], [clean_metadata], [description])
+            self.lexical_index.add([str(movie_id)], [clean_metadata])
+            self._generation += 1
+            
             logger.info(f"Added movie: {title} (ID: {movie_id})")
             
         except Exception as e:
             logger.error(f"Error adding movie {title}: {e}")
             raise
     
-    def add_movies_batch(self, movies: List[Dict[str, Any]]) -> None:
+    def add_movies_batch(self, movies: List[Dict[str, Any]]) -> np.ndarray:
         """
         Add multiple movies in batch for better performance.
         
         Args:
             movies: List of movie dictionaries with id, title, overview, metadata
                     Optional: 'description' key to bypass automatic description generation
+                    Optional: 'embedding' key with a precomputed vector (skips encoding)
+        
+        Returns:
+            The stored embeddings, one row per movie
         """
         try:
-            # Ensure encoder is loaded before processing
-            self._ensure_encoder()
+            started = time.perf_counter()
             
             ids = []
-            embeddings = []
             documents = []
             metadatas = []
             
@@ -134,25 +307,37 @@ class MovieVectorDB:
                 else:
                     description = self._create_description(title, overview, metadata)
                 
-                embedding = self.encoder.encode(description).tolist()
-                
                 # Clean metadata for ChromaDB
                 clean_metadata = self._clean_metadata(metadata)
                 
                 ids.append(str(movie_id))
-                embeddings.append(embedding)
                 documents.append(description)
                 metadatas.append(clean_metadata)
             
+            # One batched encode for every movie without a precomputed vector
+            to_encode = [description for movie, description in zip(movies, documents) if movie.get('embedding') is None]
+            encoded = iter(self.encode_texts(to_encode) if to_encode else [])
+            embeddings = np.asarray(
+                [movie['embedding'] if movie.get('embedding') is not None else next(encoded) for movie in movies],
+                dtype=np.float32
+            )
+            encoded_at = time.perf_counter()
+            
             # Batch upsert to ChromaDB (add new, update existing)
             self.collection.upsert(
                 ids=ids,
-                embeddings=embeddings,
+                embeddings=embeddings.tolist(),
                 documents=documents,
                 metadatas=metadatas
             )
             
-            logger.info(f"Upserted {len(movies)} movies in batch")
+            self.title_index.add(ids, metadatas, documents)
+            self.lexical_index.add(ids, metadatas)
+            self._generation += 1
+            
+            encode_rate = len(to_encode) / max(encoded_at - started, 1e-9)
+            logger.info(f"Upserted {len(movies)} movies in batch ({len(to_encode)} encoded at {encode_rate:.0f} items/sec)")
+            return embeddings
             
         except Exception as e:
             logger.error(f"Error adding movies in batch: {e}")
@@ -203,7 +388,8 @@ Overview: {overview}
         self, 
         query: str, 
         top_k: int = 5,
-        filter_metadata: Optional[Dict[str, Any]] = None
+        filter_metadata: Optional[Dict[str, Any]] = None,
+        filters: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """
         Search for similar movies using semantic similarity.
@@ -211,36 +397,110 @@ Overview: {overview}
         Args:
             query: Search query (natural language)
             top_k: Number of results to return
-            filter_metadata: Optional metadata filters
+            filter_metadata: Optional raw Chroma `where` clause
+            filters: Optional structured filters (see api.search_filters), applied
+                     before ranking: a row mask on the mirror, a `where` clause on Chroma
         
         Returns:
             Dictionary with ids, documents, metadatas, and distances
         """
         try:
-            # Ensure encoder is loaded (lazy loading)
-            self._ensure_encoder()
+            use_mirror = self.mirror is not None and self.mirror.ready and not filter_metadata
+            cache_key = (
+                self.catalog_version,
+                use_mirror,
+                normalize_query(query),
+                json.dumps(filter_metadata, sort_keys=True) if filter_metadata else None,
+                json.dumps(filters, sort_keys=True) if filters else None,
+                top_k
+            )
+            cached = self.search_results.get(cache_key)
+            if cached is not None:
+                return copy.deepcopy(cached)
             
-            # Generate query embedding
-            query_embedding = self.encoder.encode(query).tolist()
+            # Generate query embedding (cached; loads the encoder on first use)
+            query_embedding = self.query_embeddings.get(query).tolist()
             
-            # Search in ChromaDB
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=top_k,
-                where=filter_metadata
-            )
+            if use_mirror:
+                # Served from the local mirror, no network round-trip
+                results = self.mirror.search(query_embedding, top_k=top_k, filters=filters)
+            else:
+                # Search in ChromaDB
+                results = self.collection.query(
+                    query_embeddings=[query_embedding],
+                    n_results=top_k,
+                    where=merge_where(filter_metadata, to_where(filters))
+                )
             
             logger.info(f"Search query: '{query}' - Found {len(results['ids'][0])} results")
+            self.search_results.set(cache_key, copy.deepcopy(results))
             return results
             
         except Exception as e:
             logger.error(f"Error searching for query '{query}': {e}")
             return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
     
+    @property
+    def catalog_version(self) -> tuple:
+        """
+        Changes whenever the searchable catalog does: a re-ingest by any process
+        (the version scripts/generate_embeddings.py publishes in the collection
+        metadata, and the item count), a new mirror generation, or a write from
+        this process. The remote part is re-read at most every
+        CATALOG_VERSION_INTERVAL seconds; other callers get the last value
+        while one refreshes it.
+        """
+        refresh = False
+        with self._catalog_lock:
+            now = time.monotonic()
+            if self._catalog_checked is None or now - self._catalog_checked >= CATALOG_VERSION_INTERVAL:
+                self._catalog_checked = now
+                refresh = True
+        if refresh:
+            try:
+                published = (self.client.get_collection(name="movies").metadata or {}).get('catalog_version')
+                self._catalog_version = (published, self.collection.count())
+            except Exception as e:
+                logger.error(f"Could not read the catalog version: {e}")
+        mirror_generation = self.mirror.snapshot.manifest.get('generation') if self.mirror is not None else None
+        return (self._catalog_version, mirror_generation, self._generation)
+    
+    def publish_catalog_version(self) -> Optional[str]:
+        """
+        Record a new catalog version in the collection metadata after an ingest,
+        so every process's search and chat caches drop results from the old data.
+        
+        Returns:
+            The published version, or None if the collection could not be updated
+        """
+        version = f"{time.time_ns()}-{os.getpid()}"
+        try:
+            # The distance function is fixed at creation; Chroma rejects hnsw:* keys in modify()
+            metadata = {k: v for k, v in (self.collection.metadata or {}).items() if not k.startswith('hnsw:')}
+            metadata['catalog_version'] = version
+            self.collection.modify(metadata=metadata)
+        except Exception as e:
+            logger.error(f"Could not publish the catalog version: {e}")
+            return None
+        self._generation += 1
+        logger.info(f"Published catalog version {version}")
+        return version
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Query-embedding and search-result cache counters"""
+        return {
+            'query_embeddings': self.query_embeddings.info(),
+            'search_results': self.search_results.info(),
+        }
+    
     def search_by_exact_title(self, title: str, year: str = None) -> Optional[Dict]:
         """
         Search for exact title match in metadata.
         
+        Matches title, original title, alternative titles and the base title
+        (before any parenthesis) through the in-memory title index, falling
+        back to prefix and fuzzy matches.
+        
         Args:
             title: Exact title to search for (case-insensitive)
             year: Optional year filter
@@ -249,48 +509,78 @@ Overview: {overview}
             Dictionary with id, metadata, document or None
         """
         try:
-            # Get all items
-            results = self.collection.get(
-                include=["documents", "metadatas"]
-            )
+            self._check_local_indexes()
             
-            if not results or not results['ids']:
-                return None
+            if not self.title_index.ready:
+                # Index still building: let Chroma filter on the raw title instead of scanning
+                return self._search_title_in_collection(title, year)
             
-            # Search for exact title match (case-insensitive)
-            title_lower = title.lower().strip()
+            match = self.title_index.lookup(title, year)
+            if match is None:
+                return None
             
-            for i, metadata in enumerate(results['metadatas']):
-                item_title = metadata.get('title', '').lower().strip()
-                item_original_title = metadata.get('original_title', '').lower().strip()
-                
-                # Check title OR original_title match
-                if item_title != title_lower and item_original_title != title_lower:
-                    # Also try matching just the first part (before any special characters)
-                    item_title_base = item_title.split('(')[0].strip() if '(' in item_title else item_title
-                    if item_title_base != title_lower:
-                        continue
-                
-                # Check year if provided
-                if year:
-                    item_year = str(metadata.get('release_year', ''))
-                    if item_year != str(year):
-                        continue
-                
-                # Found exact match!
-                logger.info(f"Exact match found: {metadata.get('title')} ({metadata.get('release_year')})")
-                return {
-                    'id': results['ids'][i],
-                    'metadata': metadata,
-                    'document': results['documents'][i] if results.get('documents') else None
-                }
+            if match['document'] is None:
+                # Index built from metadata only; fetch the one document we need
+                item = self.get_movie_by_id(match['id'])
+                match['document'] = item['document'] if item else None
             
-            return None
+            metadata = match['metadata']
+            logger.info(f"Exact match found: {metadata.get('title')} ({metadata.get('release_year')})")
+            return match
             
         except Exception as e:
             logger.error(f"Error in exact title search: {e}")
             return None
     
+    def _search_title_in_collection(self, title: str, year: str = None) -> Optional[Dict]:
+        """Server-side metadata filter on title / original_title, used until the index is ready"""
+        where = {"$or": [{"title": title}, {"original_title": title}]}
+        if year:
+            where = {"$and": [where, {"release_year": str(year)}]}
+        results = self.collection.get(where=where, limit=1, include=["documents", "metadatas"])
+        if not results or not results['ids']:
+            return None
+        return {
+            'id': results['ids'][0],
+            'metadata': results['metadatas'][0],
+            'document': results['documents'][0] if results.get('documents') else None
+        }
+    
+    def _check_local_indexes(self) -> None:
+        """Schedule a rebuild when the indexes are old or the mirror has a newer generation"""
+        mirror_generation = self.mirror.snapshot.manifest.get('generation') if self.mirror is not None else None
+        if self.title_index.is_stale() or (mirror_generation and self.title_index.source != mirror_generation):
+            self._refresh_local_indexes()
+    
+    def _refresh_local_indexes(self) -> None:
+        """(Re)build the title and lexical indexes on a background thread, from the local mirror when available"""
+        if self._local_index_thread is not None and self._local_index_thread.is_alive():
+            return
+        
+        def build():
+            try:
+                if self.mirror is not None and self.mirror.ready:
+                    snapshot = self.mirror.snapshot
+                    rows = list(zip(snapshot.ids, snapshot.metadatas, snapshot.documents))
+                    source = snapshot.manifest.get('generation')
+                else:
+                    rows, source = list(self._iter_collection_metadata()), None
+                self.title_index.build(rows, source=source)
+                self.lexical_index.build(rows, source=source)
+            except Exception as e:
+                logger.error(f"Error building local indexes: {e}")
+        
+        self._local_index_thread = threading.Thread(target=build, name='local-indexes', daemon=True)
+        self._local_index_thread.start()
+    
+    def _iter_collection_metadata(self, page_size: int = 1000):
+        """Yield (id, metadata, None) for every item, paging through the collection without documents"""
+        total = self.collection.count()
+        for offset in range(0, total, page_size):
+            page = self.collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            for item_id, metadata in zip(page['ids'], page['metadatas']):
+                yield item_id, metadata, None
+    
     def get_movie_by_id(self, movie_id: int) -> Optional[Dict[str, Any]]:
         """
         Get a specific movie by its TMDb ID.
@@ -328,6 +618,9 @@ Overview: {overview}
         """
         try:
             self.collection.delete(ids=[str(movie_id)])
+            self.title_index.remove(str(movie_id))
+            self.lexical_index.remove(str(movie_id))
+            self._generation += 1
             logger.info(f"Deleted movie ID: {movie_id}")
         except Exception as e:
             logger.error(f"Error deleting movie {movie_id}: {e}")
@@ -356,6 +649,9 @@ Overview: {overview}
                 name="movies",
                 metadata={"hnsw:space": "cosine"}
             )
+            self.title_index.build([])
+            self.lexical_index.build([])
+            self._generation += 1
             logger.info("Database cleared successfully")
         except Exception as e:
             logger.error(f"Error clearing database: {e}")
@@ -425,6 +721,254 @@ Overview: {overview}
         
         return description
     
+    def _stored_items(self, movie_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Stored embedding, document and metadata per id, from the mirror or one collection.get() for the rest"""
+        items, missing = {}, []
+        version = self.catalog_version
+        mirror = self.mirror if self.mirror is not None and self.mirror.ready else None
+        for movie_id in map(str, movie_ids):
+            vector = mirror.vector_for(movie_id) if mirror is not None else None
+            if vector is not None:
+                row = mirror.results_for([movie_id], [0.0])
+                items[movie_id] = {'embedding': vector, 'document': row['documents'][0][0], 'metadata': row['metadatas'][0][0]}
+                continue
+            item = self.stored_items.get(('item', version, movie_id))
+            if item is not None:
+                items[movie_id] = item
+            else:
+                missing.append(movie_id)
+        
+        if missing:
+            result = self.collection.get(ids=missing, include=["embeddings", "documents", "metadatas"])
+            for i, movie_id in enumerate(result['ids']):
+                item = {
+                    'embedding': np.asarray(result['embeddings'][i], dtype=np.float32),
+                    'document': result['documents'][i],
+                    'metadata': result['metadatas'][i]
+                }
+                self.stored_items.set(('item', version, movie_id), item)
+                items[movie_id] = item
+        return items
+    
+    def _stored_item(self, movie_id) -> Optional[Dict[str, Any]]:
+        """Stored embedding, document and metadata of one item"""
+        return self._stored_items([movie_id]).get(str(movie_id))
+    
+    def hybrid_search(
+        self,
+        query: str,
+        top_k: int = 5,
+        filter_metadata: Optional[Dict[str, Any]] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Fuse BM25 over titles/keywords/cast/crew with vector search (reciprocal rank fusion).
+        
+        Names in the query ("films with Zendaya", "Villeneuve sci-fi") are
+        matched lexically, themes semantically. Until the lexical index is
+        built, or when a raw `where` clause is given, this is a plain vector search.
+        
+        Args:
+            query: Search query (natural language)
+            top_k: Number of results to return
+            filter_metadata: Optional raw Chroma `where` clause
+            filters: Optional structured filters, applied to both rankings before fusion
+        
+        Returns:
+            Dictionary with ids, documents, metadatas, and distances (cosine, for every result)
+        """
+        self._check_local_indexes()
+        if filter_metadata or not self.lexical_index.ready:
+            return self.search(query, top_k=top_k, filter_metadata=filter_metadata, filters=filters)
+        
+        candidates = max(top_k * 4, 20)
+        vector_results = self.search(query, top_k=candidates, filters=filters)
+        predicate = (lambda metadata: matches(metadata, filters)) if filters else None
+        lexical_ids = [item_id for item_id, _ in self.lexical_index.search(query, top_k=candidates, predicate=predicate)]
+        fused = [item_id for item_id, _ in reciprocal_rank_fusion([vector_results['ids'][0], lexical_ids])][:top_k]
+        
+        known = {item_id: i for i, item_id in enumerate(vector_results['ids'][0])}
+        lexical_only = self._stored_items([item_id for item_id in fused if item_id not in known])
+        query_embedding = self.query_embeddings.get(query) if lexical_only else None
+        
+        results = {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+        for item_id in fused:
+            if item_id in known:
+                i = known[item_id]
+                document, metadata = vector_results['documents'][0][i], vector_results['metadatas'][0][i]
+                distance = vector_results['distances'][0][i]
+            elif item_id in lexical_only:
+                item = lexical_only[item_id]
+                document, metadata = item['document'], item['metadata']
+                norms = (np.linalg.norm(item['embedding']) * np.linalg.norm(query_embedding)) or 1.0
+                distance = float(1.0 - np.dot(item['embedding'], query_embedding) / norms)
+            else:
+                continue
+            results["ids"][0].append(item_id)
+            results["documents"][0].append(document)
+            results["metadatas"][0].append(metadata)
+            results["distances"][0].append(distance)
+        return results
+    
+    def resolve_title(self, title: str, year: str = None) -> Optional[Dict]:
+        """
+        Find the catalog item for a title: exact/fuzzy title index first, then
+        a BM25 match whose title contains every word of `title`.
+        
+        Args:
+            title: Title to look for
+            year: Optional year filter
+        
+        Returns:
+            Dictionary with id, metadata, document or None
+        """
+        match = self.search_by_exact_title(title, year)
+        if match is not None or not self.lexical_index.ready:
+            return match
+        item_id = self.lexical_index.resolve_title(title, year)
+        if item_id is None:
+            return None
+        item = self._stored_item(item_id)
+        if item is None:
+            return None
+        logger.info(f"Lexical title match: {item['metadata'].get('title')} ({item['metadata'].get('release_year')})")
+        return {'id': item_id, 'metadata': item['metadata'], 'document': item['document']}
+    
+    def _fetch_neighbor_graph(self) -> None:
+        graph = fetch_neighbor_graph(NEIGHBOR_GRAPH_URL, NEIGHBOR_GRAPH_DIR)
+        if graph is not None:
+            self.neighbor_graph = graph
+            logger.info(f"Neighbour graph fetched: {len(graph)} items")
+    
+    def _neighbor_graph_for(self, movie_id: str, k: int) -> Optional[NeighborGraph]:
+        """Ingest-time graph first, then the mirror's, if either lists the item with at least k neighbours"""
+        mirror_graph = self.mirror.snapshot.neighbor_graph if self.mirror is not None else None
+        for graph in (self.neighbor_graph, mirror_graph):
+            if graph is not None and movie_id in graph and k <= graph.k:
+                return graph
+        return None
+    
+    def results_for_ids(self, ids: List[str], distances: List[float]) -> Dict[str, Any]:
+        """Chroma-shaped results for known ids, from the mirror or one collection.get()"""
+        if self.mirror is not None and self.mirror.ready:
+            return self.mirror.results_for(ids, distances)
+        fetched = self.collection.get(ids=ids, include=["documents", "metadatas"])
+        rows = {item_id: i for i, item_id in enumerate(fetched['ids'])}
+        order = [(item_id, distance) for item_id, distance in zip(ids, distances) if item_id in rows]
+        return {
+            "ids": [[item_id for item_id, _ in order]],
+            "documents": [[fetched['documents'][rows[item_id]] for item_id, _ in order]],
+            "metadatas": [[fetched['metadatas'][rows[item_id]] for item_id, _ in order]],
+            "distances": [[distance for _, distance in order]],
+        }
+    
+    def get_neighbors(self, movie_id, k: int = 10, with_items: bool = False) -> List[Dict[str, Any]]:
+        """
+        Most similar catalog items, in constant time from the precomputed graph.
+        
+        Items missing from the graph (added since the last ingest) fall back to
+        a live search with their stored embedding.
+        
+        Args:
+            movie_id: TMDb ID
+            k: Number of neighbours
+            with_items: Also return each neighbour's document and metadata (one
+                        batched fetch for graph hits, none with the mirror)
+        
+        Returns:
+            List of {'id', 'score'} (cosine similarity), best first, plus
+            'document' and 'metadata' with with_items
+        """
+        movie_id = str(movie_id)
+        graph = self._neighbor_graph_for(movie_id, k)
+        if graph is not None:
+            neighbors = graph.neighbors(movie_id, k)
+            if not with_items:
+                return [{'id': item_id, 'score': score} for item_id, score in neighbors]
+            results = self.results_for_ids([n for n, _ in neighbors], [1.0 - score for _, score in neighbors])
+        else:
+            results = self.similar_by_id(movie_id, top_k=k)
+        return [
+            dict({'id': item_id, 'score': 1.0 - results['distances'][0][i]},
+                 **({'document': results['documents'][0][i], 'metadata': results['metadatas'][0][i]} if with_items else {}))
+            for i, item_id in enumerate(results['ids'][0])
+        ]
+    
+    def similar_by_id(
+        self,
+        movie_id,
+        top_k: int = 5,
+        include_self: bool = False,
+        filter_metadata: Optional[Dict[str, Any]] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Nearest neighbours of a catalog item, using its stored embedding instead of re-encoding its document.
+        
+        Lookups are served from a precomputed neighbour graph (ingest or mirror)
+        when available and, with structured filters, enough of its neighbours
+        pass them: one batched fetch of the source and its neighbours (none with
+        the mirror). Otherwise the stored vector is queried directly.
+        
+        Args:
+            movie_id: TMDb ID of the source item
+            top_k: Number of results (including the source when include_self is set)
+            include_self: Put the source item first (distance 0)
+            filter_metadata: Optional raw Chroma `where` clause for the neighbours
+            filters: Optional structured filters for the neighbours (the source is never filtered out)
+        
+        Returns:
+            Dictionary with ids, documents, metadatas, and distances (empty lists if the item is unknown)
+        """
+        movie_id = str(movie_id)
+        empty = {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+        wanted = top_k - 1 if include_self else top_k
+        try:
+            graph = self._neighbor_graph_for(movie_id, wanted) if not filter_metadata else None
+            if graph is not None:
+                neighbors = graph.neighbors(movie_id, graph.k if filters else wanted)
+                ids = [n for n, _ in neighbors]
+                distances = [1.0 - score for _, score in neighbors]
+                if include_self:
+                    ids, distances = [movie_id] + ids, [0.0] + distances
+                results = self.results_for_ids(ids, distances)
+                start = 1 if include_self else 0
+                # A source missing from the collection is reported by the stored-item path below
+                if not include_self or results['ids'][0][:1] == [movie_id]:
+                    rows = [i for i in range(start, len(results['ids'][0]))
+                            if not filters or matches(results['metadatas'][0][i], filters)][:wanted]
+                    # Too few graph neighbours pass the filters: search the filtered catalog instead
+                    if not filters or len(rows) == wanted:
+                        rows = list(range(start)) + rows
+                        return {field: [[results[field][0][i] for i in rows]] for field in results}
+            
+            item = self._stored_item(movie_id)
+            if item is None:
+                logger.warning(f"Movie {movie_id} not found in database")
+                return empty
+            
+            if self.mirror is not None and self.mirror.ready and not filter_metadata:
+                results = self.mirror.search(item['embedding'], top_k=wanted + 1, filters=filters)
+            else:
+                results = self.collection.query(
+                    query_embeddings=[item['embedding'].tolist()],
+                    n_results=wanted + 1,
+                    where=merge_where(filter_metadata, to_where(filters))
+                )
+            keep = [i for i, result_id in enumerate(results['ids'][0]) if result_id != movie_id][:wanted]
+            results = {field: [[results[field][0][i] for i in keep]] for field in ("ids", "documents", "metadatas", "distances")}
+            
+            if include_self:
+                results["ids"][0].insert(0, movie_id)
+                results["documents"][0].insert(0, item['document'])
+                results["metadatas"][0].insert(0, item['metadata'])
+                results["distances"][0].insert(0, 0.0)
+            return results
+            
+        except Exception as e:
+            logger.error(f"Error finding neighbours of {movie_id}: {e}")
+            return empty
+    
     def get_similar_movies(
         self, 
         movie_id: int, 
@@ -440,31 +984,15 @@ Overview: {overview}
         Returns:
             List of similar movies with metadata
         """
-        try:
-            # Get the movie
-            movie = self.get_movie_by_id(movie_id)
-            if not movie:
-                logger.warning(f"Movie {movie_id} not found in database")
-                return []
-            
-            # Search using the movie's document
-            results = self.search(movie['document'], top_k=top_k + 1)
-            
-            # Filter out the original movie and format results
-            similar_movies = []
-            for i, movie_id_result in enumerate(results['ids'][0]):
-                if movie_id_result != str(movie_id):
-                    similar_movies.append({
-                        'id': movie_id_result,
-                        'metadata': results['metadatas'][0][i],
-                        'distance': results['distances'][0][i]
-                    })
-            
-            return similar_movies[:top_k]
-            
-        except Exception as e:
-            logger.error(f"Error finding similar movies for {movie_id}: {e}")
-            return []
+        results = self.similar_by_id(movie_id, top_k=top_k)
+        return [
+            {
+                'id': movie_id_result,
+                'metadata': results['metadatas'][0][i],
+                'distance': results['distances'][0][i]
+            }
+            for i, movie_id_result in enumerate(results['ids'][0])
+        ]
 
 
 # Singleton instance
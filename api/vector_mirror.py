@@ -0,0 +1,397 @@
+"""
+Local Vector Index Mirror
+Keeps a memory-mapped copy of the Chroma "movies" collection on local disk so
+semantic searches run in-process; Chroma Cloud stays the source of truth and
+is only read during sync
+"""
+
+import json
+import os
+import threading
+import time
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from api.neighbors import NeighborGraph, DEFAULT_NEIGHBORS
+from api.search_filters import FilterColumns
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+try:
+    import hnswlib
+except ImportError:  # Optional: exact NumPy search is used without it
+    hnswlib = None
+
+MANIFEST_FILE = "manifest.json"
+
+# Rows fetched per collection.get() call during sync
+SYNC_PAGE_SIZE = 500
+
+
+def _empty_results() -> Dict[str, Any]:
+    return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+
+
+class MirrorSnapshot:
+    """
+    One loaded generation: records, embeddings, optional HNSW index, neighbour
+    graph and filter columns. Never modified after construction; the mirror
+    replaces the whole snapshot in one assignment, and readers take one
+    reference and use only that, so they never mix two generations.
+    """
+
+    __slots__ = ('manifest', 'ids', 'metadatas', 'documents', 'embeddings', 'hnsw_index',
+                 'neighbor_graph', 'filter_columns', 'rows')
+
+    def __init__(
+        self,
+        manifest: Dict[str, Any],
+        records: Dict[str, List[Any]],
+        embeddings: np.ndarray,
+        hnsw_index=None,
+        neighbor_graph: Optional[NeighborGraph] = None
+    ):
+        self.manifest = manifest
+        self.ids: List[str] = records['ids']
+        self.metadatas: List[Dict[str, Any]] = records['metadatas']
+        self.documents: List[str] = records['documents']
+        self.embeddings = embeddings
+        self.hnsw_index = hnsw_index
+        self.neighbor_graph = neighbor_graph
+        self.filter_columns = FilterColumns(self.metadatas)
+        self.rows: Dict[str, int] = {item_id: row for row, item_id in enumerate(self.ids)}
+
+    @classmethod
+    def empty(cls) -> 'MirrorSnapshot':
+        return cls({}, {'ids': [], 'metadatas': [], 'documents': []}, None)
+
+
+class VectorMirror:
+    """
+    Read-only local replica of a Chroma collection.
+
+    Each sync writes a new generation of files (row-normalised embedding matrix
+    as .npy, ids/metadatas/documents as JSON, optional HNSW index) next to the
+    previous one and then swaps manifest.json, so readers in this or other
+    worker processes always load a complete generation.
+
+    Configuration (environment variables):
+    - VECTOR_MIRROR_DIR: where generations are stored (default /tmp/frameiq_vectors)
+    - VECTOR_MIRROR_DTYPE: float32 (default) or float16
+    - VECTOR_MIRROR_HNSW: build an HNSW index when hnswlib is installed (default false)
+    - VECTOR_MIRROR_MAX_AGE: seconds before a mirror is re-synced (default 86400)
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        dtype: Optional[str] = None,
+        use_hnsw: Optional[bool] = None,
+        max_age: Optional[float] = None
+    ):
+        self.directory = directory or os.getenv("VECTOR_MIRROR_DIR", os.path.join("/tmp", "frameiq_vectors"))
+        self.dtype = np.dtype(dtype or os.getenv("VECTOR_MIRROR_DTYPE", "float32"))
+        if use_hnsw is None:
+            use_hnsw = os.getenv("VECTOR_MIRROR_HNSW", "false").lower() == "true"
+        self.use_hnsw = use_hnsw and hnswlib is not None
+        self.max_age = max_age if max_age is not None else float(os.getenv("VECTOR_MIRROR_MAX_AGE", "86400"))
+
+        self.snapshot = MirrorSnapshot.empty()
+        self._sync_lock = threading.Lock()
+        self._sync_thread = None
+        self.searches = 0
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    @property
+    def ready(self) -> bool:
+        snapshot = self.snapshot
+        return snapshot.embeddings is not None and len(snapshot.ids) > 0
+
+    # Current generation's fields; read `snapshot` once instead when using several together
+    @property
+    def manifest(self) -> Dict[str, Any]:
+        return self.snapshot.manifest
+
+    @property
+    def ids(self) -> List[str]:
+        return self.snapshot.ids
+
+    @property
+    def neighbor_graph(self) -> Optional[NeighborGraph]:
+        return self.snapshot.neighbor_graph
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def load(self) -> bool:
+        """
+        Map the generation named in manifest.json, if any.
+
+        Returns:
+            True if a mirror is now loaded
+        """
+        try:
+            with open(self._path(MANIFEST_FILE)) as f:
+                manifest = json.load(f)
+            generation = manifest['generation']
+            embeddings = np.load(self._path(f"embeddings.{generation}.npy"), mmap_mode='r')
+            with open(self._path(f"records.{generation}.json")) as f:
+                records = json.load(f)
+
+            hnsw_index = None
+            hnsw_path = self._path(f"hnsw.{generation}.bin")
+            if self.use_hnsw and os.path.exists(hnsw_path):
+                hnsw_index = hnswlib.Index(space='cosine', dim=embeddings.shape[1])
+                hnsw_index.load_index(hnsw_path, max_elements=embeddings.shape[0])
+                hnsw_index.set_ef(64)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Could not load vector mirror from {self.directory}: {e}")
+            return False
+
+        neighbor_graph = NeighborGraph.load(self.directory, suffix=f".{generation}")
+        snapshot = MirrorSnapshot(manifest, records, embeddings, hnsw_index, neighbor_graph)
+
+        # Single assignment: concurrent readers hold either the old or the new snapshot
+        self.snapshot = snapshot
+        logger.info(f"Vector mirror loaded: {len(snapshot.ids)} items, generation {generation}")
+        return True
+
+    def is_stale(self, remote_count: Optional[int] = None) -> bool:
+        """A mirror is stale when missing, older than max_age, or its size differs from the collection."""
+        snapshot = self.snapshot
+        if snapshot.embeddings is None or not snapshot.ids:
+            return True
+        if time.time() - snapshot.manifest.get('synced_at', 0) > self.max_age:
+            return True
+        return remote_count is not None and remote_count != len(snapshot.ids)
+
+    # ------------------------------------------------------------------
+    # Sync
+    # ------------------------------------------------------------------
+
+    def sync(self, collection, page_size: int = SYNC_PAGE_SIZE) -> int:
+        """
+        Download the whole collection page by page and publish a new generation.
+
+        Args:
+            collection: Chroma collection (source of truth)
+            page_size: Rows per collection.get() call
+
+        Returns:
+            Number of items mirrored
+        """
+        with self._sync_lock:
+            started = time.time()
+            total = collection.count()
+            ids, metadatas, documents, vectors = [], [], [], []
+            for offset in range(0, total, page_size):
+                page = collection.get(
+                    include=["embeddings", "documents", "metadatas"],
+                    limit=page_size,
+                    offset=offset
+                )
+                ids.extend(page['ids'])
+                metadatas.extend(page['metadatas'])
+                documents.extend(page['documents'])
+                vectors.extend(page['embeddings'])
+
+            if not ids:
+                logger.warning("Vector mirror sync found an empty collection; keeping the current mirror")
+                return 0
+
+            matrix = np.asarray(vectors, dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix /= np.where(norms == 0, 1, norms)
+
+            os.makedirs(self.directory, exist_ok=True)
+            generation = f"{time.time_ns()}-{os.getpid()}"
+            np.save(self._path(f"embeddings.{generation}.npy"), matrix.astype(self.dtype))
+            with open(self._path(f"records.{generation}.json"), 'w') as f:
+                json.dump({'ids': ids, 'metadatas': metadatas, 'documents': documents}, f)
+
+            if self.use_hnsw:
+                index = hnswlib.Index(space='cosine', dim=matrix.shape[1])
+                index.init_index(max_elements=len(ids), ef_construction=200, M=16)
+                index.add_items(matrix, np.arange(len(ids)))
+                index.save_index(self._path(f"hnsw.{generation}.bin"))
+
+            # Precomputed "more like this" lists, refreshed with every sync
+            NeighborGraph.build(ids, matrix, k=DEFAULT_NEIGHBORS).save(self.directory, suffix=f".{generation}")
+
+            manifest = {
+                'generation': generation,
+                'count': len(ids),
+                'dim': int(matrix.shape[1]),
+                'dtype': self.dtype.name,
+                'synced_at': time.time(),
+                'hnsw': self.use_hnsw,
+            }
+            tmp_manifest = self._path(f"{MANIFEST_FILE}.{generation}.tmp")
+            with open(tmp_manifest, 'w') as f:
+                json.dump(manifest, f)
+            previous = self._published_generation()
+            os.replace(tmp_manifest, self._path(MANIFEST_FILE))
+
+            self.load()
+            if previous and previous != generation:
+                self._remove_generation(previous)
+            logger.info(f"Vector mirror synced {len(ids)} items in {time.time() - started:.1f}s")
+            return len(ids)
+
+    def sync_in_background(self, collection) -> None:
+        """Run sync() on a daemon thread unless one is already running."""
+        if self._sync_thread is not None and self._sync_thread.is_alive():
+            return
+
+        def run():
+            try:
+                self.sync(collection)
+            except Exception as e:
+                logger.error(f"Vector mirror sync failed: {e}")
+
+        self._sync_thread = threading.Thread(target=run, name='vector-mirror-sync', daemon=True)
+        self._sync_thread.start()
+
+    def _published_generation(self) -> Optional[str]:
+        try:
+            with open(self._path(MANIFEST_FILE)) as f:
+                return json.load(f).get('generation')
+        except (OSError, ValueError):
+            return None
+
+    def _remove_generation(self, generation: str) -> None:
+        # Workers that still map the old files keep working: unlinking leaves open mappings valid
+        for name in (f"embeddings.{generation}.npy", f"records.{generation}.json", f"hnsw.{generation}.bin",
+                     f"neighbors.{generation}.npy", f"scores.{generation}.npy", f"ids.{generation}.json"):
+            try:
+                os.remove(self._path(name))
+            except FileNotFoundError:
+                pass
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+
+    def vector_for(self, item_id) -> Optional[np.ndarray]:
+        """Stored (normalised) embedding of an item, or None if it is not mirrored."""
+        snapshot = self.snapshot
+        row = snapshot.rows.get(str(item_id))
+        if row is None or snapshot.embeddings is None:
+            return None
+        return np.asarray(snapshot.embeddings[row], dtype=np.float32)
+
+    def results_for(self, item_ids: List[str], distances: List[float]) -> Dict[str, Any]:
+        """Chroma-shaped results for known ids (unknown ids are skipped)."""
+        snapshot = self.snapshot
+        rows = [(snapshot.rows[i], d) for i, d in zip(item_ids, distances) if i in snapshot.rows]
+        return {
+            "ids": [[snapshot.ids[r] for r, _ in rows]],
+            "documents": [[snapshot.documents[r] for r, _ in rows]],
+            "metadatas": [[snapshot.metadatas[r] for r, _ in rows]],
+            "distances": [[d for _, d in rows]],
+        }
+
+    def search(self, query_embedding, top_k: int = 5, filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Cosine top-k over the mirrored embeddings.
+
+        Args:
+            query_embedding: Query vector (any norm)
+            top_k: Number of results
+            filters: Optional structured filters (see api.search_filters); only
+                     matching rows are scored, masked on the same snapshot
+
+        Returns:
+            Chroma-shaped result dictionary (ids, documents, metadatas, distances
+            as single-query nested lists; distance = 1 - cosine similarity)
+        """
+        # One snapshot for the whole search, however many reloads happen meanwhile
+        snapshot = self.snapshot
+        embeddings, ids = snapshot.embeddings, snapshot.ids
+        metadatas, documents = snapshot.metadatas, snapshot.documents
+        if embeddings is None or not ids:
+            return _empty_results()
+        mask = snapshot.filter_columns.mask(filters) if filters else None
+
+        query = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        self.searches += 1
+
+        if mask is not None:
+            # Pre-filter: score only the rows that pass, exactly (the HNSW graph cannot skip rows)
+            rows = np.flatnonzero(mask)
+            if not len(rows):
+                return _empty_results()
+            scores = self._scores(embeddings, query, rows=rows)
+            top_k = min(top_k, len(rows))
+            candidates = np.argpartition(-scores, top_k - 1)[:top_k] if top_k < len(rows) else np.arange(len(rows))
+            candidates = candidates[np.argsort(-scores[candidates])]
+            order = rows[candidates].tolist()
+            distances = [float(1.0 - scores[i]) for i in candidates]
+            return {
+                "ids": [[ids[i] for i in order]],
+                "documents": [[documents[i] for i in order]],
+                "metadatas": [[metadatas[i] for i in order]],
+                "distances": [distances],
+            }
+
+        top_k = min(top_k, len(ids))
+        hnsw_index = snapshot.hnsw_index
+        if hnsw_index is not None:
+            labels, distances = hnsw_index.knn_query(query, k=top_k)
+            order = labels[0].tolist()
+            distances = distances[0].tolist()
+        else:
+            scores = self._scores(embeddings, query)
+            if top_k < len(scores):
+                candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+            else:
+                candidates = np.arange(len(scores))
+            candidates = candidates[np.argsort(-scores[candidates])]
+            order = candidates.tolist()
+            distances = [float(1.0 - scores[i]) for i in order]
+
+        return {
+            "ids": [[ids[i] for i in order]],
+            "documents": [[documents[i] for i in order]],
+            "metadatas": [[metadatas[i] for i in order]],
+            "distances": [distances],
+        }
+
+    @staticmethod
+    def _scores(embeddings: np.ndarray, query: np.ndarray, block: int = 4096,
+                rows: Optional[np.ndarray] = None) -> np.ndarray:
+        count = embeddings.shape[0] if rows is None else len(rows)
+        if embeddings.dtype == np.float32 and rows is None:
+            return embeddings @ query
+        # NumPy has no BLAS path for float16 (and fancy indexing copies); gather and upcast in blocks
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, block):
+            chunk = embeddings[start:start + block] if rows is None else embeddings[rows[start:start + block]]
+            scores[start:start + block] = chunk.astype(np.float32, copy=False) @ query
+        return scores
+
+    def get_stats(self) -> Dict[str, Any]:
+        snapshot = self.snapshot
+        return {
+            'ready': snapshot.embeddings is not None and len(snapshot.ids) > 0,
+            'items': len(snapshot.ids),
+            'dtype': self.dtype.name,
+            'hnsw': snapshot.hnsw_index is not None,
+            'neighbors': snapshot.neighbor_graph.k if snapshot.neighbor_graph is not None else 0,
+            'generation': snapshot.manifest.get('generation'),
+            'synced_at': snapshot.manifest.get('synced_at'),
+            'searches': self.searches,
+            'syncing': self._sync_thread is not None and self._sync_thread.is_alive(),
+        }
@@ -82,7 +82,43 @@ db.init_app(app)
 @app.route('/health')
 def health_check():
     """Simple health check endpoint that responds immediately"""
-    return {'status': 'ok'}, 200
+    from api.rag_helper import vector_db
+    return {'status': 'ok', 'encoder': vector_db.encoder_state if vector_db else 'disabled'}, 200
+
+@app.route('/health/ready')
+def readiness_check():
+    """503 while a preloading encoder is still loading, so traffic waits for a warm worker"""
+    from api.rag_helper import vector_db
+    state = vector_db.encoder_state if vector_db else 'disabled'
+    return {'ready': state != 'loading', 'encoder': state}, (503 if state == 'loading' else 200)
+
+@app.route('/health/metrics')
+def health_metrics():
+    """Cache, TMDb transport, vector search and chat counters for latency tuning"""
+    from api.tmdb_client import get_cache_stats
+    from api.query_classifier import get_query_classifier
+    from api.title_resolver import get_title_resolver
+    from api.chat_store import get_session_store
+    from api.chat_history import get_history_manager
+    from api.response_cache import get_response_cache
+    from api.llm_gateway import get_llm_gateway
+    from api.tmdb_transport import get_tmdb_transport
+    from api.prewarm import get_prewarmer
+    from api.rag_helper import vector_db
+    prewarmer = get_prewarmer()
+    return {
+        'tmdb_transport': get_tmdb_transport().get_stats(),
+        'tmdb_cache': get_cache_stats(),
+        'prewarmer': prewarmer.get_stats() if prewarmer else None,
+        'vector_mirror': vector_db.mirror.get_stats() if vector_db and vector_db.mirror else None,
+        'vector_search': vector_db.get_cache_stats() if vector_db else None,
+        'query_classifier': get_query_classifier().get_stats(),
+        'chat_cards': get_title_resolver().get_stats(),
+        'chat_sessions': get_session_store().info(),
+        'chat_history': get_history_manager().get_stats(),
+        'chat_response_cache': get_response_cache().get_stats(),
+        'llm': get_llm_gateway().get_stats()
+    }, 200
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -99,4 +135,11 @@ with app.app_context():
         print(f"Error creating database tables: {e}")
 
 if __name__ == '__main__':
+    # Under gunicorn these run from gunicorn.conf.py's post_worker_init hook instead
+    from api.rag_helper import preload_encoder
+    preload_encoder()
+    # With the debug reloader only the serving child pre-warms, not the watching parent
+    if os.getenv("TMDB_PREWARM", "true").lower() == "true" and os.getenv("WERKZEUG_RUN_MAIN") == "true":
+        from api.prewarm import start_prewarmer
+        start_prewarmer()
     app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,19 @@
+"""
+Gunicorn configuration
+Command-line flags (Procfile / Dockerfile) still set workers, threads and bind
+"""
+
+import os
+
+
+def post_worker_init(worker):
+    """Per-worker startup once the app is imported: encoder preload and the feed pre-warmer"""
+    from api.rag_helper import preload_encoder
+    mode = preload_encoder()
+    worker.log.info(f"Encoder preload mode: {mode}")
+
+    # Feed pre-warming: one worker per host takes the lock, the others stand by
+    if os.getenv("TMDB_PREWARM", "true").lower() == "true":
+        from api.prewarm import start_prewarmer
+        prewarmer = start_prewarmer()
+        worker.log.info(f"Feed pre-warmer: {'running' if prewarmer else 'standby'}")
@@ -73,4 +73,13 @@ class MediaItem(db.Model):
     rating = db.Column(db.Float)
     
     def __repr__(self):
-        return f'<MediaItem {self.title}>'
\ No newline at end of file
+        return f'<MediaItem {self.title}>'
+
+class ChatSession(db.Model):
+    """Chat history of one user, in api/chat_store.py's compact encoding"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    history = db.Column(db.LargeBinary, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f'<ChatSession user={self.user_id}>'
@@ -142,93 +142,9 @@ def profile():
 @auth.route('/profile/recommendations')
 @login_required
 def profile_recommendations():
-    from api.tmdb_client import fetch_poster, fetch_tmdb_recommendations
-    from routes.main import TMDB_API_KEY
-    import requests
-    import random
-    
-    # Get user's lists
-    user_watchlist = current_user.watchlist
-    user_wishlist = current_user.wishlist
-    user_viewed = current_user.viewed_media
-    
-    # Combine all user items
-    user_items = list(user_watchlist) + list(user_wishlist) + list(user_viewed)
-    
-    # Remove duplicates while preserving order
-    seen = set()
-    unique_user_items = []
-    for item in user_items:
-        if item.tmdb_id not in seen:
-            seen.add(item.tmdb_id)
-            unique_user_items.append(item)
-    
-    # Get recommendations based on user's items
-    recommendations = []
-    processed_ids = set()
-    
-    # Shuffle the items to get a more diverse selection
-    random.shuffle(unique_user_items)
-    
-    # Consider more items to get diverse recommendations (up to 15 items)
-    items_to_consider = min(15, len(unique_user_items))
-    
-    # Get recommendations from TMDB for each item
-    for item in unique_user_items[:items_to_consider]:
-        if len(recommendations) >= 18:  # Limit total recommendations
-            break
-            
-        try:
-            # Get recommendations from TMDB
-            tmdb_recs = fetch_tmdb_recommendations(item.tmdb_id, item.media_type == 'movie')
-            
-            # Limit the number of recommendations we take from each item to avoid over-representation
-            max_recs_per_item = 3
-            recs_added_for_this_item = 0
-            
-            for rec in tmdb_recs:
-                # Skip if we already have this recommendation
-                if rec['id'] in processed_ids:
-                    continue
-                    
-                # Skip if user already has this item in any list
-                user_has_item = any(user_item.tmdb_id == rec['id'] for user_item in unique_user_items)
-                if user_has_item:
-                    continue
-                
-                # Add recommendation
-                poster = fetch_poster(rec['id'], item.media_type == 'movie')
-                recommendations.append({
-                    'id': rec['id'],
-                    'title': rec['title'] if item.media_type == 'movie' else rec['name'],
-                    'poster': poster,
-                    'media_type': item.media_type,
-                    'release_date': rec.get('release_date') if item.media_type == 'movie' else rec.get('first_air_date', 'N/A'),
-                    'based_on': item.title  # What this recommendation is based on
-                })
-                
-                processed_ids.add(rec['id'])
-                recs_added_for_this_item += 1
-                
-                # Limit recommendations per source item
-                if recs_added_for_this_item >= max_recs_per_item:
-                    break
-                
-                # Limit total recommendations
-                if len(recommendations) >= 18:
-                    break
-                    
-        except Exception as e:
-            print(f"Error fetching recommendations for {item.title}: {e}")
-            continue
-    
-    # Remove duplicates from recommendations (in case any slipped through)
-    final_recommendations = []
-    seen_rec_ids = set()
-    for rec in recommendations:
-        if rec['id'] not in seen_rec_ids:
-            seen_rec_ids.add(rec['id'])
-            final_recommendations.append(rec)
+    from api.recommendations import get_profile_recommendations
+
+    recommendations = get_profile_recommendations(current_user)
     
     # Get user's lists for status indicators
     user_watchlist_ids = {(item.tmdb_id, item.media_type) for item in current_user.watchlist}
@@ -236,7 +152,7 @@ def profile_recommendations():
     user_viewed_ids = {(item.tmdb_id, item.media_type) for item in current_user.viewed_media}
     
     return render_template('profile_recommendations.html', 
-                          recommendations=final_recommendations,
+                          recommendations=recommendations,
                           user_watchlist_ids=user_watchlist_ids,
                           user_wishlist_ids=user_wishlist_ids,
                           user_viewed_ids=user_viewed_ids)
@@ -244,94 +160,10 @@ def profile_recommendations():
 @auth.route('/profile/recommendations-preview')
 @login_required
 def profile_recommendations_preview():
-    from api.tmdb_client import fetch_poster, fetch_tmdb_recommendations
-    import requests
-    import random
-    
-    # Get user's lists
-    user_watchlist = current_user.watchlist
-    user_wishlist = current_user.wishlist
-    user_viewed = current_user.viewed_media
-    
-    # Combine all user items
-    user_items = list(user_watchlist) + list(user_wishlist) + list(user_viewed)
-    
-    # Remove duplicates while preserving order
-    seen = set()
-    unique_user_items = []
-    for item in user_items:
-        if item.tmdb_id not in seen:
-            seen.add(item.tmdb_id)
-            unique_user_items.append(item)
-    
-    # Shuffle for diversity
-    random.shuffle(unique_user_items)
-    
-    # Get recommendations based on user's items
-    recommendations = []
-    processed_ids = set()
-    
-    # Consider more items for preview (up to 8 items)
-    items_to_consider = min(8, len(unique_user_items))
-    
-    # Get recommendations from TMDB for each item
-    for item in unique_user_items[:items_to_consider]:
-        if len(recommendations) >= 6:  # Limit total recommendations for preview
-            break
-            
-        try:
-            # Get recommendations from TMDB
-            tmdb_recs = fetch_tmdb_recommendations(item.tmdb_id, item.media_type == 'movie')
-            
-            # Limit recommendations per item for preview
-            recs_added_for_this_item = 0
-            max_recs_per_item = 2
-            
-            for rec in tmdb_recs:
-                # Skip if we already have this recommendation
-                if rec['id'] in processed_ids:
-                    continue
-                    
-                # Skip if user already has this item in any list
-                user_has_item = any(user_item.tmdb_id == rec['id'] for user_item in unique_user_items)
-                if user_has_item:
-                    continue
-                
-                # Add recommendation
-                poster = fetch_poster(rec['id'], item.media_type == 'movie')
-                recommendations.append({
-                    'id': rec['id'],
-                    'title': rec['title'] if item.media_type == 'movie' else rec['name'],
-                    'poster': poster,
-                    'media_type': 'movie' if item.media_type == 'movie' else 'tv',
-                    'release_date': rec.get('release_date') if item.media_type == 'movie' else rec.get('first_air_date', 'N/A'),
-                    'based_on': item.title  # What this recommendation is based on
-                })
-                
-                processed_ids.add(rec['id'])
-                recs_added_for_this_item += 1
-                
-                # Limit recommendations per source item
-                if recs_added_for_this_item >= max_recs_per_item:
-                    break
-                
-                # Limit total recommendations
-                if len(recommendations) >= 6:
-                    break
-                    
-        except Exception as e:
-            print(f"Error fetching recommendations for {item.title}: {e}")
-            continue
-    
-    # Remove duplicates (in case any slipped through)
-    final_recommendations = []
-    seen_rec_ids = set()
-    for rec in recommendations:
-        if rec['id'] not in seen_rec_ids:
-            seen_rec_ids.add(rec['id'])
-            final_recommendations.append(rec)
-    
-    return jsonify({'recommendations': final_recommendations})
+    from api.recommendations import get_profile_recommendations_preview
+
+    # Head of the same (cached) list the full recommendations page shows
+    return jsonify({'recommendations': get_profile_recommendations_preview(current_user)})
 
 @auth.route('/profile/edit', methods=['GET', 'POST'])
 @login_required
@@ -1,21 +1,60 @@
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, Response, render_template, request, jsonify, stream_with_context
 from flask_login import login_required, current_user
-import requests
 import os
-from api.chatbot import get_chatbot, clean_json_response, is_recent_release, is_upcoming_release, is_safety_model_response, extract_media_with_llm
-from api.rag_helper import enhance_prompt_with_rag
+from api.chat_history import get_history_manager
+from api.chat_store import get_session_store
+from api.llm_gateway import get_llm_gateway
+from api.chatbot import clean_json_response, DEFAULT_MODEL, is_safety_model_response, extract_media_with_llm, with_structured_media, split_structured_reply, summarize_conversation, MediaJsonStreamFilter, SAFETY_MODELS
+from api.query_classifier import get_query_classifier
+from api.rag_helper import enhance_prompt_with_rag, vector_db
+from api.response_cache import get_response_cache
+from api.search_filters import parse_filters
+from api.title_resolver import get_title_resolver
 from langchain.schema import AIMessage, HumanMessage
 import json
 from datetime import datetime
 import re
 
-# Get environment variables
-TMDB_API_KEY = os.getenv("TMDB_API_KEY")
+# One LLM call answers and lists its titles (MEDIA_JSON block); false restores the separate extraction call
+CHAT_SINGLE_PASS = os.getenv("CHAT_SINGLE_PASS", "true").lower() == "true"
+
+# Reuse answers to first-turn questions asked before (exactly or close in embedding space)
+CHAT_RESPONSE_CACHE = os.getenv("CHAT_RESPONSE_CACHE", "true").lower() == "true"
+
+# local: rule-based analysis, escalating low-confidence messages to the LLM; llm: always ask the LLM
+CHAT_QUERY_CLASSIFIER = os.getenv("CHAT_QUERY_CLASSIFIER", "local").lower()
+
+# Shown above answers grounded in the vector database
+RAG_BANNER = "🎬 *Using recent media database*\n\n"
 
 chat = Blueprint('chat', __name__)
 
-# In-memory session storage
-chat_sessions = {}
+# Answer and analysis calls: per-model health, circuit breaking, fallback and optional hedging
+llm_gateway = get_llm_gateway()
+
+# Titles resolved against the local catalog count as recent content
+query_classifier = get_query_classifier(
+    title_lookup=(lambda title: vector_db.title_index.lookup(title, exact_only=True)) if vector_db is not None else None
+)
+
+# Recommendation cards check the catalog's title index before searching TMDb
+title_resolver = get_title_resolver(
+    catalog_lookup=(lambda title, year: vector_db.title_index.lookup(title, year, exact_only=True)
+                    if vector_db.title_index.ready else None) if vector_db is not None else None
+)
+
+# Semantic matching only once the encoder is loaded; until then only identical questions hit
+response_cache = get_response_cache(
+    encode=(lambda question: vector_db.query_embeddings.get(question) if vector_db.encoder_state == 'ready' else None)
+    if vector_db is not None else None,
+    catalog_version=(lambda: vector_db.catalog_version) if vector_db is not None else None
+)
+
+# Conversation history per user (backend selected by CHAT_SESSION_BACKEND, see api/chat_store.py)
+chat_sessions = get_session_store()
+
+# Recent turns verbatim within a token budget, older ones in a rolling summary
+history_manager = get_history_manager(summarize=summarize_conversation)
 
 @chat.route("/model_selection")
 def model_selection():
@@ -29,40 +68,107 @@ def model_selection():
 @login_required
 def chat_page():
     model_name = request.args.get("model", "llama-3.3-70b-versatile")
-    session_id = request.remote_addr
-    if session_id not in chat_sessions:
-        chat_sessions[session_id] = []
     return render_template("chat.html", model=model_name)
 
-@chat.route("/chat_api", methods=["POST"])
-@login_required
-def chat_api():
-    user_message = request.json.get("message")
-    model_name = request.json.get("model", "llama-3.3-70b-versatile")
-    if not user_message:
-        return jsonify({"error": "Message is required"}), 400
+def extract_media_from_reply(bot_reply, model_name):
+    """
+    Post-hoc title extraction for replies without a MEDIA_JSON block
+    (single-pass mode off, or the model left the block out).
+    
+    Returns:
+        Tuple of (movie_data, tv_show_data) lists of {"title", "year"}
+    """
+    # IMPROVED MEDIA EXTRACTION - Only skip for question-only responses
+    should_extract_media = True
+    bot_reply_lower = bot_reply.lower()
+    
+    # Only skip if response is ONLY asking questions (no recommendations)
+    question_only_patterns = [
+        "what kind of mood are you in",
+        "what genres do you prefer", 
+        "any recent titles you",
+        "which streaming services",
+        "tell me more about your preferences"
+    ]
+    
+    is_question_only = False
+    for pattern in question_only_patterns:
+        if pattern in bot_reply_lower:
+            is_question_only = True
+            break
+    
+    # Check if very short question without recommendation keywords
+    if bot_reply_lower.strip().endswith("?") and len(bot_reply.split()) < 20:
+        if not any(keyword in bot_reply_lower for keyword in ["suggest", "recommend", "here are", "check out", "might enjoy", "try"]):
+            is_question_only = True
+    
+    if is_question_only:
+        should_extract_media = False
+    
+    if should_extract_media:
+        llm_prompt = f"""
+        You are an expert text analyzer. Extract **movie** and **TV show** titles with years from this response.
+        Return only valid JSON with "movies" and "tv_shows" arrays.
+        Each item: {{"title": "...", "year": ... or null}}
+        
+        **Chatbot Response:**
+        "{bot_reply}"
+        """
+        analysis_content, _ = llm_gateway.invoke(llm_prompt, model_name)
+        try:
+            cleaned_content = clean_json_response(analysis_content)
+            analysis_data = json.loads(cleaned_content)
+            movie_data = analysis_data.get("movies", [])
+            tv_show_data = analysis_data.get("tv_shows", [])
+        except json.JSONDecodeError:
+            print(f"Invalid JSON from analysis: {analysis_content}")
+            if is_safety_model_response(analysis_content, model_name):
+                movie_data = []
+                tv_show_data = []
+            else:
+                movie_data, tv_show_data = extract_media_with_llm(bot_reply, model_name)
+    else:
+        movie_data = []
+        tv_show_data = []
 
-    session_id = request.remote_addr
-    if session_id not in chat_sessions:
-        chat_sessions[session_id] = []
+    # Fallback extraction if needed
+    # Fallback: Use regex extraction ONLY if LLM extraction returned nothing
+    if should_extract_media and not movie_data and not tv_show_data:
+        from api.chatbot import extract_media_titles, identify_media_type
+        
+        # Extract potential titles using regex patterns
+        potential_titles = extract_media_titles(bot_reply)
+        year_matches = re.findall(r'\b(19|20)\d{2}\b', bot_reply)
+        
+        for i, title in enumerate(potential_titles[:10]):
+            year_match = re.search(r'\b(19|20)\d{2}\b', title)
+            year = int(year_match.group()) if year_match else None
+            
+            if not year and i < len(year_matches):
+                year = int(year_matches[i])
+                
+            from api.chatbot import _clean_special_titles
+            clean_title = _clean_special_titles(title.strip())
+            media_type = identify_media_type(clean_title)
+            
+            if media_type in ['movie', 'anime']:
+                movie_data.append({"title": clean_title, "year": year})
+            else:
+                tv_show_data.append({"title": clean_title, "year": year})
 
-    formatted_history = [
-        HumanMessage(content=msg["content"]) if msg["type"] == "human" else AIMessage(content=msg["content"])
-        for msg in chat_sessions[session_id]
-    ]
-    formatted_history.append(HumanMessage(content=user_message))
+    return movie_data, tv_show_data
 
-    chat_history_str = "\n".join(
-        f"{'User' if isinstance(msg, HumanMessage) else 'Assistant'}: {msg.content}"
-        for msg in formatted_history[:-1]
-    )
+def analyze_query_with_llm(user_message, model_name):
+    """
+    LLM analysis of a chat message: recent-content flag, source title/year and search filters.
     
-    
-    # SMART RAG STRATEGY: Let LLM analyze if query is about recent/new content
-    # LLM understands context better than keyword matching
+    Raises:
+        Exception if the model call fails or returns invalid JSON
+    """
     analysis_prompt = f"""Analyze this user query about movies/TV shows:
 
 Query: "{user_message}"
+Current year: {datetime.now().year}
 
 Determine:
 1. Is this asking about RECENT/NEW content (2022-)? Consider:
@@ -73,31 +179,79 @@ Determine:
    
 2. Extract any specific movie/TV show title mentioned
 3. Extract year if mentioned
+4. Extract constraints on the RECOMMENDATIONS (not on a title the user mentions) as "filters":
+   - media_type: "movie", "tv", "anime" or null
+   - year_from / year_to: release year range as numbers, or null ("from 2023" → 2023/2023, "after 2020" → 2021/null, "this year" → current year)
+   - min_rating: minimum TMDb rating 0-10 ("highly rated" → 7.5), or null
+   - min_votes: minimum vote count ("popular", "well known" → 500), or null
+   - language: ISO 639-1 original language ("korean" → "ko", "japanese" → "ja"), or null
 
-Return JSON: {{"is_recent_content_query": true/false, "title": "..." or null, "year": "..." or null, "confidence": "high/medium/low"}}
+Return JSON: {{"is_recent_content_query": true/false, "title": "..." or null, "year": "..." or null, "confidence": "high/medium/low", "filters": {{...}} or null}}
 
 Examples:
-- "movie like matrix" → {{"is_recent_content_query": false, "title": null, "year": null, "confidence": "high"}}
+- "movie like matrix" → {{"is_recent_content_query": false, "title": null, "year": null, "confidence": "high", "filters": {{"media_type": "movie"}}}}
 - "tv show like Black Rabbit" → {{"is_recent_content_query": false, "title": "Black Rabbit", "year": null, "confidence": "medium"}}
 - "recent tv show like Black Rabbit" → {{"is_recent_content_query": true, "title": "Black Rabbit", "year": null, "confidence": "high"}}
 - "suggest me tv show like 'All Her Fault' from 2025" → {{"is_recent_content_query": true, "title": "All Her Fault", "year": "2025", "confidence": "high"}}
-- "new movies from 2025" → {{"is_recent_content_query": true, "title": null, "year": "2025", "confidence": "high"}}
+- "new movies from 2025" → {{"is_recent_content_query": true, "title": null, "year": "2025", "confidence": "high", "filters": {{"media_type": "movie", "year_from": 2025, "year_to": 2025}}}}
+- "highly rated korean shows since 2023" → {{"is_recent_content_query": true, "title": null, "year": "2023", "confidence": "high", "filters": {{"media_type": "tv", "year_from": 2023, "min_rating": 7.5, "language": "ko"}}}}
 - "what came out this year" → {{"is_recent_content_query": true, "title": null, "year": null, "confidence": "high"}}
 - "trending shows" → {{"is_recent_content_query": true, "title": null, "year": null, "confidence": "medium"}}
 - "hot new series" → {{"is_recent_content_query": true, "title": null, "year": null, "confidence": "high"}}
 
 IMPORTANT: Return ONLY the JSON object, no markdown, no explanations."""
 
-    try:
-        analysis_response = get_chatbot(model_name).invoke(analysis_prompt)
-        analysis_data = json.loads(clean_json_response(analysis_response.content))
-        
+    analysis_content, _ = llm_gateway.invoke(analysis_prompt, model_name)
+    analysis_data = json.loads(clean_json_response(analysis_content))
+    if not isinstance(analysis_data, dict):
+        raise ValueError(f"Expected a JSON object, got: {analysis_content[:200]}")
+    return analysis_data
+
+def prepare_chat_turn(user_message, model_name, session_id):
+    """
+    Everything before the answer call: history, query analysis, RAG context and the answer prompt.
+    
+    Returns:
+        Dictionary with formatted_history, answer_prompt, rag_used, prompt_tokens,
+        and the user_message / model_name / first_turn the response cache needs
+    """
+    stored_history = chat_sessions.get(session_id)
+    formatted_history = [
+        HumanMessage(content=msg["content"]) if msg["type"] == "human" else AIMessage(content=msg["content"])
+        for msg in stored_history
+    ]
+    formatted_history.append(HumanMessage(content=user_message))
+
+    # Only the budgeted window goes into the prompt; the full history is kept for the session
+    history_window = history_manager.window(session_id, stored_history)
+    chat_history_str = history_window["text"]
+    
+    
+    # SMART RAG STRATEGY: local rules resolve the common cases in microseconds;
+    # the LLM only analyses messages they cannot classify confidently
+    local_analysis = query_classifier.classify(user_message) if CHAT_QUERY_CLASSIFIER == "local" else None
+    if local_analysis is not None and local_analysis["confidence"] != "low":
+        analysis_data = local_analysis
+        print(f"⚡ Local analysis ({local_analysis['confidence']} confidence)")
+    else:
+        try:
+            analysis_data = analyze_query_with_llm(user_message, model_name)
+        except Exception as e:
+            print(f"⚠️  LLM analysis failed: {e}")
+            analysis_data = None
+            if local_analysis is not None:
+                query_classifier.record_llm_error()
+                # Low-confidence local answer beats bare keyword matching
+                analysis_data = local_analysis
+    
+    if analysis_data is not None:
         is_recent_query = analysis_data.get("is_recent_content_query", False)
         source_title = analysis_data.get("title")
         source_year = analysis_data.get("year")
         confidence = analysis_data.get("confidence", "medium")
+        search_filters = parse_filters(analysis_data.get("filters"))
         
-        # Trigger RAG if LLM detected recent content query
+        # Trigger RAG if recent content query detected
         needs_rag = is_recent_query
         
         # Also trigger if year 2022-2025 is mentioned (high confidence)
@@ -112,19 +266,21 @@ IMPORTANT: Return ONLY the JSON object, no markdown, no explanations."""
         
         if needs_rag:
             if source_title:
-                print(f"🤖 LLM: Recent content query ({confidence} confidence) - '{source_title}' ({source_year or 'any year'})")
+                print(f"🤖 Analysis: Recent content query ({confidence} confidence) - '{source_title}' ({source_year or 'any year'})")
             else:
-                print(f"🤖 LLM: Recent content query ({confidence} confidence) - triggering RAG")
+                print(f"🤖 Analysis: Recent content query ({confidence} confidence) - triggering RAG")
         else:
-            print(f"🤖 LLM: General/old content query - using LLM knowledge first")
+            print(f"🤖 Analysis: General/old content query - using LLM knowledge first")
+        if search_filters:
+            print(f"🔎 Search filters: {search_filters}")
         
-    except Exception as e:
-        print(f"⚠️  LLM analysis failed: {e}")
+    else:
         # Fallback: Simple keyword detection as backup
         recent_keywords = ['recent', 'new', 'latest', '2024', '2025', '2023', 'trending', 'fresh', 'hot']
         needs_rag = any(keyword in user_message.lower() for keyword in recent_keywords)
         source_title = None
         source_year = None
+        search_filters = None
         if needs_rag:
             print(f"🤖 Fallback: Keyword detection triggered RAG")
     
@@ -134,189 +290,200 @@ IMPORTANT: Return ONLY the JSON object, no markdown, no explanations."""
             user_message, 
             chat_history_str,
             source_title=source_title,
-            source_year=source_year
+            source_year=source_year,
+            filters=search_filters
         )
-        if rag_used:
-            bot_response = get_chatbot(model_name).invoke(rag_prompt)
-            bot_reply = f"🎬 *Using recent media database*\n\n{bot_response.content.strip()}"
-        else:
-            # RAG didn't find it, use LLM knowledge
-            bot_response = get_chatbot(model_name).invoke(f"Conversation:\n{chat_history_str}\n\nUser: {user_message}")
-            bot_reply = bot_response.content.strip()
+        # If RAG didn't find it, use LLM knowledge
+        answer_prompt = rag_prompt if rag_used else f"Conversation:\n{chat_history_str}\n\nUser: {user_message}"
     else:
+        rag_used = False
         # Use LLM's knowledge for general queries
-        enhanced_prompt = f"""You are a movie/TV recommendation assistant.
+        answer_prompt = f"""You are a movie/TV recommendation assistant.
 
 Conversation:
 {chat_history_str}
 
 User: {user_message}"""
-        
-        bot_response = get_chatbot(model_name).invoke(enhanced_prompt)
-        bot_reply = bot_response.content.strip()
-
-        if not bot_reply:
-            return jsonify({"error": "Empty response"}), 500
-
-        if is_safety_model_response(bot_reply, model_name):
-            fallback_model = "llama-3.3-70b-versatile"
-            bot_response = get_chatbot(fallback_model).invoke(enhanced_prompt)
-            bot_reply = bot_response.content.strip()
-            model_name = fallback_model
+    
+    if CHAT_SINGLE_PASS:
+        # The answer lists its own titles, so no separate extraction call is needed
+        answer_prompt = with_structured_media(answer_prompt)
+    
+    prompt_tokens = history_manager.record_prompt(answer_prompt)
+    print(f"🧮 Prompt ~{prompt_tokens} tokens (history ~{history_window['history_tokens']}, "
+          f"{history_window['turns']} recent turns{', with summary' if history_window['summary'] else ''})")
+    
+    return {"formatted_history": formatted_history, "answer_prompt": answer_prompt, "rag_used": rag_used,
+            "prompt_tokens": prompt_tokens, "user_message": user_message, "model_name": model_name,
+            "first_turn": not stored_history}
 
-    # IMPROVED MEDIA EXTRACTION - Only skip for question-only responses
-    should_extract_media = True
-    bot_reply_lower = bot_reply.lower()
+def generate_reply(answer_prompt, model_name):
+    """
+    One blocking answer call through the LLM gateway.
     
-    # Only skip if response is ONLY asking questions (no recommendations)
-    question_only_patterns = [
-        "what kind of mood are you in",
-        "what genres do you prefer", 
-        "any recent titles you",
-        "which streaming services",
-        "tell me more about your preferences"
-    ]
+    Safety models only return a verdict: the default model answers once the
+    verdict is "safe", any other verdict is returned as the reply.
     
-    is_question_only = False
-    for pattern in question_only_patterns:
-        if pattern in bot_reply_lower:
-            is_question_only = True
-            break
+    Returns:
+        Tuple of (raw reply, model that produced it)
+    """
+    if model_name in SAFETY_MODELS:
+        # Never hedged or failed over, so nothing is answered before the guard has cleared the prompt
+        verdict, _ = llm_gateway.invoke(answer_prompt, model_name, failover=False)
+        if not is_safety_model_response(verdict, model_name):
+            return verdict.strip(), model_name
+        model_name = DEFAULT_MODEL
+    bot_reply, model_name = llm_gateway.invoke(answer_prompt, model_name)
+    return bot_reply.strip(), model_name
+
+def finish_chat_turn(turn, bot_reply, model_name, session_id):
+    """
+    Everything after the answer call: title list, poster cards and history.
     
-    # Check if very short question without recommendation keywords
-    if bot_reply_lower.strip().endswith("?") and len(bot_reply.split()) < 20:
-        if not any(keyword in bot_reply_lower for keyword in ["suggest", "recommend", "here are", "check out", "might enjoy", "try"]):
-            is_question_only = True
+    Args:
+        turn: Result of prepare_chat_turn
+        bot_reply: Raw model output (may end with a MEDIA_JSON block)
+        model_name: Model that produced the reply
+        session_id: Chat session key (user id)
     
-    if is_question_only:
-        should_extract_media = False
+    Returns:
+        Response dictionary with reply and, if any, movies / tv_shows cards
+    """
+    movie_data, tv_show_data = None, None
+    if CHAT_SINGLE_PASS:
+        bot_reply, movie_data, tv_show_data = split_structured_reply(bot_reply)
+    if turn["rag_used"]:
+        bot_reply = f"{RAG_BANNER}{bot_reply}"
     
-    if should_extract_media:
-        llm_prompt = f"""
-        You are an expert text analyzer. Extract **movie** and **TV show** titles with years from this response.
-        Return only valid JSON with "movies" and "tv_shows" arrays.
-        Each item: {{"title": "...", "year": ... or null}}
-        
-        **Chatbot Response:**
-        "{bot_reply}"
-        """
-        analysis_response = get_chatbot(model_name).invoke(llm_prompt)
-        try:
-            cleaned_content = clean_json_response(analysis_response.content)
-            analysis_data = json.loads(cleaned_content)
-            movie_data = analysis_data.get("movies", [])
-            tv_show_data = analysis_data.get("tv_shows", [])
-        except json.JSONDecodeError:
-            print(f"Invalid JSON from analysis: {analysis_response.content}")
-            if is_safety_model_response(analysis_response.content, model_name):
-                movie_data = []
-                tv_show_data = []
-            else:
-                movie_data, tv_show_data = extract_media_with_llm(bot_reply, model_name)
-    else:
-        movie_data = []
-        tv_show_data = []
+    if movie_data is None or tv_show_data is None:
+        movie_data, tv_show_data = extract_media_from_reply(bot_reply, model_name)
 
-    # Fallback extraction if needed
-    # Fallback: Use regex extraction ONLY if LLM extraction returned nothing
-    if should_extract_media and not movie_data and not tv_show_data:
-        from api.chatbot import extract_media_titles, identify_media_type
-        
-        # Extract potential titles using regex patterns
-        potential_titles = extract_media_titles(bot_reply)
-        year_matches = re.findall(r'\b(19|20)\d{2}\b', bot_reply)
-        
-        for i, title in enumerate(potential_titles[:10]):
-            year_match = re.search(r'\b(19|20)\d{2}\b', title)
-            year = int(year_match.group()) if year_match else None
-            
-            if not year and i < len(year_matches):
-                year = int(year_matches[i])
-                
-            from api.chatbot import _clean_special_titles
-            clean_title = _clean_special_titles(title.strip())
-            media_type = identify_media_type(clean_title)
-            
-            if media_type in ['movie', 'anime']:
-                movie_data.append({"title": clean_title, "year": year})
-            else:
-                tv_show_data.append({"title": clean_title, "year": year})
+    media_data = title_resolver.resolve(movie_data, tv_show_data) if movie_data or tv_show_data else {"movies": [], "tv_shows": []}
 
-    if not movie_data and not tv_show_data:
-        formatted_history.append(AIMessage(content=bot_reply))
-        chat_sessions[session_id] = [
-            {"type": "human", "content": msg.content} if isinstance(msg, HumanMessage)
-            else {"type": "ai", "content": msg.content}
-            for msg in formatted_history
-        ]
-        return jsonify({"reply": bot_reply})
-
-    # Fetch media details from TMDb (OPTIMIZED: 2 API calls max instead of 3)
-    media_data = {"movies": [], "tv_shows": []}
-    for media_list, media_type, key in [(movie_data, "movie", "movies"), (tv_show_data, "tv", "tv_shows")]:
-        for media in media_list:
-            title = media["title"]
-            year = media["year"]
-            
-            # First attempt: Search with year if available
-            url = f"https://api.themoviedb.org/3/search/{media_type}?api_key={TMDB_API_KEY}&query={title}&page=1&include_adult=true"
-            if year:
-                url += f"&year={year}"
-            
-            response = requests.get(url).json()
-            results = response.get("results", [])
-            
-            # Second attempt: Retry without year if first attempt had year and failed
-            if not results and year:
-                url = f"https://api.themoviedb.org/3/search/{media_type}?api_key={TMDB_API_KEY}&query={title}&page=1&include_adult=true"
-                response = requests.get(url).json()
-                results = response.get("results", [])
-            
-            # If still no results, add placeholder
-            if not results:
-                print(f"⚠️ No {media_type} results found for: {title}")
-                media_data[key].append({
-                    "title": title,
-                    "year": year if year else "N/A",
-                    "poster_url": "https://via.placeholder.com/500x750?text=No+Image",
-                    "tmdb_link": "#",
-                    "release_status": " (Not found in database)"
-                })
-                continue
-                
-            media_info = results[0]
-            media_id = media_info.get("id")
-            poster_path = media_info.get("poster_path")
-            
-            release_date = media_info.get("release_date") if media_type == "movie" else media_info.get("first_air_date")
-            release_year = release_date[:4] if release_date else "Unknown"
-            
-            is_recent = is_recent_release(release_date)
-            is_upcoming = is_upcoming_release(release_date)
-            release_status = ""
-            if is_upcoming:
-                release_status = " (UPCOMING)"
-            elif is_recent:
-                release_status = " (RECENT)"
-            
-            media_data[key].append({
-                "title": media_info["title"] if media_type == "movie" else media_info["name"],
-                "year": release_year,
-                "poster_url": f"https://image.tmdb.org/t/p/w500{poster_path}" if poster_path else "https://via.placeholder.com/500x750?text=No+Image",
-                "tmdb_link": f"/{media_type}/{media_id}",
-                "release_status": release_status
-            })
-
-    formatted_history.append(AIMessage(content=bot_reply))
-    chat_sessions[session_id] = [
+    formatted_history = turn["formatted_history"] + [AIMessage(content=bot_reply)]
+    chat_sessions.save(session_id, [
         {"type": "human", "content": msg.content} if isinstance(msg, HumanMessage)
         else {"type": "ai", "content": msg.content}
         for msg in formatted_history
-    ]
+    ])
 
     response_data = {"reply": bot_reply}
     if media_data["movies"]:
         response_data["movies"] = media_data["movies"]
     if media_data["tv_shows"]:
         response_data["tv_shows"] = media_data["tv_shows"]
-    return jsonify(response_data)
+    
+    if CHAT_RESPONSE_CACHE and turn["first_turn"]:
+        # Later turns depend on the conversation, so only opening questions are reused
+        response_cache.store(turn["user_message"], turn["model_name"], response_data)
+    return response_data
+
+def cached_chat_turn(user_message, model_name, session_id):
+    """
+    Answer an opening question from the response cache, recording it in the session.
+    
+    Returns:
+        Cached response dictionary, or None to run the full turn
+    """
+    if not CHAT_RESPONSE_CACHE or chat_sessions.get(session_id):
+        return None
+    response_data = response_cache.lookup(user_message, model_name)
+    if response_data is None:
+        return None
+    print(f"♻️ Response cache hit for: {user_message[:60]}")
+    chat_sessions.save(session_id, [
+        {"type": "human", "content": user_message},
+        {"type": "ai", "content": response_data["reply"]}
+    ])
+    return response_data
+
+def sse_event(event, data):
+    """One server-sent event frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@chat.route("/chat_api", methods=["POST"])
+@login_required
+def chat_api():
+    user_message = request.json.get("message")
+    model_name = request.json.get("model", "llama-3.3-70b-versatile")
+    if not user_message:
+        return jsonify({"error": "Message is required"}), 400
+
+    session_id = current_user.id
+    cached = cached_chat_turn(user_message, model_name, session_id)
+    if cached is not None:
+        return jsonify(cached)
+
+    turn = prepare_chat_turn(user_message, model_name, session_id)
+
+    bot_reply, model_name = generate_reply(turn["answer_prompt"], model_name)
+    if not bot_reply:
+        return jsonify({"error": "Empty response"}), 500
+
+    return jsonify(finish_chat_turn(turn, bot_reply, model_name, session_id))
+
+@chat.route("/chat_api/stream", methods=["POST"])
+@login_required
+def chat_api_stream():
+    """
+    Same turn as /chat_api as server-sent events: "token" events while the
+    answer is generated, then "media" with the poster cards and "done" with
+    the final reply text ("error" if the turn fails).
+    """
+    user_message = request.json.get("message")
+    model_name = request.json.get("model", "llama-3.3-70b-versatile")
+    if not user_message:
+        return jsonify({"error": "Message is required"}), 400
+
+    session_id = current_user.id
+
+    def events():
+        try:
+            cached = cached_chat_turn(user_message, model_name, session_id)
+            if cached is not None:
+                yield sse_event("token", {"text": cached["reply"]})
+                yield sse_event("media", {"movies": cached.get("movies", []), "tv_shows": cached.get("tv_shows", [])})
+                yield sse_event("done", {"reply": cached["reply"]})
+                return
+
+            turn = prepare_chat_turn(user_message, model_name, session_id)
+            if turn["rag_used"]:
+                yield sse_event("token", {"text": RAG_BANNER})
+
+            # The MEDIA_JSON block at the end of the reply is for us, not the user
+            visible = MediaJsonStreamFilter()
+            if model_name in SAFETY_MODELS:
+                # Safety models answer with a verdict that has to be retried before anything is shown
+                bot_reply, used_model = generate_reply(turn["answer_prompt"], model_name)
+                text = visible.feed(bot_reply) + visible.flush()
+                if text:
+                    yield sse_event("token", {"text": text})
+            else:
+                parts, used_model = [], model_name
+                for content, used_model in llm_gateway.stream(turn["answer_prompt"], model_name):
+                    parts.append(content)
+                    text = visible.feed(content)
+                    if text:
+                        yield sse_event("token", {"text": text})
+                text = visible.flush()
+                if text:
+                    yield sse_event("token", {"text": text})
+                bot_reply = "".join(parts).strip()
+
+            if not bot_reply:
+                yield sse_event("error", {"error": "Empty response"})
+                return
+
+            result = finish_chat_turn(turn, bot_reply, used_model, session_id)
+            yield sse_event("media", {"movies": result.get("movies", []), "tv_shows": result.get("tv_shows", [])})
+            yield sse_event("done", {"reply": result["reply"]})
+        except Exception as e:
+            print(f"⚠️  Streaming chat failed: {e}")
+            yield sse_event("error", {"error": "Something went wrong"})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        # Proxies must pass tokens through as they arrive
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,15 +1,14 @@
 from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash
 import requests
-import time
 import os
 from datetime import datetime
 from sqlalchemy import select
 from api.tmdb_client import (
-    fetch_now_playing_movies, fetch_popular_movies, fetch_upcoming_movies,
-    fetch_trending_people, fetch_airing_today_shows, fetch_on_the_air_shows,
-    fetch_popular_shows, fetch_trending_movies, fetch_movies_by_genre,
-    fetch_shows_by_genre, fetch_poster, fetch_tmdb_recommendations
+    fetch_movies_by_genre, fetch_shows_by_genre, fetch_tmdb_recommendations, resolve_posters,
+    MOVIE_GENRE_IDS, TV_GENRE_IDS
 )
+from api.feeds import load_home_feeds
+from api.tmdb_transport import get_tmdb_transport
 from flask_login import login_required, current_user
 from models import db, MediaItem, user_watchlist, user_wishlist, user_viewed
 
@@ -18,20 +17,15 @@ TMDB_API_KEY = os.getenv("TMDB_API_KEY")
 TMDB_API_KEY_2 = os.getenv("TMDB_API_KEY_2")
 NEWS_API_KEY = os.getenv("NEWS_API_KEY")
 
+# Shared pooled session for TMDb calls
+tmdb_http = get_tmdb_transport()
+
 main = Blueprint('main', __name__)
 
 @main.route('/')
 def index():
-    trending_backdrops = fetch_trending_movies()
-    now_playing = fetch_now_playing_movies()
-    popular = fetch_popular_movies()
-    # Get IDs from now_playing and popular to exclude
-    exclude_ids = {movie['id'] for movie in now_playing + popular}
-    upcoming = fetch_upcoming_movies(exclude_ids=exclude_ids)
-    airing_today = fetch_airing_today_shows()
-    on_the_air = fetch_on_the_air_shows()
-    popular_shows = fetch_popular_shows()
-    trending_people = fetch_trending_people()
+    # All eight rows load in parallel; slow rows render empty after the deadline
+    feeds = load_home_feeds()
     
     # Get user's lists if authenticated
     user_watchlist_ids = set()
@@ -45,14 +39,7 @@ def index():
     
     return render_template(
         'index.html',
-        trending_backdrops=trending_backdrops,
-        now_playing=now_playing,
-        popular=popular,
-        upcoming=upcoming,
-        airing_today=airing_today,
-        on_the_air=on_the_air,
-        popular_shows=popular_shows,
-        trending_people=trending_people,
+        **feeds,
         user_watchlist_ids=user_watchlist_ids,
         user_wishlist_ids=user_wishlist_ids,
         user_viewed_ids=user_viewed_ids
@@ -66,17 +53,17 @@ def search():
 
     # Search movies
     movie_url = f"https://api.themoviedb.org/3/search/movie?api_key={TMDB_API_KEY}&language=en-US&query={query}&page=1"
-    movie_response = requests.get(movie_url)
+    movie_response = tmdb_http.get(movie_url)
     movie_data = movie_response.json().get('results', [])
 
     # Search TV shows
     tv_url = f"https://api.themoviedb.org/3/search/tv?api_key={TMDB_API_KEY}&language=en-US&query={query}&page=1"
-    tv_response = requests.get(tv_url)
+    tv_response = tmdb_http.get(tv_url)
     tv_data = tv_response.json().get('results', [])
 
     # Search people
     person_url = f"https://api.themoviedb.org/3/search/person?api_key={TMDB_API_KEY}&language=en-US&query={query}&page=1"
-    person_response = requests.get(person_url)
+    person_response = tmdb_http.get(person_url)
     person_data = person_response.json().get('results', [])
 
     # Format all results, filtering out items without images
@@ -126,17 +113,17 @@ def autocomplete():
 
     # Search movies
     movie_url = f"https://api.themoviedb.org/3/search/movie?api_key={TMDB_API_KEY}&language=en-US&query={query}&page=1"
-    movie_response = requests.get(movie_url)
+    movie_response = tmdb_http.get(movie_url)
     movie_data = movie_response.json().get('results', [])
 
     # Search TV shows
     tv_url = f"https://api.themoviedb.org/3/search/tv?api_key={TMDB_API_KEY}&language=en-US&query={query}&page=1"
-    tv_response = requests.get(tv_url)
+    tv_response = tmdb_http.get(tv_url)
     tv_data = tv_response.json().get('results', [])
 
     # Search people
     person_url = f"https://api.themoviedb.org/3/search/person?api_key={TMDB_API_KEY}&language=en-US&query={query}&page=1"
-    person_response = requests.get(person_url)
+    person_response = tmdb_http.get(person_url)
     person_data = person_response.json().get('results', [])
 
     # Format results, filtering out items without images (limit 5 each)
@@ -187,13 +174,7 @@ def tv_shows():
 
 @main.route('/genre/<genre_name>')
 def genre_page(genre_name):
-    genre_mapping = {
-        'romance': 10749, 'horror': 27, 'fantasy': 14, 'science_fiction': 878, 'mystery': 9648,
-        'western': 37, 'drama': 18, 'action': 28, 'comedy': 35, 'thriller': 53, 'adventure': 12,
-        'animation': 16, 'crime': 80, 'family': 10751, 'history': 36, 'music': 10402, 'war': 10752,
-        'documentary': 99, 'tv_movie': 10770
-    }
-    genre_id = genre_mapping.get(genre_name)
+    genre_id = MOVIE_GENRE_IDS.get(genre_name)
     if genre_id:
         movies = fetch_movies_by_genre(genre_id)
         
@@ -216,12 +197,7 @@ def genre_page(genre_name):
 
 @main.route('/tv_genre/<genre_name>')
 def tv_genre_page(genre_name):
-    genre_mapping = {
-        'action_adventure': 10759, 'animation': 16, 'comedy': 35, 'crime': 80, 'documentary': 99,
-        'drama': 18, 'family': 10751, 'kids': 10762, 'mystery': 9648, 'news': 10763, 'reality': 10764,
-        'sci_fi_fantasy': 10765, 'soap': 10766, 'talk': 10767, 'war_politics': 10768, 'western': 37
-    }
-    genre_id = genre_mapping.get(genre_name)
+    genre_id = TV_GENRE_IDS.get(genre_name)
     if genre_id:
         shows = fetch_shows_by_genre(genre_id)
         
@@ -246,27 +222,25 @@ def tv_genre_page(genre_name):
 def recommend():
     movie_name = request.form['movie_name']
     tmdb_search_url = f"https://api.themoviedb.org/3/search/movie?api_key={TMDB_API_KEY}&language=en-US&query={movie_name}&page=1&include_adult=true"
-    time.sleep(1)
-    response = requests.get(tmdb_search_url)
+    response = tmdb_http.get(tmdb_search_url)
     data = response.json()
     tmdb_results = data.get('results', [])
     
     if tmdb_results:
         searched_movie = tmdb_results[0]
         searched_movie_id = searched_movie['id']
-        searched_movie_poster = fetch_poster(searched_movie_id)
-        
-        tmdb_recommendations = fetch_tmdb_recommendations(searched_movie_id)
+        tmdb_recommendations = [
+            rec for rec in fetch_tmdb_recommendations(searched_movie_id)
+            if rec['id'] != searched_movie_id
+        ]
         
-        recommend_movie = []
-        recommend_poster = []
-        recommend_ids = []  # New list to store movie IDs
+        # Cards come straight from the payloads; only missing posters are fetched
+        posters = resolve_posters([searched_movie] + tmdb_recommendations)
+        searched_movie_poster = posters[searched_movie_id]
         
-        for rec in tmdb_recommendations:
-            if rec['id'] != searched_movie_id:
-                recommend_movie.append(rec['title'])
-                recommend_poster.append(fetch_poster(rec['id']))
-                recommend_ids.append(rec['id'])  # Store the movie ID
+        recommend_movie = [rec['title'] for rec in tmdb_recommendations]
+        recommend_poster = [posters[rec['id']] for rec in tmdb_recommendations]
+        recommend_ids = [rec['id'] for rec in tmdb_recommendations]
 
         # Get user's lists if authenticated
         user_watchlist_ids = set()
@@ -294,27 +268,25 @@ def recommend():
 def tv_recommend():
     show_name = request.form['show_name']
     tmdb_search_url = f"https://api.themoviedb.org/3/search/tv?api_key={TMDB_API_KEY}&language=en-US&query={show_name}&page=1&include_adult=true"
-    time.sleep(1)
-    response = requests.get(tmdb_search_url)
+    response = tmdb_http.get(tmdb_search_url)
     data = response.json()
     tmdb_results = data.get('results', [])
     
     if tmdb_results:
         searched_show = tmdb_results[0]
         searched_show_id = searched_show['id']
-        searched_show_poster = fetch_poster(searched_show_id, is_movie=False)
-        
-        tmdb_recommendations = fetch_tmdb_recommendations(searched_show_id, is_movie=False)
+        tmdb_recommendations = [
+            rec for rec in fetch_tmdb_recommendations(searched_show_id, is_movie=False)
+            if rec['id'] != searched_show_id
+        ]
         
-        recommend_show = []
-        recommend_poster = []
-        recommend_ids = []  # New list to store TV show IDs
+        # Cards come straight from the payloads; only missing posters are fetched
+        posters = resolve_posters([searched_show] + tmdb_recommendations, is_movie=False)
+        searched_show_poster = posters[searched_show_id]
         
-        for rec in tmdb_recommendations:
-            if rec['id'] != searched_show_id:
-                recommend_show.append(rec['name'])
-                recommend_poster.append(fetch_poster(rec['id'], is_movie=False))
-                recommend_ids.append(rec['id'])  # Store the TV show ID
+        recommend_show = [rec['name'] for rec in tmdb_recommendations]
+        recommend_poster = [posters[rec['id']] for rec in tmdb_recommendations]
+        recommend_ids = [rec['id'] for rec in tmdb_recommendations]
 
         # Get user's lists if authenticated
         user_watchlist_ids = set()
@@ -395,7 +367,7 @@ def add_to_watchlist(media_id, media_type):
     if not media_item:
         # Fetch from TMDB API
         url = f"https://api.themoviedb.org/3/{media_type}/{media_id}?api_key={TMDB_API_KEY}"
-        response = requests.get(url)
+        response = tmdb_http.get(url)
         if response.status_code == 200:
             data = response.json()
             title = data.get('title') if media_type == 'movie' else data.get('name')
@@ -457,7 +429,7 @@ def add_to_wishlist(media_id, media_type):
     if not media_item:
         # Fetch from TMDB API
         url = f"https://api.themoviedb.org/3/{media_type}/{media_id}?api_key={TMDB_API_KEY}"
-        response = requests.get(url)
+        response = tmdb_http.get(url)
         if response.status_code == 200:
             data = response.json()
             title = data.get('title') if media_type == 'movie' else data.get('name')
@@ -519,7 +491,7 @@ def mark_as_viewed(media_id, media_type):
     if not media_item:
         # Fetch from TMDB API
         url = f"https://api.themoviedb.org/3/{media_type}/{media_id}?api_key={TMDB_API_KEY}"
-        response = requests.get(url)
+        response = tmdb_http.get(url)
         if response.status_code == 200:
             data = response.json()
             title = data.get('title') if media_type == 'movie' else data.get('name')
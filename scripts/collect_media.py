@@ -168,6 +168,7 @@ def fetch_comprehensive_movie_data(movie_id: int) -> Optional[Dict[str, Any]]:
         'tagline': data.get('tagline', ''),
         'overview': data.get('overview', ''),
         'release_date': data.get('release_date', ''),
+        'poster_path': data.get('poster_path'),
         'runtime': data.get('runtime', 0),
         'status': data.get('status', ''),
         'vote_average': data.get('vote_average', 0),
@@ -248,6 +249,7 @@ def fetch_comprehensive_tv_data(tv_id: int) -> Optional[Dict[str, Any]]:
         'overview': data.get('overview', ''),
         'release_date': data.get('first_air_date', ''),  # Map 'first_air_date' to 'release_date'
         'last_air_date': data.get('last_air_date', ''),
+        'poster_path': data.get('poster_path'),
         'status': data.get('status', ''),
         'number_of_seasons': data.get('number_of_seasons', 0),
         'number_of_episodes': data.get('number_of_episodes', 0),
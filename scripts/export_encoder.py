@@ -0,0 +1,37 @@
+"""
+Export the Sentence-Transformer Encoder to a Local Directory
+Lets workers load the model from disk (EMBEDDING_MODEL_PATH) instead of
+downloading it from Hugging Face on every cold start
+"""
+
+import argparse
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sentence_transformers import SentenceTransformer
+
+from api.vector_db import EMBEDDING_MODEL
+
+
+def export_encoder(output_dir: str) -> None:
+    """
+    Download the embedding model once and save it in sentence-transformers format.
+    
+    Args:
+        output_dir: Target directory (set EMBEDDING_MODEL_PATH to it)
+    """
+    print(f"Downloading {EMBEDDING_MODEL}...")
+    model = SentenceTransformer(EMBEDDING_MODEL)
+    model.save(output_dir)
+    print(f"✓ Saved to {output_dir}")
+    print(f"Set EMBEDDING_MODEL_PATH={output_dir} (and optionally EMBEDDING_QUANTIZE=int8)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Save the embedding model for offline loading")
+    parser.add_argument("--output", default="models/all-MiniLM-L6-v2", help="Directory to write the model to")
+    args = parser.parse_args()
+    export_encoder(args.output)
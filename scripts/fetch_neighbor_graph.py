@@ -0,0 +1,30 @@
+"""
+Fetch the Published Neighbour Graph
+Downloads the graph archive that the update-embeddings workflow publishes,
+so it ships in the image instead of being rebuilt or fetched at startup
+"""
+
+import argparse
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.neighbors import fetch_neighbor_graph
+
+# Release asset written by .github/workflows/update_movie_embeddings.yml
+DEFAULT_GRAPH_URL = ("https://github.com/RobinMillford/tv-movie-recommendations/releases/download/"
+                     "neighbor-graph/neighbor_graph.tar.gz")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download the precomputed neighbour graph")
+    parser.add_argument("--url", default=os.getenv("NEIGHBOR_GRAPH_URL") or DEFAULT_GRAPH_URL, help="Graph archive URL")
+    parser.add_argument("--output", default=os.path.join("data", "neighbor_graph"), help="Directory to install it in")
+    args = parser.parse_args()
+    graph = fetch_neighbor_graph(args.url, args.output)
+    if graph is None:
+        print("✗ Neighbour graph not installed; similar-title lookups will use live search")
+        sys.exit(1)
+    print(f"✓ Neighbour graph: {len(graph)} items x {graph.k} neighbours → {args.output}")
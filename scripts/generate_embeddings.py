@@ -12,15 +12,22 @@ This script creates embeddings from:
 - Similar and recommended movies for relationships
 """
 
+import argparse
 import json
 import sys
 import os
+import time
 from typing import List, Dict, Any
 
+import numpy as np
+
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from api.vector_db import MovieVectorDB
+from api.vector_db import MovieVectorDB, EMBEDDING_MODEL
+from api.embedding_cache import EmbeddingCache, description_hash, record_hash
+from api.title_index import ALTERNATIVE_TITLES_SEPARATOR
+from api.neighbors import NeighborGraph, DEFAULT_NEIGHBORS
 
 
 def create_rich_description(movie: Dict[str, Any]) -> str:
@@ -179,6 +186,8 @@ def prepare_metadata(movie: Dict[str, Any]) -> Dict[str, Any]:
         'original_title': movie.get('original_title', movie['title']),
         'release_date': movie.get('release_date', ''),
         'release_year': movie['release_date'][:4] if movie.get('release_date') else 'Unknown',
+        # Numeric copy for range filters ($gte/$lte); 0 when unknown
+        'release_year_num': int(movie['release_date'][:4]) if (movie.get('release_date') or '')[:4].isdigit() else 0,
         'status': movie.get('status', 'Released'),
         'runtime': movie.get('runtime', 0),
         'vote_average': movie.get('vote_average', 0),
@@ -190,6 +199,10 @@ def prepare_metadata(movie: Dict[str, Any]) -> Dict[str, Any]:
         'original_language': movie.get('original_language', ''),
     }
     
+    # Lets chat cards for catalog titles skip the TMDb search
+    if movie.get('poster_path'):
+        metadata['poster_path'] = movie['poster_path']
+    
     # TV Specific
     if movie.get('number_of_seasons'):
         metadata['number_of_seasons'] = movie['number_of_seasons']
@@ -216,6 +229,10 @@ def prepare_metadata(movie: Dict[str, Any]) -> Dict[str, Any]:
     if movie.get('production_companies'):
         metadata['production_companies'] = ', '.join(movie['production_companies'][:3])
     
+    if movie.get('alternative_titles'):
+        # Indexed for exact title lookups; titles may contain commas
+        metadata['alternative_titles'] = ALTERNATIVE_TITLES_SEPARATOR.join(movie['alternative_titles'])
+    
     if movie.get('collection_name'):
         metadata['collection_name'] = movie['collection_name']
         metadata['belongs_to_collection'] = movie.get('belongs_to_collection', 0)
@@ -232,21 +249,95 @@ def prepare_metadata(movie: Dict[str, Any]) -> Dict[str, Any]:
     return metadata
 
 
+# Persisted between runs (restored by the GitHub workflow's cache step)
+DEFAULT_CACHE_FILE = "data/embedding_cache.npz"
+
+# Precomputed item-to-item neighbours, served by MovieVectorDB.get_neighbors
+DEFAULT_GRAPH_DIR = "data/neighbor_graph"
+
+
+def print_diff_report(report: Dict[str, List[str]], titles: Dict[str, str], limit: int = 10) -> None:
+    """
+    Print the new/changed/unchanged/deleted breakdown against the embedding cache.
+    
+    Args:
+        report: Output of EmbeddingCache.diff
+        titles: id -> title for display
+        limit: Titles listed per category
+    """
+    print(f"  New:       {len(report['new'])}")
+    print(f"  Changed:   {len(report['changed'])} "
+          f"({len(report['reembed'])} re-encode, {len(report['metadata_only'])} metadata only)")
+    print(f"  Unchanged: {len(report['unchanged'])}")
+    print(f"  Deleted:   {len(report['deleted'])}")
+    for category in ('new', 'reembed', 'metadata_only', 'deleted'):
+        ids = report[category]
+        if not ids:
+            continue
+        print(f"\n  {category}:")
+        for item_id in ids[:limit]:
+            print(f"    - {titles.get(item_id, item_id)} ({item_id})")
+        if len(ids) > limit:
+            print(f"    ... and {len(ids) - limit} more")
+
+
+def build_neighbor_graph_file(
+    records: List[Dict[str, Any]],
+    cache: EmbeddingCache,
+    graph_dir: str,
+    k: int = DEFAULT_NEIGHBORS
+) -> None:
+    """
+    Build the top-K neighbour graph over every catalog item with a cached embedding.
+    
+    Args:
+        records: Catalog records (only their ids are used)
+        cache: Embedding cache holding the stored vectors
+        graph_dir: Output directory
+        k: Neighbours per item
+    """
+    ids = [record['id'] for record in records if record['id'] in cache.entries]
+    if len(ids) < 2:
+        print("  Not enough embeddings for a neighbour graph")
+        return
+    started = time.perf_counter()
+    matrix = np.stack([cache.entries[item_id][2] for item_id in ids]).astype(np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms == 0, 1, norms)
+    NeighborGraph.build(ids, matrix, k=k).save(graph_dir)
+    print(f"✓ Neighbour graph: {len(ids)} items x {min(k, len(ids) - 1)} neighbours "
+          f"in {time.perf_counter() - started:.1f}s → {graph_dir}")
+
+
 def generate_embeddings(
-    input_file: str = "data/movies.json"
+    input_file: str = "data/movies.json",
+    cache_file: str = DEFAULT_CACHE_FILE,
+    dry_run: bool = False,
+    prune: bool = False,
+    graph_dir: str = DEFAULT_GRAPH_DIR,
+    neighbors: int = DEFAULT_NEIGHBORS
 ) -> None:
     """
-    Generate embeddings for all movies and store in Chroma Cloud.
+    Generate embeddings for new and changed movies and store them in Chroma Cloud.
+    
+    Each item's rich description is hashed together with the model name;
+    items whose description and metadata match the embedding cache are
+    neither re-encoded nor re-uploaded.
     
     Args:
         input_file: Path to movies JSON file
+        cache_file: Embedding cache path (.npz)
+        dry_run: Only print what would be encoded, uploaded and deleted
+        prune: Delete items that are no longer in the catalog from Chroma Cloud
+        graph_dir: Where to write the neighbour graph (empty string skips it)
+        neighbors: Neighbours per item in the graph
     """
     print("=" * 70)
     print("GENERATING RICH EMBEDDINGS FOR MOVIES")
     print("=" * 70)
     
     # Load movies
-    print(f"\n[Step 1/3] Loading movies from {input_file}...")
+    print(f"\n[Step 1/4] Loading movies from {input_file}...")
     try:
         # Try compressed version first
         import gzip
@@ -267,47 +358,109 @@ def generate_embeddings(
         print("Please run 'python scripts/collect_movies.py' first")
         return
     
+    # Compare against the embedding cache
+    print(f"\n[Step 2/4] Comparing against embedding cache {cache_file}...")
+    cache = EmbeddingCache(cache_file, EMBEDDING_MODEL)
+    print(f"✓ {cache.load()} cached embeddings")
+    
+    records = []
+    for movie in movies:
+        # Create rich description and metadata
+        description = create_rich_description(movie)
+        metadata = prepare_metadata(movie)
+        embedding_key = description_hash(description, EMBEDDING_MODEL)
+        records.append({
+            'id': str(movie['id']),
+            'title': movie['title'],
+            'description': description,
+            'metadata': metadata,
+            'embedding_key': embedding_key,
+            'record_key': record_hash(embedding_key, metadata)
+        })
+    titles = {record['id']: record['title'] for record in records}
+    titles.update({item_id: item_id for item_id in cache.entries if item_id not in titles})
+    
+    report = cache.diff(records)
+    print_diff_report(report, titles)
+    
+    if dry_run:
+        print("\nDry run: nothing encoded, uploaded or deleted")
+        return
+    
     # Initialize vector database (Chroma Cloud)
-    print(f"\n[Step 2/3] Connecting to Chroma Cloud...")
+    print(f"\n[Step 3/4] Connecting to Chroma Cloud...")
     vector_db = MovieVectorDB()
     print("✓ Connected to Chroma Cloud")
     
+    pending_ids = set(report['new']) | set(report['changed'])
+    if vector_db.count_movies() < len(report['unchanged']):
+        # Collection was cleared or recreated since the cache was written: upload everything (vectors are still reused)
+        print("⚠ Collection has fewer items than the cache expects; re-uploading all items")
+        pending_ids |= set(report['unchanged'])
+    pending = [record for record in records if record['id'] in pending_ids]
+    
     # Generate embeddings
-    print(f"\n[Step 3/3] Generating embeddings for {len(movies)} movies...")
+    print(f"\n[Step 4/4] Uploading {len(pending)} new or changed movies "
+          f"({len(report['reembed']) + len(report['new'])} to encode)...")
     print("Using upsert - new movies added, existing movies updated")
-    print("This may take several minutes...")
     
-    batch_size = 50
-    total_batches = (len(movies) + batch_size - 1) // batch_size
+    # Movies per Chroma upsert; each batch is encoded in one call (EMBED_BATCH_SIZE per forward pass)
+    batch_size = int(os.getenv("EMBED_UPSERT_BATCH", "250"))
+    total_batches = (len(pending) + batch_size - 1) // batch_size
     
-    for batch_num in range(total_batches):
-        start_idx = batch_num * batch_size
-        end_idx = min((batch_num + 1) * batch_size, len(movies))
-        batch_movies = movies[start_idx:end_idx]
-        
-        # Prepare batch data
-        batch_data = []
-        for movie in batch_movies:
-            # Create rich description
-            description = create_rich_description(movie)
+    # Spread encoding across CPU cores when EMBED_PROCESSES > 1
+    if report['new'] or report['reembed']:
+        vector_db.start_encode_pool()
+    started = time.perf_counter()
+    
+    try:
+        for batch_num in range(total_batches):
+            start_idx = batch_num * batch_size
+            end_idx = min((batch_num + 1) * batch_size, len(pending))
+            batch_records = pending[start_idx:end_idx]
             
-            # Prepare metadata
-            metadata = prepare_metadata(movie)
+            # Prepare batch data, reusing cached vectors for unchanged descriptions
+            batch_data = []
+            for record in batch_records:
+                batch_data.append({
+                    'id': record['id'],
+                    'title': record['title'],
+                    'overview': record['description'],  # Use rich description instead of just overview
+                    'metadata': record['metadata'],
+                    'embedding': cache.vector_for(record['id'], record['embedding_key'])
+                })
             
-            batch_data.append({
-                'id': movie['id'],
-                'title': movie['title'],
-                'overview': description,  # Use rich description instead of just overview
-                'metadata': metadata
-            })
+            # Add batch to vector database
+            try:
+                embeddings = vector_db.add_movies_batch(batch_data)
+                for record, vector in zip(batch_records, embeddings):
+                    cache.put(record['id'], record['embedding_key'], record['record_key'], vector)
+                print(f"  Batch {batch_num + 1}/{total_batches}: Added {len(batch_data)} movies ({end_idx}/{len(pending)})")
+            except Exception as e:
+                print(f"  ✗ Error in batch {batch_num + 1}: {e}")
+                # Continue with next batch
         
-        # Add batch to vector database
-        try:
-            vector_db.add_movies_batch(batch_data)
-            print(f"  Batch {batch_num + 1}/{total_batches}: Added {len(batch_data)} movies ({end_idx}/{len(movies)})")
-        except Exception as e:
-            print(f"  ✗ Error in batch {batch_num + 1}: {e}")
-            # Continue with next batch
+        if prune and report['deleted']:
+            for item_id in report['deleted']:
+                vector_db.delete_movie(item_id)
+                cache.remove(item_id)
+            print(f"✓ Deleted {len(report['deleted'])} movies no longer in the catalog")
+    finally:
+        # Only successfully uploaded items were recorded, so a failed run resumes where it stopped
+        cache.save()
+        vector_db.stop_encode_pool()
+    
+    elapsed = time.perf_counter() - started
+    print(f"✓ Processed {len(pending)} movies in {elapsed:.1f}s ({len(pending) / max(elapsed, 1e-9):.0f} items/sec)")
+    
+    if pending or (prune and report['deleted']):
+        # Search results and chat answers cached by the app are keyed on this version
+        version = vector_db.publish_catalog_version()
+        if version:
+            print(f"✓ Published catalog version {version}")
+    
+    if graph_dir:
+        build_neighbor_graph_file(records, cache, graph_dir, k=neighbors)
     
     # Final statistics
     total_count = vector_db.count_movies()
@@ -348,6 +501,20 @@ def generate_embeddings(
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate embeddings for new and changed catalog items")
+    parser.add_argument("--input", default="data/movies.json", help="Catalog JSON file")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_FILE, help="Embedding cache file (.npz)")
+    parser.add_argument("--dry-run", action="store_true", help="Print the new/changed/unchanged/deleted report only")
+    parser.add_argument("--prune", action="store_true", help="Delete items missing from the catalog from Chroma Cloud")
+    parser.add_argument("--graph-dir", default=DEFAULT_GRAPH_DIR, help="Neighbour graph output directory ('' to skip)")
+    parser.add_argument("--neighbors", type=int, default=DEFAULT_NEIGHBORS, help="Neighbours per item in the graph")
+    args = parser.parse_args()
+    
     generate_embeddings(
-        input_file="data/movies.json"
+        input_file=args.input,
+        cache_file=args.cache,
+        dry_run=args.dry_run,
+        prune=args.prune,
+        graph_dir=args.graph_dir,
+        neighbors=args.neighbors
     )